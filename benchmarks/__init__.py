@@ -0,0 +1,10 @@
+# coding: utf-8
+"""Benchmarks of the macros, runnable by a plain python interpreter (without LibreOffice).
+
+Run them from the root of the repository, e.g. ``python -m benchmarks.bench_algorithms``.
+"""
+import os
+import sys
+
+# the modules of the macros are imported the same way LibreOffice imports them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pythonpath'))
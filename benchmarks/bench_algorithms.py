@@ -0,0 +1,147 @@
+# coding: utf-8
+"""Benchmarks of the functions in algorithms.py.
+
+Every function is run on synthetic rosters (see rosters.py) of the given sizes, with each of the given max group
+sizes, and the best time of a few runs and the peak memory allocated during a run are recorded. The results are
+written as JSON and can be compared against a stored baseline::
+
+    python -m benchmarks.bench_algorithms --output results.json
+    python -m benchmarks.bench_algorithms --sizes 16 256 4096 --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_algorithms --save-baseline
+
+When compared against a baseline, the exit status is 1 if any time or peak memory is worse than the baseline by
+more than the tolerance.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import algorithms
+import planning
+from benchmarks import rosters
+
+SIZES = [16, 32, 64, 128, 256, 512, 1024, 4096, 10000, 50000]
+MAX_GROUP_SIZES = [5, 7, 9]
+TO_ELIMINATION = 0.8
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TOLERANCE = 0.25
+# times and peak memories smaller than these are too noisy to be compared
+MIN_TIME = 0.001
+MIN_MEMORY = 64 * 1024
+# a function is run repeatedly until it takes at least this long in total, or MAX_REPEAT times
+MIN_DURATION = 0.2
+MAX_REPEAT = 5
+
+
+def measure(func, args):
+    """Returns the best time of a few calls of ``func(*args)`` and the peak memory allocated during a single call."""
+    times = []
+    while len(times) < MAX_REPEAT and sum(times) < MIN_DURATION:
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def scheduleGroups(schedule, group_sizes):
+    """Schedules groups of the given sizes by the given scheduling function."""
+    for size in group_sizes:
+        list(schedule(list(range(size))))
+
+
+def cases(sizes, max_group_sizes, rating_is_rank):
+    """Yields (function name, number of participants, max group size or None, function, arguments) to benchmark."""
+    for n in sizes:
+        roster = sorted(rosters.makeRoster(n, seed=n, rating_is_rank=rating_is_rank), key=planning.seedingKey(rating_is_rank))
+        yield 'makeElimination', n, None, algorithms.makeElimination, (list(range(round(TO_ELIMINATION * n))),)
+        for max_group_size in max_group_sizes:
+            try:
+                group_sizes = algorithms.findGroupSizes(n, max_group_size, True)
+            except ValueError:
+                continue
+            yield 'findGroupSizes', n, max_group_size, algorithms.findGroupSizes, (n, max_group_size, True)
+            yield 'assignGroups', n, max_group_size, algorithms.assignGroups, (group_sizes, roster, planning.SPREAD_CRITERIA)
+            yield 'makeGroupSchedule', n, max_group_size, scheduleGroups, (algorithms.makeGroupSchedule, group_sizes)
+            even = [s for s in group_sizes if s % 2 == 0]
+            if even:
+                yield 'makeGroupCircle', n, max_group_size, scheduleGroups, (algorithms.makeGroupCircle, even)
+            odd = [s for s in group_sizes if s % 2 == 1]
+            if odd:
+                yield 'makeGroupOdd', n, max_group_size, scheduleGroups, (algorithms.makeGroupOdd, odd)
+
+
+def run(sizes, max_group_sizes, rating_is_rank, log=None):
+    results = []
+    for name, n, max_group_size, func, args in cases(sizes, max_group_sizes, rating_is_rank):
+        seconds, peak = measure(func, args)
+        results.append(dict(function=name, participants=n, max_group_size=max_group_size, time=seconds, peak_memory=peak))
+        if log is not None:
+            print('{:<18} {:>6} {:>4} {:>12.6f} s {:>12} B'.format(name, n, max_group_size or '-', seconds, peak), file=log)
+    return dict(python=platform.python_version(),
+                machine=platform.machine(),
+                rating_is_rank=rating_is_rank,
+                results=results)
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """Returns the descriptions of the results of the report which are worse than those in the baseline."""
+    key = lambda r: (r['function'], r['participants'], r['max_group_size'])
+    base = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in report['results']:
+        b = base.get(key(r))
+        if b is None:
+            continue
+        if r['time'] > MIN_TIME and r['time'] > max(b['time'], MIN_TIME) * (1 + tolerance):
+            regressions.append('{} ({} participants, max group size {}): time {:.6f} s, baseline {:.6f} s'.format(
+                r['function'], r['participants'], r['max_group_size'], r['time'], b['time']))
+        if r['peak_memory'] > MIN_MEMORY and r['peak_memory'] > max(b['peak_memory'], MIN_MEMORY) * (1 + tolerance):
+            regressions.append('{} ({} participants, max group size {}): peak memory {} B, baseline {} B'.format(
+                r['function'], r['participants'], r['max_group_size'], r['peak_memory'], b['peak_memory']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the functions in algorithms.py.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='numbers of participants')
+    parser.add_argument('--max-group-sizes', type=int, nargs='+', default=MAX_GROUP_SIZES, help='max group sizes')
+    parser.add_argument('--rating', action='store_true', help='rosters with ratings instead of ranks')
+    parser.add_argument('--output', help='file to write the results to (default: standard output)')
+    parser.add_argument('--baseline', help='baseline to compare the results against')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline ({})'.format(BASELINE))
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed relative slowdown (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.max_group_sizes, not args.rating, log=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    elif not args.save_baseline:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    if args.save_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: ' + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
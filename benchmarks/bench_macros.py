@@ -0,0 +1,218 @@
+# coding: utf-8
+"""End-to-end benchmarks of the macros on an in-memory document (see fakeuno.py).
+
+Each scenario initializes a document by ``init``, fills in a synthetic roster (see rosters.py) and the settings, and
+runs ``schedule``, ``evalGroups`` and ``evalFinal``, or its own steps - macros and changes of the document between
+them (see STEPS). The time of each macro, the number of UNO calls it made and the time spent in them are written as
+JSON. The resulting documents of the fixed scenarios can be checked against the
+golden outputs in the ``golden`` directory::
+
+    python -m benchmarks.bench_macros --output results.json
+    python -m benchmarks.bench_macros --sizes 500 2000 --top 10
+    python -m benchmarks.bench_macros --check
+    python -m benchmarks.bench_macros --update-golden
+
+Formulas are not evaluated by the fake document. Before ``evalGroups``, the cells of ``Groups - results`` are given
+seeded random results, so that the sorting has something to sort.
+"""
+from __future__ import print_function, unicode_literals
+
+import argparse
+import collections
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks import fakeuno
+fakeuno.install()
+
+import constants
+import main as macros
+from benchmarks import rosters
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+MACROS = ['schedule', 'evalGroups', 'evalFinal']
+# name -> (number of participants, {row in Settings: value}, macros and steps)
+SCENARIOS = collections.OrderedDict([
+    ('individual-9', (9, {2: 1}, MACROS)),
+    ('individual-23', (23, {}, MACROS)),
+    ('individual-57', (57, {0: 6, 4: 0}, MACROS)),
+    ('rating-44', (44, {3: 0, 2: 0.5}, MACROS)),
+    ('team-40', (40, {5: 3, 2: 0.75}, MACROS)),
+    ('random-scores-30', (30, {6: 5, 7: 5}, MACROS)),
+    ('restore-23', (23, {6: 5, 7: 5}, ['schedule', 'evalGroups', 'reopen', 'restore'])),
+    ('reschedule-30', (30, {6: 5, 9: 2}, ['schedule', 'withdraw', 'checkIn', 'reschedule', 'evalGroups', 'evalFinal'])),
+    ('capacity-57', (57, {9: 2}, ['planCapacity'])),
+])
+SEED = 7
+
+
+def reopen(doc, rnd):
+    """Opens a new document under the URL of the document, as if the document was lost."""
+    doc = fakeuno.FakeDocument(doc.URL)
+    macros.CTX = fakeuno.FakeScriptContext(doc)
+    return doc
+
+
+def withdraw(doc, rnd):
+    """Marks a random participant as not present, as if they withdrew after the groups were scheduled."""
+    plist = doc.Sheets[constants.PARTICIPANT_LIST]
+    rows = plist.getCellRangeByPosition(0, 1, 0, 1000).getDataArray()
+    n = sum(1 for name, in rows if name)
+    plist.getCellByPosition(4, rnd.randint(1, n)).setString('n')
+    return doc
+
+
+def checkIn(doc, rnd):
+    """Appends a present participant to the Participant list, as if they came late."""
+    plist = doc.Sheets[constants.PARTICIPANT_LIST]
+    rows = plist.getCellRangeByPosition(0, 1, 0, 1000).getDataArray()
+    row = sum(1 for name, in rows if name) + 1
+    late = (('Late Comer', 'Late Club', 'CZ', float(rnd.randint(1, row)), 'y'),)
+    plist.getCellRangeByPosition(0, row, 4, row).setDataArray(late)
+    return doc
+
+
+# steps of the scenarios which change the document between the macros (without being measured), by their names;
+# each is called with the document and a seeded random generator and returns the document to continue with
+STEPS = dict(reopen=reopen, withdraw=withdraw, checkIn=checkIn)
+
+
+def runScenario(n, settings, seed=SEED, top=0, steps=MACROS):
+    """Runs the macros (and the other steps) on a new document, returns the document and the measurements of the
+    macros. A document which is restored is saved in a temporary directory.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        url = fakeuno.systemPathToFileUrl(os.path.join(directory, 'tournament.ods')) if 'restore' in steps else ''
+        return _runScenario(fakeuno.FakeDocument(url), n, settings, seed, top, steps)
+
+
+def _runScenario(doc, n, settings, seed, top, steps):
+    macros.CTX = fakeuno.FakeScriptContext(doc)
+    macros.init()
+
+    settings_sheet = doc.Sheets[constants.SETTINGS]
+    for row, value in settings.items():
+        settings_sheet.getCellByPosition(1, row).setValue(value)
+    rating_is_rank = settings_sheet.getCellByPosition(1, 3).getValue() == 1
+    roster = rosters.makeRoster(n, seed=seed, rating_is_rank=rating_is_rank)
+    rows = tuple((p.name, p.club, p.country, p.rating, 'y') for p in roster)
+    doc.Sheets[constants.PARTICIPANT_LIST].getCellRangeByPosition(0, 1, 4, n).setDataArray(rows)
+
+    random.seed(seed)
+    rnd = random.Random(seed)
+    measurements = collections.OrderedDict()
+    for macro in steps:
+        if macro in STEPS:
+            doc = STEPS[macro](doc, rnd)
+            continue
+        if macro == 'evalGroups':
+            fillGroupResults(doc, n, random.Random(seed))
+        doc.stats.reset()
+        start = time.perf_counter()
+        getattr(macros, macro)()
+        seconds = time.perf_counter() - start
+        calls = doc.stats.asDict()
+        measurements[macro] = dict(seconds=seconds,
+                                   calls=doc.stats.total(),
+                                   api_seconds=sum(c['seconds'] for c in calls.values()))
+        if top > 0:
+            busiest = sorted(calls.items(), key=lambda x: -x[1]['seconds'])[:top]
+            measurements[macro]['top_calls'] = collections.OrderedDict(busiest)
+    return doc, measurements
+
+
+def fillGroupResults(doc, n, rnd):
+    """Gives seeded random results to the formulas of W/M, D-R, D and R in Groups - results."""
+    sheet = doc.Sheets[constants.GROUPS_RESULTS]
+    for row in range(1, n + 1):
+        d = float(rnd.randint(0, 30))
+        r = float(rnd.randint(0, 30))
+        sheet.setFormulaResult(3, row, rnd.randint(0, 6) / 6)
+        sheet.setFormulaResult(4, row, d - r)
+        sheet.setFormulaResult(5, row, d)
+        sheet.setFormulaResult(6, row, r)
+
+
+def diffSnapshots(expected, actual, limit=20):
+    """Returns descriptions of (up to ``limit``) differences between two document snapshots."""
+    diffs = []
+    for key in ['styles', 'database_ranges', 'number_formats']:
+        if expected[key] != actual[key]:
+            diffs.append('{}: expected {}, got {}'.format(key, expected[key], actual[key]))
+    names = [s['name'] for s in expected['sheets']]
+    actual_sheets = {s['name']: s for s in actual['sheets']}
+    if names != [s['name'] for s in actual['sheets']]:
+        diffs.append('sheets: expected {}, got {}'.format(names, [s['name'] for s in actual['sheets']]))
+    for sheet in expected['sheets']:
+        other = actual_sheets.get(sheet['name'])
+        if other is None:
+            continue
+        for key in ['visible', 'layers', 'merges', 'columns', 'frozen']:
+            if sheet[key] != other[key]:
+                diffs.append('{} {}: expected {}, got {}'.format(sheet['name'], key, sheet[key], other[key]))
+        for cell in sorted(set(sheet['cells']) | set(other['cells'])):
+            content, fmt = sheet['cells'].get(cell, [None, None])
+            other_content, other_fmt = other['cells'].get(cell, [None, None])
+            if content != other_content:
+                diffs.append('{} {}: expected {!r}, got {!r}'.format(sheet['name'], cell, content, other_content))
+            fmt = None if fmt is None else expected['formats'][fmt]
+            other_fmt = None if other_fmt is None else actual['formats'][other_fmt]
+            if fmt != other_fmt:
+                diffs.append('{} {} format: expected {}, got {}'.format(sheet['name'], cell, fmt, other_fmt))
+    return diffs[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end benchmarks of the macros on an in-memory document.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[], help='numbers of participants of additional scenarios')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS), help='fixed scenarios to run')
+    parser.add_argument('--top', type=int, default=0, help='report the given number of the most time consuming UNO calls')
+    parser.add_argument('--output', help='file to write the results to (default: standard output)')
+    parser.add_argument('--check', action='store_true', help='compare the documents with the golden outputs')
+    parser.add_argument('--update-golden', action='store_true', help='replace the golden outputs')
+    args = parser.parse_args(argv)
+
+    scenarios = [(name,) + SCENARIOS[name] for name in args.scenarios]
+    scenarios += [('synthetic-{}'.format(n), n, {}, MACROS) for n in args.sizes]
+    report = dict(python=platform.python_version(), machine=platform.machine(), scenarios=[])
+    failed = False
+    for name, n, settings, steps in scenarios:
+        doc, measurements = runScenario(n, settings, top=args.top, steps=steps)
+        report['scenarios'].append(dict(name=name, participants=n, macros=measurements))
+        print('{:<18} {}'.format(name, '  '.join('{} {:.3f} s / {} calls'.format(m, x['seconds'], x['calls'])
+                                                 for m, x in measurements.items())), file=sys.stderr)
+        if name not in SCENARIOS or not (args.check or args.update_golden):
+            continue
+        # round trip through JSON, so that the snapshot compares equal to a loaded one
+        snapshot = json.loads(json.dumps(doc.snapshot()))
+        path = os.path.join(GOLDEN, name + '.json')
+        if args.update_golden:
+            if not os.path.isdir(GOLDEN):
+                os.makedirs(GOLDEN)
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=0, sort_keys=True)
+                f.write('\n')
+        else:
+            with open(path) as f:
+                diffs = diffSnapshots(json.load(f), snapshot)
+            for diff in diffs:
+                print('DIFFERENCE in {}: {}'.format(name, diff), file=sys.stderr)
+            failed = failed or bool(diffs)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
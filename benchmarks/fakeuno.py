@@ -0,0 +1,1284 @@
+# coding: utf-8
+"""In-memory stand-in for the subset of the LibreOffice UNO API used by the macros.
+
+Calling :func:`install` registers fake ``uno`` and ``com.sun.star.*`` modules, so that ``main`` and the modules in
+``pythonpath`` can be imported and executed by a plain Python interpreter. A :class:`FakeDocument` records the cell
+contents, styles, merges, column properties and database ranges the macros produce, and counts and times every API
+call made on it.
+
+Formulas are stored verbatim and are not evaluated; a formula cell reads as an empty string (or ``0.0``) unless a
+result is provided through :meth:`FakeSheet.setFormulaResult`.
+"""
+
+import collections
+import functools
+import json
+import re
+import sys
+import time
+import types
+
+
+class RuntimeException(Exception):
+    pass
+
+
+class IllegalArgumentException(Exception):
+    pass
+
+
+class MessageBoxButtons(object):
+    BUTTONS_OK = 1
+    BUTTONS_OK_CANCEL = 2
+    BUTTONS_YES_NO = 3
+
+
+_STRUCTS = {
+    'com.sun.star.table.BorderLine2': dict(Color=0, InnerLineWidth=0, OuterLineWidth=0, LineDistance=0,
+                                           LineStyle=0, LineWidth=0),
+    'com.sun.star.table.TableBorder2': dict(TopLine=None, IsTopLineValid=False, BottomLine=None,
+                                            IsBottomLineValid=False, LeftLine=None, IsLeftLineValid=False,
+                                            RightLine=None, IsRightLineValid=False, HorizontalLine=None,
+                                            IsHorizontalLineValid=False, VerticalLine=None,
+                                            IsVerticalLineValid=False, Distance=0, IsDistanceValid=False),
+    'com.sun.star.table.CellRangeAddress': dict(Sheet=0, StartColumn=0, StartRow=0, EndColumn=0, EndRow=0),
+    'com.sun.star.table.CellAddress': dict(Sheet=0, Column=0, Row=0),
+    'com.sun.star.table.TableSortField': dict(Field=0, IsAscending=True, IsCaseSensitive=False, FieldType=0,
+                                              CollatorLocale=None, CollatorAlgorithm=''),
+    'com.sun.star.beans.PropertyValue': dict(Name='', Handle=0, Value=None, State=0),
+    'com.sun.star.lang.Locale': dict(Language='en', Country='US', Variant=''),
+}
+
+
+class Struct(object):
+    """Plain UNO struct: a named bag of fields with defaults."""
+
+    def __init__(self, typeName, **fields):
+        self.__dict__['typeName'] = typeName
+        self.__dict__.update(_STRUCTS.get(typeName, {}))
+        self.__dict__.update(fields)
+
+    def __setattr__(self, name, value):
+        if self.typeName in _STRUCTS and name not in _STRUCTS[self.typeName]:
+            raise AttributeError('{} has no field {}'.format(self.typeName, name))
+        self.__dict__[name] = value
+
+    def __eq__(self, other):
+        return isinstance(other, Struct) and self.__dict__ == other.__dict__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.typeName)
+
+    def __repr__(self):
+        fields = ', '.join('{}={!r}'.format(k, v) for k, v in sorted(self.__dict__.items()) if k != 'typeName')
+        return '{}({})'.format(self.typeName.split('.')[-1], fields)
+
+
+class Any(object):
+
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+def createUnoStruct(typeName, *args, **kwargs):
+    return Struct(typeName, **kwargs)
+
+
+def systemPathToFileUrl(path):
+    return 'file://' + path
+
+
+def fileUrlToSystemPath(url):
+    return url[len('file://'):] if url.startswith('file://') else url
+
+
+def _unwrapAny(value):
+    return value.value if isinstance(value, Any) else value
+
+
+class CallStats(object):
+    """Number of calls and total time spent per API method (``Class.method``) or property (``Class.Prop=``)."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.times = collections.defaultdict(float)
+
+    def record(self, key, elapsed):
+        self.counts[key] += 1
+        self.times[key] += elapsed
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+        self.times.clear()
+
+    def asDict(self):
+        return {k: {'calls': self.counts[k], 'seconds': self.times[k]} for k in sorted(self.counts)}
+
+
+def _api(fn):
+    """Counts and times calls of a public API method."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            self._stats.record('{}.{}'.format(type(self).__name__, fn.__name__), time.perf_counter() - t0)
+    return wrapper
+
+
+class _ApiObject(object):
+    """Base for fake UNO objects; capitalized attributes are UNO properties."""
+
+    _doc = None
+
+    @property
+    def _stats(self):
+        return self._doc.stats
+
+    def queryInterface(self, _type):
+        return self
+
+    def __getattr__(self, name):
+        if name[:1].isupper():
+            t0 = time.perf_counter()
+            try:
+                return self._getProperty(name)
+            finally:
+                self._stats.record('{}.{}'.format(type(self).__name__, name), time.perf_counter() - t0)
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name[:1].isupper():
+            t0 = time.perf_counter()
+            try:
+                self._setProperty(name, _unwrapAny(value))
+            finally:
+                self._stats.record('{}.{}='.format(type(self).__name__, name), time.perf_counter() - t0)
+        else:
+            object.__setattr__(self, name, value)
+
+    def _getProperty(self, name):
+        raise AttributeError(name)
+
+    def _setProperty(self, name, value):
+        raise AttributeError(name)
+
+    @_api
+    def setPropertyValue(self, name, value):
+        self._setProperty(name, _unwrapAny(value))
+
+    @_api
+    def getPropertyValue(self, name):
+        return self._getProperty(name)
+
+    @_api
+    def setPropertyValues(self, names, values):
+        for name, value in zip(names, values):
+            self._setProperty(name, _unwrapAny(value))
+
+    @_api
+    def getPropertyValues(self, names):
+        return tuple(self._getProperty(name) for name in names)
+
+
+## cell contents
+
+_NUMBER = re.compile(r'^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$')
+
+
+def _formatNumber(value):
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _CellData(object):
+    __slots__ = ('kind', 'content', 'result', 'props')
+
+    def __init__(self):
+        self.kind = ''  # '', 'value', 'string', 'formula'
+        self.content = None
+        self.result = None
+        self.props = {}  # name -> (sequence number, value)
+
+    def isEmpty(self):
+        return self.kind == ''
+
+    def setFormula(self, text):
+        if text == '':
+            self.kind, self.content = '', None
+        elif text.startswith('='):
+            self.kind, self.content = 'formula', text
+        elif _NUMBER.match(text):
+            self.kind, self.content = 'value', float(text)
+        else:
+            self.kind, self.content = 'string', text
+        self.result = None
+
+    def setData(self, value):
+        if isinstance(value, str):
+            if value == '':
+                self.kind, self.content = '', None
+            else:
+                self.kind, self.content = 'string', value
+        else:
+            self.kind, self.content = 'value', float(value)
+        self.result = None
+
+    def data(self):
+        if self.kind == 'value':
+            return self.content
+        if self.kind == 'string':
+            return self.content
+        if self.kind == 'formula':
+            return '' if self.result is None else self.result
+        return ''
+
+    def string(self):
+        data = self.data()
+        return _formatNumber(data) if isinstance(data, float) else data
+
+    def value(self):
+        data = self.data()
+        return data if isinstance(data, float) else 0.0
+
+    def formula(self):
+        if self.kind == 'value':
+            return _formatNumber(self.content)
+        return self.content or ''
+
+
+## styles
+
+class FakeCellStyle(_ApiObject):
+
+    def __init__(self, doc, name=None):
+        self._doc = doc
+        self.name = name
+        self.props = {}
+        self.parent = None
+
+    def _getProperty(self, name):
+        if name == 'Name':
+            return self.name
+        if name == 'ParentStyle':
+            return self.parent
+        if name in self.props:
+            return self.props[name]
+        if self.parent is not None:
+            return self._doc._cellStyles.getByName(self.parent)._getProperty(name)
+        return None
+
+    def _setProperty(self, name, value):
+        if name == 'ParentStyle':
+            self.parent = value
+        else:
+            self.props[name] = value
+
+    @_api
+    def setParentStyle(self, name):
+        self.parent = name
+
+    @_api
+    def getParentStyle(self):
+        return self.parent
+
+    @_api
+    def getName(self):
+        return self.name
+
+    def definedNames(self):
+        names = set(self.props)
+        if self.parent is not None and self._doc._cellStyles._styles.get(self.parent) is not None:
+            names |= self._doc._cellStyles._styles[self.parent].definedNames()
+        return names
+
+
+class FakeStyleFamily(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._styles = collections.OrderedDict()
+
+    @_api
+    def hasByName(self, name):
+        return name in self._styles
+
+    @_api
+    def getByName(self, name):
+        if name not in self._styles:
+            raise RuntimeException('No such style: {}'.format(name))
+        return self._styles[name]
+
+    @_api
+    def insertByName(self, name, style):
+        if name in self._styles:
+            raise RuntimeException('Style exists: {}'.format(name))
+        style.name = name
+        self._styles[name] = style
+
+    @_api
+    def removeByName(self, name):
+        if name not in self._styles:
+            raise RuntimeException('No such style: {}'.format(name))
+        del self._styles[name]
+
+    @_api
+    def getElementNames(self):
+        return tuple(self._styles)
+
+    def __getitem__(self, name):
+        return self.getByName(name)
+
+    def __contains__(self, name):
+        return self.hasByName(name)
+
+    def __len__(self):
+        return len(self._styles)
+
+
+class FakeStyleFamilies(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+
+    @_api
+    def getByName(self, name):
+        if name == 'CellStyles':
+            return self._doc._cellStyles
+        raise RuntimeException('No such style family: {}'.format(name))
+
+    def __getitem__(self, name):
+        return self.getByName(name)
+
+
+class FakeNumberFormats(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._formats = collections.OrderedDict([('General', 0)])
+
+    @_api
+    def generateFormat(self, base_key, locale, thousands, red, decimals, leading):
+        fmt = '#,##0' if thousands else '0'
+        if leading > 1:
+            fmt = '0' * leading
+        if decimals > 0:
+            fmt += '.' + '0' * decimals
+        if red:
+            fmt = '{0};[RED]-{0}'.format(fmt)
+        return fmt
+
+    @_api
+    def addNew(self, fmt, locale):
+        if fmt in self._formats:
+            raise RuntimeException('Number format exists: {}'.format(fmt))
+        key = max(self._formats.values()) + 1
+        self._formats[fmt] = key
+        return key
+
+    @_api
+    def queryKey(self, fmt, locale, scan):
+        return self._formats.get(fmt, -1)
+
+    @_api
+    def getByKey(self, key):
+        for fmt, k in self._formats.items():
+            if k == key:
+                return Struct('com.sun.star.util.NumberFormatProperties', FormatString=fmt)
+        raise RuntimeException('No such number format: {}'.format(key))
+
+
+class FakeDatabaseRanges(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._ranges = collections.OrderedDict()
+
+    @_api
+    def addNewByName(self, name, address):
+        if name in self._ranges:
+            raise RuntimeException('Database range exists: {}'.format(name))
+        self._ranges[name] = (self._doc._sheets._sheets[address.Sheet],
+                              (address.StartColumn, address.StartRow, address.EndColumn, address.EndRow))
+
+    @_api
+    def hasByName(self, name):
+        return name in self._ranges
+
+    @_api
+    def removeByName(self, name):
+        if name not in self._ranges:
+            raise RuntimeException('No such database range: {}'.format(name))
+        del self._ranges[name]
+
+    @_api
+    def getElementNames(self):
+        return tuple(self._ranges)
+
+    def __contains__(self, name):
+        return name in self._ranges
+
+    def _dropSheet(self, sheet):
+        for name in [n for n, (s, _) in self._ranges.items() if s is sheet]:
+            del self._ranges[name]
+
+
+## sheets, ranges and cells
+
+# ranges with more cells than this keep their formatting as a layer instead of per cell
+_LAYER_THRESHOLD = 4096
+
+
+def _resolveProps(doc, entries):
+    """Replays ``(sequence number, name, value)`` formatting entries; applying a cell style clears the direct
+    formatting of the attributes the style defines, like LibreOffice does.
+    """
+    props = {}
+    for _, name, value in sorted(entries, key=lambda e: e[0]):
+        if name == 'CellStyle':
+            style = doc._cellStyles._styles.get(value)
+            if style is not None:
+                for defined in style.definedNames():
+                    props.pop(defined, None)
+        props[name] = value
+    return props
+
+
+class _RangeBase(_ApiObject):
+    """A rectangle ``(c0, r0)``-``(c1, r1)`` of a sheet (inclusive)."""
+
+    def _init(self, sheet, c0, r0, c1, r1):
+        self._doc = sheet._doc
+        self._sheet = sheet
+        self._rect = (c0, r0, c1, r1)
+
+    def _positions(self):
+        c0, r0, c1, r1 = self._rect
+        for r in range(r0, r1 + 1):
+            for c in range(c0, c1 + 1):
+                yield c, r
+
+    def _getProperty(self, name):
+        c0, r0, c1, r1 = self._rect
+        if name == 'RangeAddress':
+            return self.getRangeAddress()
+        if name == 'Spreadsheet':
+            return self._sheet
+        if name == 'Columns':
+            return FakeColumns(self._sheet, c0, c1)
+        props = self._sheet._props((c0, r0))
+        if name in props:
+            return props[name]
+        if name == 'CellStyle':
+            return 'Default'
+        style = self._doc._cellStyles._styles.get(props.get('CellStyle', 'Default'))
+        return style._getProperty(name) if style is not None else None
+
+    def _setProperty(self, name, value):
+        if name == 'TableBorder2':
+            self._setTableBorder(value)
+            return
+        c0, r0, c1, r1 = self._rect
+        seq = self._doc._tick()
+        if (c1 - c0 + 1) * (r1 - r0 + 1) > _LAYER_THRESHOLD:
+            self._sheet._layers.append((seq, self._rect, name, value))
+            return
+        cells = self._sheet._cells
+        for pos in self._positions():
+            data = cells.get(pos)
+            if data is None:
+                data = cells[pos] = _CellData()
+            data.props[name] = (seq, value)
+
+    def _setTableBorder(self, tb):
+        c0, r0, c1, r1 = self._rect
+        cells = self._sheet._cells
+        seq = self._doc._tick()
+
+        def put(pos, prop, line):
+            data = cells.get(pos)
+            if data is None:
+                data = cells[pos] = _CellData()
+            data.props[prop] = (seq, line)
+
+        for c in range(c0, c1 + 1):
+            if tb.IsTopLineValid:
+                put((c, r0), 'TopBorder2', tb.TopLine)
+            if tb.IsBottomLineValid:
+                put((c, r1), 'BottomBorder2', tb.BottomLine)
+            if tb.IsHorizontalLineValid:
+                for r in range(r0, r1):
+                    put((c, r), 'BottomBorder2', tb.HorizontalLine)
+                    put((c, r + 1), 'TopBorder2', tb.HorizontalLine)
+        for r in range(r0, r1 + 1):
+            if tb.IsLeftLineValid:
+                put((c0, r), 'LeftBorder2', tb.LeftLine)
+            if tb.IsRightLineValid:
+                put((c1, r), 'RightBorder2', tb.RightLine)
+            if tb.IsVerticalLineValid:
+                for c in range(c0, c1):
+                    put((c, r), 'RightBorder2', tb.VerticalLine)
+                    put((c + 1, r), 'LeftBorder2', tb.VerticalLine)
+
+    @_api
+    def getRangeAddress(self):
+        c0, r0, c1, r1 = self._rect
+        return Struct('com.sun.star.table.CellRangeAddress', Sheet=self._sheet._index(), StartColumn=c0,
+                      StartRow=r0, EndColumn=c1, EndRow=r1)
+
+    @_api
+    def getSpreadsheet(self):
+        return self._sheet
+
+    @_api
+    def getColumns(self):
+        return FakeColumns(self._sheet, self._rect[0], self._rect[2])
+
+    @_api
+    def getCellByPosition(self, col, row):
+        c0, r0, c1, r1 = self._rect
+        if col < 0 or row < 0 or c0 + col > c1 or r0 + row > r1:
+            raise IllegalArgumentException('Position out of range: {}, {}'.format(col, row))
+        return FakeCell(self._sheet, c0 + col, r0 + row)
+
+    @_api
+    def getCellRangeByPosition(self, left, top, right, bottom):
+        c0, r0, c1, r1 = self._rect
+        if left < 0 or top < 0 or left > right or top > bottom or c0 + right > c1 or r0 + bottom > r1:
+            raise IllegalArgumentException('Range out of range: {}, {}, {}, {}'.format(left, top, right, bottom))
+        return FakeCellRange(self._sheet, c0 + left, r0 + top, c0 + right, r0 + bottom)
+
+    def _rows(self, extract):
+        c0, r0, c1, r1 = self._rect
+        cells = self._sheet._cells
+        empty = _CellData()
+        return tuple(tuple(extract(cells.get((c, r), empty)) for c in range(c0, c1 + 1)) for r in range(r0, r1 + 1))
+
+    def _fill(self, array, setter):
+        c0, r0, c1, r1 = self._rect
+        array = _unwrapAny(array)
+        if len(array) != r1 - r0 + 1 or any(len(row) != c1 - c0 + 1 for row in array):
+            raise RuntimeException('Array does not match the size of the range')
+        cells = self._sheet._cells
+        for r, row in enumerate(array, r0):
+            for c, item in enumerate(row, c0):
+                data = cells.get((c, r))
+                if data is None:
+                    data = cells[(c, r)] = _CellData()
+                setter(data, item)
+
+    @_api
+    def getDataArray(self):
+        return self._rows(_CellData.data)
+
+    @_api
+    def setDataArray(self, array):
+        self._fill(array, _CellData.setData)
+
+    @_api
+    def getFormulaArray(self):
+        return self._rows(_CellData.formula)
+
+    @_api
+    def setFormulaArray(self, array):
+        self._fill(array, _CellData.setFormula)
+
+    @_api
+    def merge(self, do_merge):
+        if do_merge:
+            self._sheet._merges.add(self._rect)
+        else:
+            self._sheet._merges.discard(self._rect)
+
+    @_api
+    def getIsMerged(self):
+        return self._rect in self._sheet._merges
+
+    @_api
+    def clearContents(self, flags):
+        for pos in self._positions():
+            data = self._sheet._cells.get(pos)
+            if data is not None:
+                data.kind, data.content, data.result = '', None, None
+
+    @_api
+    def createSortDescriptor(self):
+        return (
+            Struct('com.sun.star.beans.PropertyValue', Name='IsSortColumns', Value=False),
+            Struct('com.sun.star.beans.PropertyValue', Name='ContainsHeader', Value=False),
+            Struct('com.sun.star.beans.PropertyValue', Name='MaxSortFieldsCount', Value=3),
+            Struct('com.sun.star.beans.PropertyValue', Name='SortFields', Value=()),
+            Struct('com.sun.star.beans.PropertyValue', Name='BindFormatsToContent', Value=True),
+        )
+
+    @_api
+    def sort(self, descriptor):
+        """Stable row sort by the cells' data; cell contents (not formatting) move with the rows."""
+        props = {p.Name: _unwrapAny(p.Value) for p in descriptor}
+        c0, r0, c1, r1 = self._rect
+        cells = self._sheet._cells
+        empty = _CellData()
+        rows = [[cells.get((c, r), empty) for c in range(c0, c1 + 1)] for r in range(r0, r1 + 1)]
+        if props.get('ContainsHeader'):
+            rows = rows[1:]
+            r0 += 1
+        snapshot = [[(d.kind, d.content, d.result) for d in row] for row in rows]
+        order = list(range(len(rows)))
+        for field in reversed(list(props.get('SortFields') or ())):
+            def key(i, field=field):
+                data = rows[i][field.Field].data()
+                return (0, data) if isinstance(data, float) else (1, data.lower())
+            filled = [i for i in order if rows[i][field.Field].data() != '']
+            empties = [i for i in order if rows[i][field.Field].data() == '']
+            filled.sort(key=key, reverse=not field.IsAscending)
+            order = filled + empties
+        for r, src in enumerate(order, r0):
+            for c, (kind, content, result) in enumerate(snapshot[src], c0):
+                data = cells.get((c, r))
+                if data is None:
+                    data = cells[(c, r)] = _CellData()
+                data.kind, data.content, data.result = kind, content, result
+
+
+class FakeCellRange(_RangeBase):
+
+    def __init__(self, sheet, c0, r0, c1, r1):
+        self._init(sheet, c0, r0, c1, r1)
+
+
+class FakeCell(_RangeBase):
+
+    def __init__(self, sheet, col, row):
+        self._init(sheet, col, row, col, row)
+
+    def _data(self, create=False):
+        c0, r0 = self._rect[:2]
+        data = self._sheet._cells.get((c0, r0))
+        if data is None and create:
+            data = self._sheet._cells[(c0, r0)] = _CellData()
+        return data
+
+    def _getProperty(self, name):
+        if name == 'CellAddress':
+            return self.getCellAddress()
+        return _RangeBase._getProperty(self, name)
+
+    @_api
+    def getCellAddress(self):
+        c0, r0 = self._rect[:2]
+        return Struct('com.sun.star.table.CellAddress', Sheet=self._sheet._index(), Column=c0, Row=r0)
+
+    @_api
+    def setString(self, text):
+        self._data(True).setData(text)
+
+    @_api
+    def getString(self):
+        data = self._data()
+        return data.string() if data is not None else ''
+
+    @_api
+    def setValue(self, value):
+        self._data(True).setData(float(value))
+
+    @_api
+    def getValue(self):
+        data = self._data()
+        return data.value() if data is not None else 0.0
+
+    @_api
+    def setFormula(self, text):
+        self._data(True).setFormula(text)
+
+    @_api
+    def getFormula(self):
+        data = self._data()
+        return data.formula() if data is not None else ''
+
+
+class FakeSheetCellRanges(_ApiObject):
+    """``com.sun.star.sheet.SheetCellRanges``: a set of (possibly disjoint) ranges formatted at once."""
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._ranges = []
+
+    def _getProperty(self, name):
+        if name == 'RangeAddresses':
+            return tuple(self._ranges)
+        raise AttributeError(name)
+
+    def _setProperty(self, name, value):
+        for address in self._ranges:
+            sheet = self._doc._sheets._sheets[address.Sheet]
+            FakeCellRange(sheet, address.StartColumn, address.StartRow, address.EndColumn,
+                          address.EndRow)._setProperty(name, value)
+
+    @_api
+    def addRangeAddress(self, address, merge):
+        self._ranges.append(address)
+
+    @_api
+    def addRangeAddresses(self, addresses, merge):
+        self._ranges.extend(addresses)
+
+    @_api
+    def getCount(self):
+        return len(self._ranges)
+
+
+class FakeColumn(_ApiObject):
+
+    def __init__(self, sheet, index):
+        self._doc = sheet._doc
+        self._sheet = sheet
+        self._col = index
+
+    def _getProperty(self, name):
+        props = self._sheet._columns.get(self._col, {})
+        if name in props:
+            return props[name]
+        return dict(Width=2258, OptimalWidth=False, IsVisible=True).get(name)
+
+    def _setProperty(self, name, value):
+        self._sheet._columns.setdefault(self._col, {})[name] = value
+
+
+MAX_COLUMN = 16383
+
+
+class FakeColumns(_ApiObject):
+    """Columns ``start``..``end`` of a sheet; setting a property sets it on all of them."""
+
+    def __init__(self, sheet, start=0, end=MAX_COLUMN):
+        self._doc = sheet._doc
+        self._sheet = sheet
+        self._start = start
+        self._end = end
+
+    def _setProperty(self, name, value):
+        for col in range(self._start, self._end + 1):
+            FakeColumn(self._sheet, col)._setProperty(name, value)
+
+    @_api
+    def getByIndex(self, index):
+        if index < 0 or self._start + index > self._end:
+            raise IllegalArgumentException('Column out of range: {}'.format(index))
+        return FakeColumn(self._sheet, self._start + index)
+
+    @_api
+    def getCount(self):
+        return self._end - self._start + 1
+
+    def __getitem__(self, index):
+        return self.getByIndex(index)
+
+
+class FakeCursor(_RangeBase):
+
+    def __init__(self, sheet, c0=0, r0=0, c1=0, r1=0):
+        self._init(sheet, c0, r0, c1, r1)
+
+    def _usedArea(self):
+        positions = [pos for pos, data in self._sheet._cells.items() if not data.isEmpty()]
+        if not positions:
+            return 0, 0, 0, 0
+        return (min(c for c, _ in positions), min(r for _, r in positions),
+                max(c for c, _ in positions), max(r for _, r in positions))
+
+    @_api
+    def gotoEndOfUsedArea(self, expand):
+        _, _, c1, r1 = self._usedArea()
+        c0, r0 = self._rect[:2] if expand else (c1, r1)
+        self._rect = (min(c0, c1), min(r0, r1), c1, r1)
+
+    @_api
+    def gotoStartOfUsedArea(self, expand):
+        c0, r0, _, _ = self._usedArea()
+        c1, r1 = self._rect[2:] if expand else (c0, r0)
+        self._rect = (c0, r0, max(c0, c1), max(r0, r1))
+
+
+class FakeSheet(_ApiObject):
+
+    def __init__(self, doc, name):
+        self._doc = doc
+        self.name = name
+        self.visible = True
+        self._cells = {}
+        self._layers = []
+        self._merges = set()
+        self._columns = {}
+
+    def _props(self, pos, layers_only=False):
+        """Formatting of the cell at ``pos`` (without the values inherited from its style)."""
+        entries = [(seq, name, value) for seq, (c0, r0, c1, r1), name, value in self._layers
+                   if c0 <= pos[0] <= c1 and r0 <= pos[1] <= r1]
+        data = self._cells.get(pos)
+        if data is not None and not layers_only:
+            entries.extend((seq, name, value) for name, (seq, value) in data.props.items())
+        return _resolveProps(self._doc, entries)
+
+    def _index(self):
+        return self._doc._sheets._sheets.index(self)
+
+    def _getProperty(self, name):
+        if name == 'Name':
+            return self.name
+        if name == 'IsVisible':
+            return self.visible
+        if name == 'Columns':
+            return FakeColumns(self)
+        raise AttributeError(name)
+
+    def _setProperty(self, name, value):
+        if name == 'Name':
+            self._doc._sheets._rename(self, value)
+        elif name == 'IsVisible':
+            self.visible = bool(value)
+        else:
+            raise AttributeError(name)
+
+    @_api
+    def getName(self):
+        return self.name
+
+    @_api
+    def setName(self, name):
+        self._doc._sheets._rename(self, name)
+
+    @_api
+    def getColumns(self):
+        return FakeColumns(self)
+
+    @_api
+    def getCellByPosition(self, col, row):
+        return FakeCell(self, col, row)
+
+    @_api
+    def getCellRangeByPosition(self, left, top, right, bottom):
+        if left > right or top > bottom:
+            raise IllegalArgumentException('Invalid range: {}, {}, {}, {}'.format(left, top, right, bottom))
+        return FakeCellRange(self, left, top, right, bottom)
+
+    @_api
+    def createCursor(self):
+        return FakeCursor(self)
+
+    @_api
+    def createCursorByRange(self, rng):
+        return FakeCursor(self, *rng._rect)
+
+    def setFormulaResult(self, col, row, result):
+        """Provides the result a formula cell reads as (formulas are not evaluated)."""
+        self._cells[(col, row)].result = result
+
+
+class FakeSheets(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+        self._sheets = []
+
+    def _byName(self, name):
+        for sheet in self._sheets:
+            if sheet.name == name:
+                return sheet
+        raise RuntimeException('No such sheet: {}'.format(name))
+
+    def _rename(self, sheet, name):
+        if any(s.name == name for s in self._sheets if s is not sheet):
+            raise RuntimeException('Sheet exists: {}'.format(name))
+        sheet.name = name
+
+    @_api
+    def insertNewByName(self, name, position):
+        if any(s.name == name for s in self._sheets):
+            raise RuntimeException('Sheet exists: {}'.format(name))
+        self._sheets.insert(position, FakeSheet(self._doc, name))
+
+    @_api
+    def removeByName(self, name):
+        sheet = self._byName(name)
+        self._doc._databaseRanges._dropSheet(sheet)
+        self._sheets.remove(sheet)
+
+    @_api
+    def copyByName(self, name, new_name, position):
+        source = self._byName(name)
+        if any(s.name == new_name for s in self._sheets):
+            raise RuntimeException('Sheet exists: {}'.format(new_name))
+        copy = FakeSheet(self._doc, new_name)
+        for pos, data in source._cells.items():
+            new = copy._cells[pos] = _CellData()
+            new.kind, new.content, new.result, new.props = data.kind, data.content, data.result, dict(data.props)
+        copy._layers = list(source._layers)
+        copy._merges = set(source._merges)
+        copy._columns = {c: dict(props) for c, props in source._columns.items()}
+        copy.visible = source.visible
+        self._sheets.insert(position, copy)
+
+    @_api
+    def moveByName(self, name, position):
+        sheet = self._byName(name)
+        index = self._sheets.index(sheet)
+        self._sheets.insert(position, sheet)
+        del self._sheets[index if index < position else index + 1]
+
+    @_api
+    def hasByName(self, name):
+        return any(s.name == name for s in self._sheets)
+
+    @_api
+    def getByName(self, name):
+        return self._byName(name)
+
+    @_api
+    def getByIndex(self, index):
+        return self._sheets[index]
+
+    @_api
+    def getCount(self):
+        return len(self._sheets)
+
+    @_api
+    def getElementNames(self):
+        return tuple(s.name for s in self._sheets)
+
+    def __len__(self):
+        return self.getCount()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.getByName(key)
+        return self.getByIndex(key)
+
+    def __iter__(self):
+        return iter(list(self._sheets))
+
+    def __contains__(self, name):
+        return self.hasByName(name)
+
+
+class FakeController(_ApiObject):
+
+    def __init__(self, doc):
+        self._doc = doc
+        self.active = None
+        self.selection = None
+        self.frozen = {}
+
+    @_api
+    def select(self, obj):
+        self.selection = obj
+        if isinstance(obj, FakeSheet):
+            self.active = obj
+        return True
+
+    @_api
+    def freezeAtPosition(self, col, row):
+        if self.active is not None:
+            self.frozen[self.active.name] = (col, row)
+
+    @_api
+    def setActiveSheet(self, sheet):
+        self.active = sheet
+
+    @_api
+    def getActiveSheet(self):
+        return self.active
+
+
+class FakeDocument(_ApiObject):
+    """A spreadsheet document held in memory."""
+
+    def __init__(self, url=''):
+        object.__setattr__(self, 'stats', CallStats())
+        self._doc = self
+        self._url = url
+        self._sheets = FakeSheets(self)
+        self._cellStyles = FakeStyleFamily(self)
+        self._cellStyles._styles['Default'] = FakeCellStyle(self, 'Default')
+        self._styleFamilies = FakeStyleFamilies(self)
+        self._numberFormats = FakeNumberFormats(self)
+        self._databaseRanges = FakeDatabaseRanges(self)
+        self._controller = FakeController(self)
+        self._controllerLocks = 0
+        self._actionLocks = 0
+        self._autoCalc = True
+        self.recalculations = 0
+        self._sequence = 0
+        self._sheets._sheets.append(FakeSheet(self, 'Sheet1'))
+
+    @property
+    def _stats(self):
+        return self.stats
+
+    def _tick(self):
+        self._sequence += 1
+        return self._sequence
+
+    def _getProperty(self, name):
+        if name == 'Sheets':
+            return self._sheets
+        if name == 'NumberFormats':
+            return self._numberFormats
+        if name == 'DatabaseRanges':
+            return self._databaseRanges
+        if name == 'CharLocale':
+            return Struct('com.sun.star.lang.Locale')
+        if name == 'URL':
+            return self._url
+        raise AttributeError(name)
+
+    @_api
+    def getSheets(self):
+        return self._sheets
+
+    @_api
+    def getStyleFamilies(self):
+        return self._styleFamilies
+
+    @_api
+    def getCurrentController(self):
+        return self._controller
+
+    @_api
+    def createInstance(self, service):
+        if service == 'com.sun.star.style.CellStyle':
+            return FakeCellStyle(self)
+        if service == 'com.sun.star.sheet.SheetCellRanges':
+            return FakeSheetCellRanges(self)
+        raise RuntimeException('Unsupported service: {}'.format(service))
+
+    @_api
+    def getURL(self):
+        return self._url
+
+    @_api
+    def lockControllers(self):
+        self._controllerLocks += 1
+
+    @_api
+    def unlockControllers(self):
+        self._controllerLocks -= 1
+
+    @_api
+    def hasControllersLocked(self):
+        return self._controllerLocks > 0
+
+    @_api
+    def addActionLock(self):
+        self._actionLocks += 1
+
+    @_api
+    def removeActionLock(self):
+        self._actionLocks -= 1
+
+    @_api
+    def isActionLocked(self):
+        return self._actionLocks > 0
+
+    @_api
+    def enableAutomaticCalculation(self, enable):
+        self._autoCalc = bool(enable)
+
+    @_api
+    def isAutomaticCalculationEnabled(self):
+        return self._autoCalc
+
+    @_api
+    def calculateAll(self):
+        self.recalculations += 1
+
+    @_api
+    def calculate(self):
+        self.recalculations += 1
+
+    def snapshot(self):
+        """JSON-compatible description of the document, for comparing against golden outputs.
+
+        Formatting is described by its effect, not by the calls that made it: for every cell which is formatted
+        differently than the large ranges (layers) it lies in, the index of its effective formatting in ``formats``
+        is given, with the borders between neighbouring cells resolved to the stronger of the two lines.
+        """
+        formats = []
+        format_indices = {}
+
+        def formatIndex(fmt):
+            key = json.dumps(fmt, sort_keys=True)
+            if key not in format_indices:
+                format_indices[key] = len(formats)
+                formats.append(fmt)
+            return format_indices[key]
+
+        sheets = []
+        for sheet in self._sheets._sheets:
+            cells = {}
+            for (c, r), data in sorted(sheet._cells.items(), key=lambda x: (x[0][1], x[0][0])):
+                content = None
+                if not data.isEmpty():
+                    content = data.formula() if data.kind != 'string' else data.content
+                fmt = self._effectiveFormat(sheet, (c, r))
+                fmt = None if fmt == self._effectiveFormat(sheet, (c, r), layers_only=True) else formatIndex(fmt)
+                if content is not None or fmt is not None:
+                    cells[_cellName(c, r)] = [content, fmt]
+            sheets.append({
+                'name': sheet.name,
+                'visible': sheet.visible,
+                'cells': cells,
+                'layers': [[list(rect), name, _plain(value)] for _, rect, name, value in sheet._layers],
+                'merges': sorted(list(m) for m in sheet._merges),
+                'columns': {str(c): dict(sorted(p.items())) for c, p in sorted(sheet._columns.items())},
+                'frozen': self._controller.frozen.get(sheet.name),
+            })
+        return {
+            'sheets': sheets,
+            'formats': formats,
+            'styles': {name: {'parent': s.parent, 'props': {k: _plain(v) for k, v in sorted(s.props.items())}}
+                       for name, s in sorted(self._cellStyles._styles.items())},
+            'database_ranges': {name: [s.name, list(rect)] for name, (s, rect) in self._databaseRanges._ranges.items()},
+            'number_formats': dict(self._numberFormats._formats),
+        }
+
+    def _effectiveFormat(self, sheet, pos, layers_only=False):
+        c, r = pos
+        own = self._cellFormat(sheet, pos, layers_only)
+        fmt = {k: v for k, v in own.items() if k not in _BORDERS}
+        for side, (dc, dr, opposite) in _BORDERS.items():
+            lines = [own[side]]
+            if c + dc >= 0 and r + dr >= 0:
+                lines.append(self._cellFormat(sheet, (c + dc, r + dr), layers_only)[opposite])
+            lines = [line for line in lines if line is not None]
+            if lines:
+                fmt[side] = max(lines, key=lambda line: line[1])
+        return fmt
+
+    def _cellFormat(self, sheet, pos, layers_only):
+        """Direct formatting of a cell, with its borders resolved through its cell style."""
+        props = sheet._props(pos, layers_only)
+        style = self._cellStyles._styles.get(props.get('CellStyle', 'Default'))
+        fmt = {}
+        for name, value in props.items():
+            if name not in _BORDERS and not (name == 'CellStyle' and value == 'Default'):
+                fmt[name] = _plain(value)
+        for side in _BORDERS:
+            line = props[side] if side in props else (style._getProperty(side) if style is not None else None)
+            fmt[side] = (line.LineStyle, line.LineWidth) if line is not None and line.LineWidth else None
+        return fmt
+
+
+# side -> (column offset, row offset, side of the neighbour the side is shared with)
+_BORDERS = {
+    'TopBorder2': (0, -1, 'BottomBorder2'),
+    'BottomBorder2': (0, 1, 'TopBorder2'),
+    'LeftBorder2': (-1, 0, 'RightBorder2'),
+    'RightBorder2': (1, 0, 'LeftBorder2'),
+}
+
+
+def _plain(value):
+    if isinstance(value, Struct):
+        return {k: _plain(v) for k, v in sorted(value.__dict__.items()) if k != 'typeName'}
+    return value
+
+
+def _cellName(col, row):
+    name = ''
+    col += 1
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        name = chr(ord('A') + rem) + name
+    return name + str(row + 1)
+
+
+class FakeMessageBox(object):
+
+    def __init__(self, toolkit, kind, title, message):
+        self._toolkit = toolkit
+        self.kind = kind
+        self.title = title
+        self.message = message
+
+    def execute(self):
+        self._toolkit.messages.append((self.kind, self.title, self.message))
+        return 1
+
+
+class FakeToolkit(object):
+
+    def __init__(self):
+        self.messages = []
+
+    def getDesktopWindow(self):
+        return None
+
+    def createMessageBox(self, parent, kind, buttons, title, message):
+        return FakeMessageBox(self, kind, title, message)
+
+
+class FakeServiceManager(object):
+
+    def __init__(self, toolkit):
+        self._toolkit = toolkit
+
+    def createInstance(self, service):
+        if service == 'com.sun.star.awt.Toolkit':
+            return self._toolkit
+        raise RuntimeException('Unsupported service: {}'.format(service))
+
+    def createInstanceWithContext(self, service, ctx):
+        return self.createInstance(service)
+
+
+class FakeComponentContext(object):
+
+    def __init__(self, toolkit):
+        self._serviceManager = FakeServiceManager(toolkit)
+
+    def getServiceManager(self):
+        return self._serviceManager
+
+
+class FakeScriptContext(object):
+    """Stand-in for ``XSCRIPTCONTEXT``."""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.toolkit = FakeToolkit()
+        self._ctx = FakeComponentContext(self.toolkit)
+
+    def getDocument(self):
+        return self.doc
+
+    def getComponentContext(self):
+        return self._ctx
+
+
+def install():
+    """Registers the fake ``uno`` and ``com.sun.star.*`` modules in ``sys.modules``."""
+    uno = types.ModuleType('uno')
+    uno.createUnoStruct = createUnoStruct
+    uno.Any = Any
+    uno.systemPathToFileUrl = systemPathToFileUrl
+    uno.fileUrlToSystemPath = fileUrlToSystemPath
+    modules = {'uno': uno}
+    for name in ['com', 'com.sun', 'com.sun.star', 'com.sun.star.uno', 'com.sun.star.awt', 'com.sun.star.lang']:
+        modules[name] = types.ModuleType(name)
+    modules['com.sun.star.uno'].RuntimeException = RuntimeException
+    modules['com.sun.star.lang'].IllegalArgumentException = IllegalArgumentException
+    modules['com.sun.star.awt'].MessageBoxButtons = MessageBoxButtons
+    modules['com'].sun = modules['com.sun']
+    modules['com.sun'].star = modules['com.sun.star']
+    for name in ['uno', 'awt', 'lang']:
+        setattr(modules['com.sun.star'], name, modules['com.sun.star.' + name])
+    sys.modules.update(modules)
@@ -0,0 +1,33 @@
+# coding: utf-8
+"""Seeded generators of synthetic participant lists which look like the real ones."""
+from __future__ import unicode_literals
+
+import random
+
+import planning
+
+COUNTRIES = ['CZ', 'DE', 'PL', 'SK', 'AT', 'HU', 'FR', 'IT', 'GB', 'SE', 'FI', 'US', 'ES', 'NL', 'BE', 'CH']
+# a few countries dominate (the organizer's and the neighbouring ones), the rest send only a handful of clubs
+COUNTRY_WEIGHTS = [40, 20, 12] + [2] * (len(COUNTRIES) - 3)
+
+
+def makeRoster(n, seed=0, rating_is_rank=True, club_size=8):
+    """Returns a list of n (present) participants.
+
+    There are about n / club_size clubs with Zipf-distributed sizes, i.e. a few big clubs and a long tail of small
+    ones, and each club comes from a single country. If rating_is_rank, the ratings are ranks, i.e. a permutation of
+    1..n, otherwise they are Elo-like ratings which can be tied.
+    The same arguments always give the same roster.
+    """
+    rnd = random.Random(seed)
+    n_clubs = max(2, n // club_size)
+    club_countries = rnd.choices(COUNTRIES, COUNTRY_WEIGHTS, k=n_clubs)
+    clubs = rnd.choices(range(n_clubs), [1 / (k + 1) for k in range(n_clubs)], k=n)
+    if rating_is_rank:
+        ratings = list(range(1, n + 1))
+        rnd.shuffle(ratings)
+    else:
+        ratings = [max(0, round(rnd.gauss(1500, 200))) for _ in range(n)]
+    return [planning.Participant(i + 1, 'Participant {}'.format(i + 1), 'Club {}'.format(club + 1), club_countries[club], float(rating))
+            for i, (club, rating) in enumerate(zip(clubs, ratings))]
+
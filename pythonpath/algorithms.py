@@ -1,9 +1,12 @@
 # coding: utf-8
 
+import functools
+import heapq
 import math
 from typing import List, Optional, Tuple, Union, Sequence, Callable, Any
 import typing
-from scipy.sparse import csr_matrix
+import numpy as np
+from scipy.sparse import coo_matrix
 from scipy.sparse.csgraph import maximum_bipartite_matching
 
 T = typing.TypeVar('T')
@@ -38,58 +41,87 @@ def assignGroups(group_sizes: List[int], participants: List[T], spreadCriteriaGe
     Assumes that participants are already sorted by the desired ranking.
     """
     groups = [[] for _ in range(len(group_sizes))]
+    sizes = np.array(group_sizes, dtype=np.int64)
+    # codes[c][i] is the value of the c-th criterion of the i-th participant, encoded as an integer
+    codes = [_encode([c(p) for p in participants]) for c in spreadCriteriaGetters]
+    # members[c][g, k] is the code of the c-th criterion of the k-th member of the g-th group
+    members = [np.empty((len(group_sizes), max(group_sizes, default=0)), dtype=np.int64) for _ in spreadCriteriaGetters]
+    # the groups are filled in layers, one participant into each group which is not full yet
+    open_groups = np.flatnonzero(sizes > 0)
 
-    def getLeastFilled():
-        least = []
-        for i, g in enumerate(groups):
-            if len(g) == group_sizes[i]:
-                continue
-            if not least or len(g) < len(least[0]):
-                least = [g]
-            elif len(g) == len(least[0]):
-                least.append(g)
-        return least
-    
-    def assign(grps, parts, nCriteria):
-        assert len(grps) == len(parts)
-        m = csr_matrix([[1] * len(parts)] * len(grps))
-        for ig, g in enumerate(grps):
-            for ip, p in enumerate(parts):
-                for gm in g:
-                    if any((c(gm) == c(p) for c in spreadCriteriaGetters[:nCriteria])):
-                        m[ig, ip] = 0
-                        break
-        m.eliminate_zeros()
-        res = maximum_bipartite_matching(m, perm_type='row')
-        return list(res)
+    def assign(grps, start, stop, nCriteria):
+        assert len(grps) == stop - start
+        allowed = np.ones((len(grps), stop - start), dtype=bool)
+        for c in range(nCriteria):
+            allowed[_conflicts(members[c][grps, :layer], codes[c][start:stop])] = False
+        rows, cols = np.nonzero(allowed)
+        m = coo_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=allowed.shape).tocsr()
+        return maximum_bipartite_matching(m, perm_type='row')
 
     layer = 0
-    participants = list(participants)
-    while participants:
-        least = getLeastFilled()
-        if layer % 2 == 1:
-            least = list(reversed(least))
-        ps, participants = participants[:len(least)], participants[len(least):]
+    start = 0
+    while start < len(participants):
+        least = open_groups if layer % 2 == 0 else open_groups[::-1]
+        stop = min(start + len(least), len(participants))
         assignment = None
         for critCounter in range(len(spreadCriteriaGetters) + 1):
-            assignment = assign(least, ps, len(spreadCriteriaGetters) - critCounter)
-            if all((x >= 0 for x in assignment)):
+            assignment = assign(least, start, stop, len(spreadCriteriaGetters) - critCounter)
+            if (assignment >= 0).all():
                 break
-        for i, n in enumerate(assignment):
-            least[n].append(ps[i])
+        assigned = least[assignment]
+        for c in range(len(spreadCriteriaGetters)):
+            members[c][assigned, layer] = codes[c][start:stop]
+        for i, g in enumerate(assigned):
+            groups[g].append(participants[start + i])
+        start = stop
         layer += 1
+        if (sizes[open_groups] == layer).any():
+            open_groups = open_groups[sizes[open_groups] > layer]
     return groups
 
 
-def makeGroupSchedule(group: List[T]):
+def _encode(values: Sequence[Any]) -> np.ndarray:
+    """Encodes (hashable) values as integers, equal values get equal codes."""
+    table = dict()
+    return np.array([table.setdefault(v, len(table)) for v in values], dtype=np.int64)
+
+
+def _conflicts(member_codes: np.ndarray, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Finds pairs (i, j) such that the j-th code is among the codes in the i-th row of member_codes.
+
+    Returns the pairs as a tuple of the arrays of i's and j's. The work done is proportional to the number of the rows
+    and the pairs found, not to the product of the numbers of the rows and the codes.
+    """
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    flat = member_codes.ravel()
+    lo = np.searchsorted(sorted_codes, flat, side='left')
+    hi = np.searchsorted(sorted_codes, flat, side='right')
+    counts = hi - lo
+    rows = np.repeat(np.repeat(np.arange(member_codes.shape[0]), member_codes.shape[1]), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = order[np.repeat(lo, counts) + offsets]
+    return rows, cols
+
+
+def makeGroupSchedule(group: List[T]) -> List[Tuple[T, T]]:
     """Given a group, returns a list of pairs representing the individual matches in the group.
 
     For groups of even-numbered size, uses the 'circle' algorithm, and for groups of odd-numbered size uses the algorithm from https://arxiv.org/abs/1804.04504v1.
     """
-    if len(group) % 2 == 0:
-        return makeGroupCircle(group)
+    return [(group[a], group[b]) for a, b in groupScheduleIndices(len(group))]
+
+
+@functools.lru_cache(maxsize=None)
+def groupScheduleIndices(size: int) -> Tuple[Tuple[int, int], ...]:
+    """Returns the matches of a group of the given size as pairs of indices into the group.
+
+    The schedule depends only on the size, so it is computed once for each size and shared by all callers.
+    """
+    if size % 2 == 0:
+        return tuple(makeGroupCircle(list(range(size))))
     else:
-        return makeGroupOdd(group)
+        return tuple(makeGroupOdd(list(range(size))))
 
 
 def makeGroupCircle(group: List[T]) -> List[Tuple[T, T]]:
@@ -175,26 +207,19 @@ def makeGroupOdd(group):
         putToSlot(j, slot, team, flip)
         flip = not flip
     
-    group = [(a, b) for rnd in rounds for a, b in rnd]
-    nums_first = dict()
-    for a, _ in group:
-        if a not in nums_first:
-            nums_first[a] = 0
-        nums_first[a] += 1
-    while True:
-        most = max(nums_first.items(), key=lambda x: x[1])[0]
-        least = min(nums_first.items(), key=lambda x: x[1])[0]
-        if nums_first[most] - nums_first[least] > 0:
-            for i, (a, b) in enumerate(group):
-                if a == most and b == least:
-                    group[i] = (b, a)
-                    nums_first[a] -= 1
-                    nums_first[b] += 1
-                    break
-        else:
-            break
-    
-    return reversed(group)
+    fights = [(a, b) for rnd in rounds for a, b in rnd]
+    # balance who goes first: everyone fights n - 1 (even) times, so everyone can go first exactly k times; a single
+    # pass swaps the fights between those going first too often and those going first too rarely
+    excess = {p: -k for p in group}
+    for a, _ in fights:
+        excess[a] += 1
+    for i, (a, b) in enumerate(fights):
+        if excess[a] > 0 and excess[b] < 0:
+            fights[i] = (b, a)
+            excess[a] -= 1
+            excess[b] += 1
+
+    return list(reversed(fights))
 
 
 def makeElimination(participants: List[T]) -> List[Tuple[Optional[T], Optional[T]]]:
@@ -221,3 +246,89 @@ def makeElimination(participants: List[T]) -> List[Tuple[Optional[T], Optional[T
     participants = participants + [None] * (2 ** n2log - n)
     res = [(participants[a], participants[b]) for a, b in layer]
     return res, n2log
+
+
+def scheduleGroups(groups: Sequence[Sequence[Tuple[T, T]]], num_rings: int, duration: float, min_rest: float) -> List[Tuple[int, List[float]]]:
+    """Assigns groups to rings and times their bouts, so that all groups are over as soon as possible.
+
+    Each group (given by the list of its bouts in their order) is fought completely in one ring. The bouts of a group
+    follow one another, but a bout waits until both fighters rested at least ``min_rest`` since their previous bout.
+    The longest groups are assigned first, each to the ring which is free the earliest.
+    Returns the (0-based) ring and the start times of the bouts of each group.
+    """
+    starts = []
+    for bouts in groups:
+        group_starts = []
+        free = 0.0
+        ready = dict()
+        for a, b in bouts:
+            start = max(free, ready.get(a, 0.0), ready.get(b, 0.0))
+            group_starts.append(start)
+            free = start + duration
+            ready[a] = ready[b] = free + min_rest
+        starts.append(group_starts)
+    lengths = [s[-1] + duration if s else 0.0 for s in starts]
+    return [(ring, [offset + s for s in group_starts])
+            for (ring, offset), group_starts in zip(assignLongestFirst(lengths, num_rings), starts)]
+
+
+def assignLongestFirst(lengths: Sequence[float], num_rings: int) -> List[Tuple[int, float]]:
+    """Assigns jobs of the given lengths to rings, the longest first, each to the ring which is free the earliest.
+
+    Returns the (0-based) ring and the start time of each job.
+    """
+    rings = [(0.0, r) for r in range(max(num_rings, 1))]
+    result = [None] * len(lengths)
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        free, ring = heapq.heappop(rings)
+        result[i] = (ring, free)
+        heapq.heappush(rings, (free + lengths[i], ring))
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def groupDuration(size: int, duration: float, min_rest: float) -> float:
+    """Returns how long it takes to fight all bouts of a group of the given size in one ring (see scheduleGroups)."""
+    (_, starts), = scheduleGroups([groupScheduleIndices(size)], 1, duration, min_rest)
+    return starts[-1] + duration if starts else 0.0
+
+
+def scheduleBouts(bouts: Sequence[Tuple[Sequence[int], bool]], num_rings: int, duration: float, min_rest: float, start: float = 0.0) -> List[Tuple[Optional[int], float]]:
+    """Assigns bouts which depend on each other (e.g. of an elimination bracket) to rings and times them.
+
+    Each bout is given by the indices of the bouts its fighters come from (which must come before it) and whether it
+    is fought at all (a bout with a bye is not). The fighters coming from a fought bout rest at least ``min_rest``
+    before the next one, those who did not fight yet are ready at ``start``. The bouts are taken in their order, each
+    to the ring which is free the earliest.
+    Returns the (0-based) ring, or None for a bout which is not fought, and the start time of each bout.
+    """
+    rings = [(start, r) for r in range(max(num_rings, 1))]
+    # when the fighters coming from each bout are ready for the next one
+    ready_after = []
+    result = []
+    for sources, fought in bouts:
+        ready = max([ready_after[s] for s in sources] + [start])
+        if not fought:
+            result.append((None, ready))
+            ready_after.append(ready)
+            continue
+        free, ring = heapq.heappop(rings)
+        bout_start = max(free, ready)
+        result.append((ring, bout_start))
+        ready_after.append(bout_start + duration + min_rest)
+        heapq.heappush(rings, (bout_start + duration, ring))
+    return result
+
+
+def countEliminationBouts(n: int) -> List[int]:
+    """Returns the number of bouts fought in each layer of the elimination bracket of n participants (see
+    makeElimination), without the bouts with a bye. The small final is counted in the last layer.
+    """
+    if n < 2:
+        return []
+    num_layers = math.ceil(math.log2(n))
+    bouts = [2 ** (num_layers - 1 - ln) for ln in range(num_layers)]
+    bouts[0] = n - 2 ** (num_layers - 1)
+    if num_layers > 1:
+        bouts[-1] += 1
+    return bouts
@@ -3,12 +3,14 @@ from __future__ import unicode_literals
 
 PARTICIPANT_LIST = 'Participant list'
 SETTINGS = 'Settings'
+CAPACITY_PLAN = 'Capacity plan'
 FINAL_RANKING = 'Final ranking'
 GROUP_LIST = 'Group list'
 GROUPS_RESULTS = 'Groups - results'
 GROUPS_TEAM_RESULTS = 'Groups - team results'
 ELIMINATION = 'Elimination'
 LIST_OF_FIGHTS = 'List of fights'
+RESULTS = 'Results'
 SMALL_FINAL = 'Bronze final'
 TEAM_SMALL_FINAL = 'Team bronze final'
 FINAL = 'Final'
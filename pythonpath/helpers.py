@@ -3,17 +3,30 @@ from __future__ import unicode_literals
 from typing_extensions import final
 
 import uno
+import itertools
+import os
 import sys
 import re
-import random
-from collections import namedtuple
-from com.sun.star.uno import RuntimeException
+import numpy as np
+from contextlib import contextmanager
 
-import algorithms
 import constants
+import payloads
+import planning
+import profiling
+import registrations
+import snapshots
 
 
-Participant = namedtuple('Participant', ['row', 'name', 'club', 'country', 'rating'])
+Participant = planning.Participant
+
+# number of the rows written into the Participant list by a single call when importing registrations
+IMPORT_CHUNK_ROWS = 1000
+
+# number of the messages shown in a warning box at most
+MAX_BOX_LINES = 20
+
+_dataString = planning.dataString
 
 
 def _printDir(x, grep='.*'):
@@ -31,925 +44,776 @@ def _printDir(x, grep='.*'):
     print(text)
 
 
+def errorBox(ctx, title, message):
+    _messageBox(ctx, 'errorbox', title, message)
+
+
+def warningBox(ctx, title, messages):
+    """Shows the messages, one per line (up to MAX_BOX_LINES of them)."""
+    lines = messages[:MAX_BOX_LINES]
+    if len(messages) > len(lines):
+        lines.append('... and {} more'.format(len(messages) - len(lines)))
+    _messageBox(ctx, 'warningbox', title, '\n'.join(lines))
+
+
+def _messageBox(ctx, kind, title, message):
+    toolkit = ctx.getComponentContext().getServiceManager().createInstance('com.sun.star.awt.Toolkit')
+    parent = toolkit.getDesktopWindow()
+    from com.sun.star.awt import MessageBoxButtons
+    mb = toolkit.createMessageBox(parent, kind, MessageBoxButtons.BUTTONS_OK, title, message)
+    mb.execute()
+
+
+def pickFile(ctx, title, filters):
+    """Lets the user pick a file to open, ``filters`` are (title, pattern) pairs. Returns the path, or None if no file
+    was picked.
+    """
+    picker = ctx.getComponentContext().getServiceManager().createInstance('com.sun.star.ui.dialogs.FilePicker')
+    picker.setTitle(title)
+    for filter_title, pattern in filters:
+        picker.appendFilter(filter_title, pattern)
+    # 1 is ExecutableDialogResults.OK
+    if picker.execute() != 1:
+        return None
+    return uno.fileUrlToSystemPath(picker.getFiles()[0])
+
+
+@contextmanager
+def bulkMode(doc):
+    """Context in which the document is modified without being repainted and recalculated after every change.
+
+    Controllers and actions of the document are locked and automatic calculation is turned off. When the context is
+    left, everything is calculated once and the previous state is restored, also if an exception is raised.
+    """
+    automatic_calculation = doc.isAutomaticCalculationEnabled()
+    doc.lockControllers()
+    doc.addActionLock()
+    doc.enableAutomaticCalculation(False)
+    try:
+        yield doc
+        doc.calculateAll()
+    finally:
+        doc.enableAutomaticCalculation(automatic_calculation)
+        doc.removeActionLock()
+        doc.unlockControllers()
+
+
 def loadParticipants(doc):
+    """Loads the present participants from the Participant list sheet (see planning.makeParticipants).
+
+    The whole used area of the sheet is read at once.
+    """
+    return planning.makeParticipants(loadParticipantRows(doc))
+
+
+def loadParticipantRows(doc):
+    """Reads the used area of the Participant list sheet (without the header) by a single call, as ``getDataArray``."""
+    plist = doc.Sheets[constants.PARTICIPANT_LIST]
+    cursor = plist.createCursor()
+    cursor.gotoEndOfUsedArea(False)
+    last_row = cursor.RangeAddress.EndRow
+    if last_row < 1:
+        return ()
+    return plist.getCellRangeByPosition(0, 1, 4, last_row).getDataArray()
+
+
+def importParticipants(doc, path, warn=None):
+    """Appends the participants registered in the CSV (or TSV) file (see registrations) to the Participant list, except
+    for those who are in it already. Returns the number of the appended participants. ``warn`` (if given) is called
+    with a message for each skipped duplicate and for a first row which is not a recognized header.
+
+    The file is read row by row and the new rows are written after the last used row of the list (rows without a name
+    are skipped by loadParticipants, so gaps in the list do not matter), IMPORT_CHUNK_ROWS rows per call, so the rows
+    of the participants who are scheduled already do not change. Besides a chunk of rows, the existing rows and the
+    name and club of every entrant are held in memory for the de-duplication, so the memory grows with the number of
+    the unique entrants. If the file turns out to be broken, the rows of the chunks before the error are imported.
+    """
+    existing = loadParticipantRows(doc)
+    new_rows = registrations.newRows(existing, registrations.readRegistrations(path, warn), warn)
     plist = doc.Sheets[constants.PARTICIPANT_LIST]
-    participants = []
-    i = 0
+    start = end = 1 + len(existing)
     while True:
-        row = i + 1
-        name = plist.getCellByPosition(0, row).getString()
-        club = plist.getCellByPosition(1, row).getString()
-        country = plist.getCellByPosition(2, row).getString()
-        rating = plist.getCellByPosition(3, row).getValue()
-        present = plist.getCellByPosition(4, row).getString()
-        
-        if present == 'y':
-            participants.append(Participant(row, name, club, country, rating))
-        if not name:
-                break
-        i += 1
-    return participants
+        chunk = tuple(itertools.islice(new_rows, IMPORT_CHUNK_ROWS))
+        if not chunk:
+            return end - start
+        plist.getCellRangeByPosition(0, end, 4, end + len(chunk) - 1).setDataArray(chunk)
+        end += len(chunk)
+
+
+def loadSettings(doc):
+    """Loads the settings from the Settings sheet."""
+    return planning.makeSettings(loadSettingValues(doc))
+
+
+def loadSettingValues(doc):
+    """Reads the values of the Settings sheet, a value which is not a number is read as 0."""
+    data = doc.Sheets[constants.SETTINGS].getCellRangeByPosition(1, 0, 1, len(planning.Settings._fields) - 1).getDataArray()
+    return [v if isinstance(v, float) else 0.0 for v, in data]
 
 
 def addSheet(doc, name, position=None):
     if position is None:
         position = len(doc.Sheets)
     doc.Sheets.insertNewByName(name, position)
-    sheet = doc.Sheets[position]
-    cursor = sheet.createCursor()
-    cursor.gotoEndOfUsedArea(True)
-    address = cursor.RangeAddress
-    rng = sheet.getCellRangeByPosition(0, 0, address.EndColumn, 1000)
-    rng.CellStyle = 'Default'
-    return sheet
+    # the cells of a new sheet have the Default style already
+    return doc.Sheets[position]
+
+
+def createCapacityPlan(doc, options, rings, settings):
+    """Creates the Capacity plan sheet (after Settings) listing the options (see planning.capacityOptions) with their
+    durations for the given numbers of rings. The option of the current settings is marked.
+    """
+    with profiling.phase(profiling.STYLE_SETUP):
+        time_format = _StyleRegistry(doc).formatCode(payloads.TIME_FORMAT)
+    if constants.CAPACITY_PLAN in doc.Sheets:
+        doc.Sheets.removeByName(constants.CAPACITY_PLAN)
+    sheet = addSheet(doc, constants.CAPACITY_PLAN, 2)
+    cells = _CellBuffer()
+    headers = ['Max group size', 'Groups', 'Group sizes', 'To elimination', 'Cut', 'Group bouts', 'Elimination bouts', 'Total bouts']
+    headers += ['{} ring{}'.format(r, '' if r == 1 else 's') for r in rings]
+    headers += ['Current']
+    for c, header in enumerate(headers):
+        cells[c, 0] = header
+    for r, option in enumerate(options, 1):
+        cells[0, r] = option.max_group_size
+        cells[3, r] = option.to_elimination
+        cells[4, r] = option.cut_n
+        cells[6, r] = option.elimination_bouts
+        if option.group_sizes is None:
+            cells[2, r] = 'cannot be arranged'
+        else:
+            sizes = sorted(set(option.group_sizes), reverse=True)
+            cells[1, r] = len(option.group_sizes)
+            cells[2, r] = ', '.join('{} × {}'.format(option.group_sizes.count(s), s) for s in sizes)
+            cells[5, r] = option.group_bouts
+            cells[7, r] = option.group_bouts + option.elimination_bouts
+        for c, minutes in enumerate(option.durations, 8):
+            cells[c, r] = minutes / payloads.MINUTES_PER_DAY
+        if option.max_group_size == settings.max_group_size and option.to_elimination == settings.to_elimination:
+            cells[8 + len(rings), r] = 'yes'
+    cells.write(sheet)
+    sheet.getCellRangeByPosition(8, 1, 7 + len(rings), max(len(options), 1)).NumberFormat = time_format
+    sheet.getCellRangeByPosition(0, 0, len(headers) - 1, 0).Columns.OptimalWidth = True
+    cc = doc.getCurrentController()
+    cc.select(sheet)
+    cc.freezeAtPosition(0, 1)
 
 
-def createGroups(doc, participants):
+def createFinalRanking(doc, plan):
+    """Creates the Final ranking sheet with the ranks and the header."""
+    with profiling.phase(profiling.FINAL_RANKING):
+        final_ranking = addSheet(doc, constants.FINAL_RANKING, 2)
+        cells = _CellBuffer()
+        cells[0, 0] = 'Final rank'
+        if plan.team:
+            cells[1, 0] = 'Team'
+            cells[2, 0] = 'Elim. round'
+            cells[3, 0] = 'Quali'
+            n = len(plan.teams)
+        else:
+            cells[1, 0] = 'Name'
+            cells[2, 0] = 'Club'
+            cells[3, 0] = 'Elim. round'
+            cells[4, 0] = 'Quali'
+            n = len(plan.participants)
+        for i in range(n):
+            cells[0, i + 1] = i + 1
+        cells.write(final_ranking)
+        defineDatabaseRange(doc, 'finalRanking', final_ranking, 0, 0, 3 if plan.team else 4, n)
+    return final_ranking
+
+
+def createListOfFights(doc):
+    """Creates the List of fights sheet and the hidden Results sheet, returns the :class:`FightLog` that fills them."""
+    with profiling.phase(profiling.LIST_OF_FIGHTS):
+        list_of_fights = addSheet(doc, constants.LIST_OF_FIGHTS, 3)
+        cells = _CellBuffer()
+        cells[0, 0] = 'Phase'
+        cells[1, 0] = 'Fighter 1'
+        cells[2, 0] = 'Fighter 2'
+        cells[3, 0] = 'Fighter 1 score'
+        cells[4, 0] = 'Fighter 2 score'
+        cells[5, 0] = 'Result'
+        cells[6, 0] = 'Ring'
+        cells[7, 0] = 'Start'
+        cells.write(list_of_fights)
+
+        results = addSheet(doc, constants.RESULTS, 4)
+        cells = _CellBuffer()
+        cells[0, 0] = 'Fight'
+        cells[1, 0] = 'Phase'
+        cells[2, 0] = 'Fighter 1'
+        cells[3, 0] = 'Fighter 2'
+        cells[4, 0] = 'Fighter 1 score'
+        cells[5, 0] = 'Fighter 2 score'
+        cells.write(results)
+        results.IsVisible = False
+    with profiling.phase(profiling.STYLE_SETUP):
+        time_format = _StyleRegistry(doc).formatCode(payloads.TIME_FORMAT)
+    return FightLog(list_of_fights, results, time_format)
+
+
+def createGroups(doc, plan, fight_log, entered=None, keep=()):
+    """Writes the group phase of the plan - the group sheets, Group list and Groups - results.
+
+    The sheets of the groups with the indices in ``keep`` are expected to exist already and are left as they are.
+    The results in ``entered`` (see :func:`loadEnteredResults`) are written into the re-created sheets.
+    """
+    if entered is None:
+        entered = _NOTHING_ENTERED
     cc = doc.getCurrentController()
 
-    ## prepare cell styles
-    thin_border = _makeBorderLine2(0, 35 // 2)
-    medium_border = _makeBorderLine2(0, 35)
-    thick_border = _makeBorderLine2(0, 2 * 35)
-    _makeCellStyle(doc, 'scoring_table_default', dict(
-        ParaTopMargin=150,
-        ParaLeftMargin=150,
-        ParaBottomMargin=150,
-        ParaRightMargin=150,
-    ), 'Default')
-    _makeCellStyle(doc, 'scoring_table_number', dict(
-        VertJustify=2,
-        HoriJustify=2,
-        TopBorder2=medium_border,
-        RightBorder2=medium_border,
-        BottomBorder2=medium_border,
-        LeftBorder2=medium_border
-    ), 'scoring_table_default')
-    _makeCellStyle(doc, 'scoring_table_name', dict(
-        VertJustify=2,
-        HoriJustify=1,
-        TopBorder2=medium_border,
-        RightBorder2=medium_border,
-        BottomBorder2=medium_border,
-        LeftBorder2=medium_border
-    ), 'scoring_table_default')
-    _makeCellStyle(doc, 'scoring_table_inner', dict(
-        VertJustify=2,
-        HoriJustify=2,
-        TopBorder2=medium_border,
-        RightBorder2=medium_border,
-        BottomBorder2=medium_border,
-        LeftBorder2=medium_border
-    ), 'scoring_table_default')
-    _makeCellStyle(doc, 'scoring_table_inner_self', dict(
-        VertJustify=2,
-        HoriJustify=2,
-        IsCellBackgroundTransparent=False,
-        CellBackColor=0x00CCCCCC,
-        TopBorder2=medium_border,
-        RightBorder2=medium_border,
-        BottomBorder2=medium_border,
-        LeftBorder2=medium_border
-    ), 'scoring_table_default')
-    _makeCellStyle(doc, 'scoring_sheet_header', dict(
-        VertJustify=2,
-        HoriJustify=2,
-        CharHeight=15,
-        ParaTopMargin=235,
-        ParaLeftMargin=235,
-        ParaBottomMargin=235,
-        ParaRightMargin=235,
-    ), 'scoring_table_default')
-    _makeCellStyle(doc, 'group_results_eliminated', dict(
-        IsCellBackgroundTransparent=False,
-        CellBackColor=0x00CCCCCC,
-    ), 'Default')
-
-    ## prepare number formats
-    nfs = doc.NumberFormats
-    locale = doc.CharLocale
-    fmt_str = nfs.generateFormat(0, locale, False, False, 3, 1)
-    try:
-        number_format_vm = nfs.addNew(fmt_str, locale)
-    except RuntimeException:
-        number_format_vm = nfs.queryKey(fmt_str, locale, False)
-    
-    max_group_size = int(doc.Sheets[constants.SETTINGS].getCellByPosition(1, 0).getValue())
-    groups_per_row = int(doc.Sheets[constants.SETTINGS].getCellByPosition(1, 1).getValue())
-    cut_n = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 2).getValue()
-    rating_is_rank = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 3).getValue() == 1
-    if rating_is_rank:
-        sort_key = lambda x: x.rating
-    else:
-        sort_key = lambda x: -x.rating
-    large_groups_first = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 4).getValue() == 1
-    team_ranking_n = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 5).getValue()
-    fill_random = int(doc.Sheets[constants.SETTINGS].getCellByPosition(1, 6).getValue())
-    
-    if cut_n <= 1:
-        if team_ranking_n <= 0:
-            cut_n = cut_n * len(participants)
-        else:
-            cut_n = cut_n * len(set([p.club for p in participants]))
-    cut_n = round(cut_n)
+    with profiling.phase(profiling.STYLE_SETUP):
+        ## prepare cell styles
+        styles = _StyleRegistry(doc)
+        _createCellStyles(styles, payloads.GROUP_STYLES)
+        thin_border = _makeBorderLine2(0, payloads.THIN_BORDER)
+        medium_border = _makeBorderLine2(0, payloads.MEDIUM_BORDER)
+        thick_border = _makeBorderLine2(0, payloads.THICK_BORDER)
+
+        ## prepare number formats
+        number_format_vm = styles.numberFormat(False, False, 3, 1)
     
-    group_sizes = algorithms.findGroupSizes(len(participants), max_group_size, large_groups_first)
-    groups = algorithms.assignGroups(group_sizes, sorted(participants, key=sort_key), [(lambda p: p.club), (lambda p: p.country)])
-    max_group_size = max(group_sizes)
+    team = plan.team
+    cut_n = plan.cut_n
+    fill_random = plan.settings.fill_groups_random
+    max_group_size = plan.max_group_size
 
     final_ranking_sheet = doc.Sheets[constants.FINAL_RANKING]
-    list_of_fights = doc.Sheets[constants.LIST_OF_FIGHTS]
+    final_ranking = _CellBuffer()
     
-    group_list_sheet = addSheet(doc, constants.GROUP_LIST, 2)
+    with profiling.phase(profiling.GROUP_LIST):
+        group_list_sheet = addSheet(doc, constants.GROUP_LIST, 2)
+    group_list = _CellBuffer()
+    group_list_headers = dict()
+    group_list_ranges = []
     
-    group_results_sheet = addSheet(doc, constants.GROUPS_RESULTS, 3)
-    group_results_sheet.getCellByPosition(0, 0).setString('Rank')
-    group_results_sheet.getCellByPosition(1, 0).setString('Name')
-    if team_ranking_n > 0:
-        group_results_sheet.getCellByPosition(2, 0).setString('Team')
-    else:
-        group_results_sheet.getCellByPosition(2, 0).setString('Club')
-    group_results_sheet.getCellByPosition(3, 0).setString('W/M (↓)')
-    group_results_sheet.getCellByPosition(4, 0).setString('D-R (↓)')
-    group_results_sheet.getCellByPosition(5, 0).setString('D (↓)')
-    group_results_sheet.getCellByPosition(6, 0).setString('R (↑)')
-    group_results_sheet.getCellByPosition(7, 0).setString('RND')
-    group_results_sheet.getCellRangeByPosition(0, 0, 7, 0).HoriJustify = 3
-    group_results_sheet.getCellRangeByPosition(1, 0, 2, 0).HoriJustify = 0
-    group_results_sheet.getCellRangeByPosition(3, 0, 3, 1000).NumberFormat = number_format_vm
-
-    cc.select(group_results_sheet)
-    cc.freezeAtPosition(0, 1)
-
-    if team_ranking_n > 0:
-        group_team_results_sheet = addSheet(doc, constants.GROUPS_TEAM_RESULTS, 4)
-        group_team_results_sheet.getCellByPosition(0, 0).setString('Rank')
-        group_team_results_sheet.getCellByPosition(1, 0).setString('Team')
-        group_team_results_sheet.getCellByPosition(2, 0).setString('∑ Rank (↑)')
-        group_team_results_sheet.getCellByPosition(3, 0).setString('∑ W/M (↓)')
-        group_team_results_sheet.getCellByPosition(4, 0).setString('∑ D-R (↓)')
-        group_team_results_sheet.getCellByPosition(5, 0).setString('∑ D (↓)')
-        group_team_results_sheet.getCellByPosition(6, 0).setString('∑ R (↑)')
-        group_team_results_sheet.getCellByPosition(7, 0).setString('RND')
-        group_team_results_sheet.getCellRangeByPosition(0, 0, 7, 0).HoriJustify = 3
-        group_team_results_sheet.getCellByPosition(1, 0).HoriJustify = 0
-        group_team_results_sheet.getCellRangeByPosition(3, 0, 3, 1000).NumberFormat = number_format_vm
-        teams = set()
-        r = 1
-        for p in participants:
-            if p.club in teams:
-                continue
-            group_team_results_sheet.getCellByPosition(0, r).setValue(r)
-            group_team_results_sheet.getCellByPosition(1, r).setString(p.club)
-            if r > cut_n:
-                rng = group_team_results_sheet.getCellRangeByPosition(0, r, 7, r)
-                rng.CellStyle = 'group_results_eliminated'
-                if r == cut_n + 1:
-                    rng.TopBorder2 = thick_border
-                final_ranking_sheet.getCellByPosition(1, r).setFormula("=$'{}'.{}".format(constants.GROUPS_TEAM_RESULTS, _c2s(1, r)))
-                final_ranking_sheet.getCellByPosition(3, r).setValue(r)
-            
-            teams.add(p.club)
-            r += 1
-        group_team_results_sheet.Columns[0].OptimalWidth = True
-        group_team_results_sheet.Columns[1].OptimalWidth = True
-        group_team_results_sheet.Columns[2].OptimalWidth = True
-        group_team_results_sheet.Columns[3].OptimalWidth = True
-        group_team_results_sheet.Columns[4].OptimalWidth = True
-        group_team_results_sheet.Columns[5].OptimalWidth = True
-        group_team_results_sheet.Columns[6].OptimalWidth = True
-        group_team_results_sheet.Columns[7].OptimalWidth = True
-        cc.select(group_team_results_sheet)
+    with profiling.phase(profiling.GROUPS_RESULTS):
+        group_results_sheet = addSheet(doc, constants.GROUPS_RESULTS, 3)
+        group_results = _CellBuffer()
+        group_results[0, 0] = 'Rank'
+        group_results[1, 0] = 'Name'
+        if team:
+            group_results[2, 0] = 'Team'
+        else:
+            group_results[2, 0] = 'Club'
+        group_results[3, 0] = 'W/M (↓)'
+        group_results[4, 0] = 'D-R (↓)'
+        group_results[5, 0] = 'D (↓)'
+        group_results[6, 0] = 'R (↑)'
+        group_results[7, 0] = 'RND'
+        group_results_sheet.getCellRangeByPosition(0, 0, 7, 0).HoriJustify = 3
+        group_results_sheet.getCellRangeByPosition(1, 0, 2, 0).HoriJustify = 0
+        group_results_sheet.getCellRangeByPosition(3, 0, 3, len(plan.participants)).NumberFormat = number_format_vm
+
+        cc.select(group_results_sheet)
         cc.freezeAtPosition(0, 1)
-        defineDatabaseRange(doc, 'groupTeamResult', group_team_results_sheet, 0, 0, 7, r - 1)
-
-    for i, group in enumerate(groups):
-        schedule = algorithms.makeGroupSchedule(list(range(len(group))))
-        group_name = 'Group {}'.format(i + 1)
-
-        # write group into summary of all groups
-        group_row = (i // groups_per_row) * (2 + max_group_size)
-        group_col = (i % groups_per_row) * 3
-        header_range = group_list_sheet.getCellRangeByPosition(group_col, group_row, group_col + 2, group_row)
-        #header_range.merge(True)
-        header_range.BottomBorder2 = medium_border
-        group_list_sheet.getCellByPosition(group_col, group_row).setString(group_name)
-        
-        # create sheet for the group
-        grp_sheet = addSheet(doc, group_name, 3 + i)
-        grp_sheet.getCellRangeByPosition(0, 0, 1000, 1000).CellStyle = 'scoring_table_default'
-        
+
+        if team:
+            group_team_results_sheet = addSheet(doc, constants.GROUPS_TEAM_RESULTS, 4)
+            # team names are written as they are, not parsed as formulas
+            group_team_results = _CellBuffer(formulas=False)
+            group_team_results[0, 0] = 'Rank'
+            group_team_results[1, 0] = 'Team'
+            group_team_results[2, 0] = '∑ Rank (↑)'
+            group_team_results[3, 0] = '∑ W/M (↓)'
+            group_team_results[4, 0] = '∑ D-R (↓)'
+            group_team_results[5, 0] = '∑ D (↓)'
+            group_team_results[6, 0] = '∑ R (↑)'
+            group_team_results[7, 0] = 'RND'
+            group_team_results_sheet.getCellRangeByPosition(0, 0, 7, 0).HoriJustify = 3
+            group_team_results_sheet.getCellByPosition(1, 0).HoriJustify = 0
+            group_team_results_sheet.getCellRangeByPosition(3, 0, 3, len(plan.teams)).NumberFormat = number_format_vm
+            for r, club in enumerate(plan.teams, 1):
+                group_team_results[0, r] = r
+                group_team_results[1, r] = club
+                if r > cut_n:
+                    final_ranking[1, r] = "=$'{}'.{}".format(constants.GROUPS_TEAM_RESULTS, _c2s(1, r))
+                    final_ranking[3, r] = r
+            group_team_results.write(group_team_results_sheet)
+            r = len(plan.teams) + 1
+            if r - 1 > cut_n:
+                group_team_results_sheet.getCellRangeByPosition(0, cut_n + 1, 7, r - 1).CellStyle = 'group_results_eliminated'
+                group_team_results_sheet.getCellRangeByPosition(0, cut_n + 1, 7, cut_n + 1).TopBorder2 = thick_border
+            group_team_results_sheet.getCellRangeByPosition(0, 0, 7, 0).Columns.OptimalWidth = True
+            cc.select(group_team_results_sheet)
+            cc.freezeAtPosition(0, 1)
+            defineDatabaseRange(doc, 'groupTeamResult', group_team_results_sheet, 0, 0, 7, r - 1)
+
+    # borders of the whole scoring table
+    table_border = _makeTableBorder2(thick_border)
+    # borders of a single group in the summary of all groups
+    group_list_border = _makeTableBorder2(medium_border)
+
+    def makeTemplate(group_plan, fight_cards):
+        """Creates a sheet with the formatting (but no contents) of the sheets of the groups of the size of the group,
+        returns its name.
+        """
+        group = group_plan.participants
+        table_coords = group_plan.table_coords
+        schedule_coords = group_plan.schedule_coords
+        name = _GROUP_TEMPLATE.format(len(group))
+        sheet = addSheet(doc, name)
+        sheet.getCellRangeByPosition(0, 0, *group_plan.extent).CellStyle = 'scoring_table_default'
+
         # sheet header
-        grp_sheet.getCellByPosition(0, 0).setString(group_name)
-        grp_sheet.getCellRangeByPosition(0, 0, len(group) + 5, 1).merge(True)
-        grp_sheet.getCellByPosition(0, 0).CellStyle = 'scoring_sheet_header'
-        
-        grp_sheet.getCellByPosition(0, 2).setString('Ring')
-        grp_sheet.getCellRangeByPosition(0, 2, 1, 2).merge(True)
-        grp_sheet.getCellRangeByPosition(2, 2, len(group) + 5, 2).merge(True)
-        
-        grp_sheet.getCellByPosition(0, 3).setString('Referee')
-        grp_sheet.getCellRangeByPosition(0, 3, 1, 3).merge(True)
-        grp_sheet.getCellRangeByPosition(2, 3, len(group) + 5, 3).merge(True)
-        
-        grp_sheet.getCellByPosition(0, 4).setString('Assistant referee(s)')
-        grp_sheet.getCellRangeByPosition(0, 4, 1, 4).merge(True)
-        grp_sheet.getCellRangeByPosition(2, 4, len(group) + 5, 4).merge(True)
-
-        tb = uno.createUnoStruct('com.sun.star.table.TableBorder2')
-        tb.TopLine = thick_border
-        tb.IsTopLineValid = True
-        tb.LeftLine = thick_border
-        tb.IsLeftLineValid = True
-        tb.BottomLine = thick_border
-        tb.IsBottomLineValid = True
-        tb.RightLine = thick_border
-        tb.IsRightLineValid = True
-        grp_sheet.getCellRangeByPosition(0, 0, len(group) + 5, 1).TableBorder2 = tb
-        tb = uno.createUnoStruct('com.sun.star.table.TableBorder2')
+        sheet.getCellRangeByPosition(0, 0, len(group) + 5, 1).merge(True)
+        sheet.getCellByPosition(0, 0).CellStyle = 'scoring_sheet_header'
+        sheet.getCellRangeByPosition(0, 2, 1, 2).merge(True)
+        sheet.getCellRangeByPosition(2, 2, len(group) + 5, 2).merge(True)
+        sheet.getCellRangeByPosition(0, 3, 1, 3).merge(True)
+        sheet.getCellRangeByPosition(2, 3, len(group) + 5, 3).merge(True)
+        sheet.getCellRangeByPosition(0, 4, 1, 4).merge(True)
+        sheet.getCellRangeByPosition(2, 4, len(group) + 5, 4).merge(True)
+
+        sheet.getCellRangeByPosition(0, 0, len(group) + 5, 1).TableBorder2 = table_border
+        tb = _makeTableBorder2(None)
         tb.BottomLine = thin_border
         tb.IsBottomLineValid = True
-        grp_sheet.getCellRangeByPosition(0, 2, len(group) + 5, 2).TableBorder2 = tb
-        grp_sheet.getCellRangeByPosition(0, 3, len(group) + 5, 3).TableBorder2 = tb
-        
-        # top-left coords for the two parts of the sheet
-        schedule_coords = (len(group) + 7, 0) #(0, 1)
-        table_coords = (0, 5) #(3 * (len(group) // 2) + 1, 1)
-        
-        # table header
-        grp_sheet.getCellByPosition(*_add(table_coords, 1, 0)).setString('Name')
-        grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 0, 0)).setString('V/M')
-        grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 1, 0)).setString('D')
-        grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 2, 0)).setString('R')
-        grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 3, 0)).setString('Signature')
+        sheet.getCellRangeByPosition(0, 2, len(group) + 5, 2).TableBorder2 = tb
+        sheet.getCellRangeByPosition(0, 3, len(group) + 5, 3).TableBorder2 = tb
+
         # inner cells style
-        grp_sheet.getCellRangeByPosition(*_add(table_coords, 0, 0), *_add(table_coords, 0, 1 + len(group) - 1)).CellStyle = 'scoring_table_number'
-        grp_sheet.getCellRangeByPosition(*_add(table_coords, 1, 0), *_add(table_coords, 1, 1 + len(group) - 1)).CellStyle = 'scoring_table_name'
-        grp_sheet.getCellRangeByPosition(*_add(table_coords, 2, 0), *_add(table_coords, 2 + len(group) - 1 + 4, 1 + len(group) - 1)).CellStyle = 'scoring_table_inner'
-        for j, p in enumerate(group):
-            participant_ref = _getParticipantReference(p)
-            club_ref = _getParticipantClubReference(p)
-
-            # write into summary group list
-            num_cell = group_list_sheet.getCellByPosition(group_col, group_row + 1 + j)
-            num_cell.setValue(j + 1)
-            num_cell.LeftBorder2 = medium_border
-            name_cell = group_list_sheet.getCellByPosition(group_col + 1, group_row + 1 + j)
-            name_cell.setFormula('={}'.format(participant_ref))
-            club_cell = group_list_sheet.getCellByPosition(group_col + 2, group_row + 1 + j)
-            club_cell.setFormula('={}'.format(club_ref))
-            club_cell.RightBorder2 = medium_border
-            
-            # write into scoring table
-            # number column
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + j, 0)).setValue(j + 1)
-            # number row
-            grp_sheet.getCellByPosition(*_add(table_coords, 0, 1 + j)).setValue(j + 1)
-            # name
-            grp_sheet.getCellByPosition(*_add(table_coords, 1, 1 + j)).setFormula('={}'.format(participant_ref))
-            # victories / matches
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 0, 1 + j)).setFormula('=({1}) / {0}'.format(len(group) - 1, '+'.join(['IF({} > {}; 1; 0)'.format(_c2s(*_add(table_coords, 2 + k, 1 + j)), _c2s(*_add(table_coords, 2 + j, 1 + k))) for k in range(len(group)) if k != j])))
-            # dealt
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 1, 1 + j)).setFormula('={0}'.format('+'.join([_c2s(*_add(table_coords, 2 + k, 1 + j)) for k in range(len(group)) if k != j])))
-            # received
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + len(group) + 2, 1 + j)).setFormula('={0}'.format('+'.join([_c2s(*_add(table_coords, 2 + j, 1 + k)) for k in range(len(group)) if k != j])))
-            # self-match cell style
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + j, 1 + j)).CellStyle = 'scoring_table_inner_self'
-
-            # write into results table
-            res_row = sum(group_sizes[:i]) + j + 1
-            group_results_sheet.getCellByPosition(0, res_row).setValue(res_row)
-            group_results_sheet.getCellByPosition(1, res_row).setFormula("={}".format(participant_ref))
-            group_results_sheet.getCellByPosition(2, res_row).setFormula("={}".format(club_ref))
-            group_results_sheet.getCellByPosition(3, res_row).setFormula("=$'{}'.{}".format(group_name, _c2s(*_add(table_coords, 2 + len(group) + 0, 1 + j))))
-            group_results_sheet.getCellByPosition(4, res_row).setFormula('={} - {}'.format(_c2s(5, res_row), _c2s(6, res_row)))
-            group_results_sheet.getCellByPosition(5, res_row).setFormula("=$'{}'.{}".format(group_name, _c2s(*_add(table_coords, 2 + len(group) + 1, 1 + j))))
-            group_results_sheet.getCellByPosition(6, res_row).setFormula("=$'{}'.{}".format(group_name, _c2s(*_add(table_coords, 2 + len(group) + 2, 1 + j))))
-            if res_row > cut_n and team_ranking_n <= 0:
-                rng = group_results_sheet.getCellRangeByPosition(0, res_row, 7, res_row)
-                rng.CellStyle = 'group_results_eliminated'
-                if res_row == cut_n + 1:
-                    rng.TopBorder2 = thick_border
-                if team_ranking_n <= 0:
-                    final_ranking_sheet.getCellByPosition(1, res_row).setFormula("=$'{}'.{}".format(constants.GROUPS_RESULTS, _c2s(1, res_row)))
-                    final_ranking_sheet.getCellByPosition(2, res_row).setFormula("=$'{}'.{}".format(constants.GROUPS_RESULTS, _c2s(2, res_row)))
-                    final_ranking_sheet.getCellByPosition(4, res_row).setValue(res_row)
-            
-            # when we are done
-            if j == len(group) - 1:
-                # close off bottom border in summary group list
-                if len(group) < max_group_size:
-                    num_cell = group_list_sheet.getCellByPosition(group_col, group_row + max_group_size)
-                    num_cell.LeftBorder2 = medium_border
-                    name_cell = group_list_sheet.getCellByPosition(group_col + 1, group_row + max_group_size)
-                    club_cell = group_list_sheet.getCellByPosition(group_col + 2, group_row + max_group_size)
-                    club_cell.RightBorder2 = medium_border
-                num_cell.BottomBorder2 = name_cell.BottomBorder2 = club_cell.BottomBorder2 = medium_border
-                
-                # set column widths in scoring table
-                for k in range(len(group) + 6):
-                    grp_sheet.Columns[_add(table_coords, k, 0)[0]].OptimalWidth = True
-                grp_sheet.Columns[_add(table_coords, len(group) + 6, 0)[0]].Width = 100_0
-        
+        sheet.getCellRangeByPosition(*_add(table_coords, 0, 0), *_add(table_coords, 0, 1 + len(group) - 1)).CellStyle = 'scoring_table_number'
+        sheet.getCellRangeByPosition(*_add(table_coords, 1, 0), *_add(table_coords, 1, 1 + len(group) - 1)).CellStyle = 'scoring_table_name'
+        sheet.getCellRangeByPosition(*_add(table_coords, 2, 0), *_add(table_coords, 2 + len(group) - 1 + 4, 1 + len(group) - 1)).CellStyle = 'scoring_table_inner'
+        # self-match cells style
+        _cellRanges(doc, sheet, [_add(table_coords, 2 + j, 1 + j) * 2 for j in range(len(group))]).CellStyle = 'scoring_table_inner_self'
+
         # finalize styling
-        tb = uno.createUnoStruct('com.sun.star.table.TableBorder2')
-        tb.TopLine = thick_border
-        tb.IsTopLineValid = True
-        tb.LeftLine = thick_border
-        tb.IsLeftLineValid = True
-        tb.BottomLine = thick_border
-        tb.IsBottomLineValid = True
-        tb.RightLine = thick_border
-        tb.IsRightLineValid = True
-        grp_sheet.getCellRangeByPosition(*_add(table_coords, 2, 1), *_add(table_coords, 2 + len(group) - 1, 1 + len(group) - 1)).TableBorder2 = tb
-    
-        schedule_cols = 2
-        for j, (a, b) in enumerate(schedule):
-            row = 2 * (j // schedule_cols)
-            col = 3 * (j % schedule_cols)
-            # first participant header
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row)).setValue(a + 1)
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 1, row)).setFormula('={}'.format(_getParticipantReference(group[a])))
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row)).TopBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row)).BottomBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row)).LeftBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row)).RightBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 1, row)).TopBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 1, row)).BottomBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row)).TopBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row)).BottomBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row)).LeftBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row)).RightBorder2 = thick_border
-            # second participant header
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row + 1)).setValue(b + 1)
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 1, row + 1)).setFormula('={}'.format(_getParticipantReference(group[b])))
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row + 1)).BottomBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row + 1)).LeftBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col, row + 1)).RightBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 1, row + 1)).BottomBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row + 1)).BottomBorder2 = thick_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row + 1)).LeftBorder2 = thin_border
-            grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row + 1)).RightBorder2 = thick_border
-            
-            if fill_random > 0:
-                a, b = _random_pair(fill_random)
-                grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row)).setValue(a)
-                grp_sheet.getCellByPosition(*_add(schedule_coords, col + 2, row + 1)).setValue(b)
-            # first participant bindibg
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + b, 1 + a)).setFormula('=IF(ISBLANK({0}); ""; {0})'.format(_c2s(*_add(schedule_coords, col + 2, row))))
-            # second participant binding
-            grp_sheet.getCellByPosition(*_add(table_coords, 2 + a, 1 + b)).setFormula('=IF(ISBLANK({0}); ""; {0})'.format(_c2s(*_add(schedule_coords, col + 2, row + 1))))
-
-            # write into list of fights
-            k = 1
-            while True:
-                if list_of_fights.getCellByPosition(0, k).getString() == '':
-                    break
-                k += 1
-            list_of_fights.getCellByPosition(0, k).setString(group_name)
-            list_of_fights.getCellByPosition(1, k).setFormula('={}'.format(_getParticipantReference(group[a])))
-            list_of_fights.getCellByPosition(2, k).setFormula('={}'.format(_getParticipantReference(group[b])))
-            list_of_fights.getCellByPosition(3, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(group_name, _c2s(*_add(schedule_coords, col + 2, row))))
-            list_of_fights.getCellByPosition(4, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(group_name, _c2s(*_add(schedule_coords, col + 2, row + 1))))
-            list_of_fights.getCellByPosition(5, k).setFormula("=IF($'{0}'.{1} < $'{0}'.{2}; \"Loss\"; \"Win\")".format(group_name, _c2s(*_add(schedule_coords, col + 2, row)), _c2s(*_add(schedule_coords, col + 2, row + 1))))
-    
-        for j in range(schedule_cols):
-            grp_sheet.Columns[_add(schedule_coords, 3 * j + 0, 0)[0]].OptimalWidth = True
-            grp_sheet.Columns[_add(schedule_coords, 3 * j + 1, 0)[0]].OptimalWidth = True
-            grp_sheet.Columns[_add(schedule_coords, 3 * j + 2, 0)[0]].Width = 200_0
-        grp_sheet.Columns[table_coords[0] + 2 + len(group)].IsVisible = False
-        grp_sheet.Columns[table_coords[0] + 2 + len(group) + 1].IsVisible = False
-        grp_sheet.Columns[table_coords[0] + 2 + len(group) + 2].IsVisible = False
+        sheet.getCellRangeByPosition(*_add(table_coords, 2, 1), *_add(table_coords, 2 + len(group) - 1, 1 + len(group) - 1)).TableBorder2 = table_border
+        _applyCellStyles(doc, sheet, dict((payloads.FIGHT_CARD_STYLES[card], ranges) for card, ranges in fight_cards.items()))
+
+        # set the widths of the columns which do not depend on the contents
+        sheet.Columns[_add(table_coords, len(group) + 6, 0)[0]].Width = 100_0
+        for j in range(planning.SCHEDULE_COLS):
+            sheet.Columns[_add(schedule_coords, 3 * j + 2, 0)[0]].Width = 200_0
+        sheet.getCellRangeByPosition(table_coords[0] + 2 + len(group), 0, table_coords[0] + 2 + len(group) + 2, 0).Columns.IsVisible = False
+        return name
+
+    with profiling.phase(profiling.GROUP_SHEETS):
+        # the scores are drawn here, in the order of the fights, so that they do not depend on where the payloads are
+        # built
+        tasks = []
+        for i, group_plan in enumerate(plan.groups):
+            group = group_plan.participants
+            starts = plan.timetable.group_starts[i]
+            headers = [None, None, None]
+            if starts:
+                headers[0] = payloads.ringHeader(plan.timetable.group_rings[i], starts[0])
+            for k, text in enumerate(entered.group_headers.get(i, ())):
+                if text:
+                    headers[k] = text
+            scores = []
+            for a, b in group_plan.fights:
+                fight_scores = _groupScores(entered, group[a], group[b])
+                if fight_scores is None and fill_random > 0:
+                    fight_scores = payloads.randomPair(fill_random)
+                scores.append(fight_scores)
+            rnd = dict((p.row, entered.rnd[p.row]) for p in group if p.row in entered.rnd)
+            tasks.append((group_plan, team, cut_n, headers, scores, rnd, i not in keep))
+        group_payloads = [payloads.makeGroupPayload(*task) for task in tasks]
+
+        # the sheets of the groups are copies of a template with the formatting, made for each size of the groups
+        templates = dict()
+
+        for i, (group_plan, payload) in enumerate(zip(plan.groups, group_payloads)):
+            group = group_plan.participants
+            group_name = group_plan.name
+            table_coords = group_plan.table_coords
+            schedule_coords = group_plan.schedule_coords
+
+            # write group into summary of all groups
+            group_col, group_row = group_plan.list_coords
+            # group names are written after the column widths are set, so that they do not affect them
+            group_list_headers.setdefault(group_row, _CellBuffer())[group_col, group_row] = group_name
+            group_list_ranges.append((group_col, group_row + 1, group_col + 2, group_row + max_group_size))
+            group_list.update(payload.group_list)
+            group_results.update(payload.results)
+            final_ranking.update(payload.final_ranking)
+
+            ring = plan.timetable.group_rings[i]
+            starts = plan.timetable.group_starts[i]
+
+            # create sheet for the group, unless the existing one is kept
+            rebuild = i not in keep
+            if rebuild:
+                template = templates.get(len(group))
+                if template is None:
+                    template = templates[len(group)] = makeTemplate(group_plan, payload.fight_cards)
+                doc.Sheets.copyByName(template, group_name, 3 + i)
+                grp_sheet = doc.Sheets[3 + i]
+
+            # the scores in the scoring table
+            bindings = _CellBuffer()
+            for (fighter1, fighter2, score1, score2), (a_cell, b_cell), start in zip(payload.fights, payload.bindings, starts):
+                # write into list of fights
+                a_result, b_result = fight_log.add(group_name, fighter1, fighter2, score1, score2, ring, start)
+                # first participant binding
+                bindings[a_cell] = '={}'.format(a_result)
+                # second participant binding
+                bindings[b_cell] = '={}'.format(b_result)
+            if not rebuild:
+                kept_sheet = doc.Sheets[group_name]
+                # the fights moved in the Results sheet, which was created again
+                bindings.write(kept_sheet)
+                # and the group may start at another time, unless the Ring field was filled in by hand
+                ring_header = tasks[i][3][0]
+                if ring_header is not None and not entered.group_headers.get(i, ('',))[0]:
+                    kept_sheet.getCellByPosition(2, 2).setString(ring_header)
+            if rebuild:
+                grp_cells = _CellBuffer()
+                grp_cells.update(payload.sheet)
+                grp_cells.update(bindings.cells)
+                grp_cells.write(grp_sheet)
+
+                # set the widths of the columns which depend on the contents
+                grp_sheet.getCellRangeByPosition(*_add(table_coords, 0, 0), *_add(table_coords, len(group) + 5, 0)).Columns.OptimalWidth = True
+                for j in range(planning.SCHEDULE_COLS):
+                    grp_sheet.Columns[_add(schedule_coords, 3 * j + 0, 0)[0]].OptimalWidth = True
+                    grp_sheet.Columns[_add(schedule_coords, 3 * j + 1, 0)[0]].OptimalWidth = True
+
+        for template in templates.values():
+            doc.Sheets.removeByName(template)
     
-    group_names = dict()
-    max_row = 0
-    max_col = 0
-    for i in range(len(groups)):
-        group_row = (i // groups_per_row) * (2 + max_group_size)
-        group_col = (i % groups_per_row) * 3
-        group_cell = group_list_sheet.getCellByPosition(group_col, group_row)
-        group_names[i] = group_cell.getString()
-        group_cell.setString('')
-        max_row = max(max_row, group_row + max_group_size)
-        max_col = max(max_col, group_col + 2)
-    for i in range(len(groups)):
-        group_col = (i % groups_per_row) * 3
-        group_list_sheet.Columns[group_col].OptimalWidth = True
-        group_list_sheet.Columns[group_col + 1].OptimalWidth = True
-        group_list_sheet.Columns[group_col + 2].OptimalWidth = True
-    for i in range(len(groups)):
-        group_row = (i // groups_per_row) * (2 + max_group_size)
-        group_col = (i % groups_per_row) * 3
-        group_cell = group_list_sheet.getCellByPosition(group_col, group_row)
-        group_cell.setString(group_names[i])
-    defineDatabaseRange(doc, 'groupList', group_list_sheet, 0, 0, max_col, max_row)
+    with profiling.phase(profiling.GROUP_LIST):
+        group_list.write(group_list_sheet)
+        _cellRanges(doc, group_list_sheet, group_list_ranges).TableBorder2 = group_list_border
+        max_row = max(r for _, _, _, r in group_list_ranges)
+        max_col = max(c for _, _, c, _ in group_list_ranges)
+        group_list_sheet.getCellRangeByPosition(0, 0, max_col, 0).Columns.OptimalWidth = True
+        for headers in group_list_headers.values():
+            headers.write(group_list_sheet)
+        defineDatabaseRange(doc, 'groupList', group_list_sheet, 0, 0, max_col, max_row)
     
-    group_results_sheet.Columns[0].OptimalWidth = True
-    group_results_sheet.Columns[1].OptimalWidth = True
-    group_results_sheet.Columns[2].OptimalWidth = True
-    group_results_sheet.Columns[3].OptimalWidth = True
-    group_results_sheet.Columns[4].OptimalWidth = True
-    group_results_sheet.Columns[5].OptimalWidth = True
-    group_results_sheet.Columns[6].OptimalWidth = True
-    group_results_sheet.Columns[7].OptimalWidth = True
-    defineDatabaseRange(doc, 'groupResult', group_results_sheet, 0, 0, 7, len(participants))
-
-
-def createElimination(doc, participants):
-    teams = sorted(list(set([p.club for p in participants])))
-    border = _makeBorderLine2(LineStyle=0, LineWidth=35)
-    _makeCellStyle(doc, 'elimination_bracket_line', dict(
-        LeftBorder2=border
-    ), 'Default')
-    _makeCellStyle(doc, 'elimination_cell', dict(
-        VertJustify=2,
-        TopBorder2=border,
-        LeftBorder2=border,
-        BottomBorder2=border,
-        RightBorder2=border,
-    ), 'Default')
-    _makeCellStyle(doc, 'elimination_number', dict(
-        HoriJustify=0
-    ), 'elimination_cell')
-    _makeCellStyle(doc, 'elimination_name', dict(
-        HoriJustify=1
-    ), 'elimination_cell')
-
-    if constants.ELIMINATION in doc.Sheets:
-        doc.Sheets.removeByName(constants.ELIMINATION)
-    el = addSheet(doc, constants.ELIMINATION, len(doc.Sheets) - 2)
-
-    team = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 5).getValue() > 0
-
+    with profiling.phase(profiling.GROUPS_RESULTS):
+        group_results.write(group_results_sheet)
+        if not team and len(plan.participants) > cut_n:
+            group_results_sheet.getCellRangeByPosition(0, cut_n + 1, 7, len(plan.participants)).CellStyle = 'group_results_eliminated'
+            group_results_sheet.getCellRangeByPosition(0, cut_n + 1, 7, cut_n + 1).TopBorder2 = thick_border
+        group_results_sheet.getCellRangeByPosition(0, 0, 7, 0).Columns.OptimalWidth = True
+        defineDatabaseRange(doc, 'groupResult', group_results_sheet, 0, 0, 7, len(plan.participants))
+
+    with profiling.phase(profiling.FINAL_RANKING):
+        final_ranking.write(final_ranking_sheet)
+    fight_log.flush()
+
+    if keep:
+        # the re-created group sheets were inserted among the kept ones
+        names = [constants.PARTICIPANT_LIST, constants.SETTINGS, constants.GROUP_LIST]
+        names += [g.name for g in plan.groups]
+        names += [constants.GROUPS_RESULTS] + ([constants.GROUPS_TEAM_RESULTS] if team else [])
+        names += [constants.FINAL_RANKING, constants.LIST_OF_FIGHTS, constants.RESULTS]
+        _orderSheets(doc, names)
+
+
+def createElimination(doc, plan, fight_log, entered=None):
+    """Writes the elimination bracket of the plan and the elimination part of the final ranking.
+
+    If the bracket in ``entered`` (see :func:`loadEnteredResults`) is the same, its scores are written into it.
+    """
+    with profiling.phase(profiling.STYLE_SETUP):
+        _createCellStyles(_StyleRegistry(doc), payloads.ELIMINATION_STYLES)
+
+    with profiling.phase(profiling.ELIMINATION):
+        if constants.ELIMINATION in doc.Sheets:
+            doc.Sheets.removeByName(constants.ELIMINATION)
+        el = addSheet(doc, constants.ELIMINATION, len(doc.Sheets) - 3)
+
+    team = plan.team
     final_ranking_sheet = doc.Sheets[constants.FINAL_RANKING]
-    list_of_fights = doc.Sheets[constants.LIST_OF_FIGHTS]
-
-    fill_random = int(doc.Sheets[constants.SETTINGS].getCellByPosition(1, 7).getValue())
-
-    cut_n = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 2).getValue()
-    if cut_n <= 1:
-        if team:
-            cut_n = cut_n * len(teams)
-        else:
-            cut_n = cut_n * len(participants)
-    cut_n = round(cut_n)
-    
-    el_participants = list(range(cut_n))
-
-    layer, num_layers = algorithms.makeElimination(el_participants)
-    ln = 0
-    number_width = None
-    name_width = None
-    small_final = None
-    processed_fights = 0
-    while ln < num_layers:
-        next_layer = []
-        if team:
-            col = 3 * ln
-        else:
-            col = 4 * ln
-        finish = False
-        if small_final is not None:
-            finish = True
-        for i in range(len(layer)):
-            row = (4 * 2**ln) * i
-
-            if ln > 0:
-                row += sum([2**k for k in range(1, ln + 1)])
-
-            winner = '=IF({0} > {1}; {2}; IF({0} < {1}; {3}; ""))'
-            loser = '=IF({0} < {1}; {2}; IF({0} > {1}; {3}; ""))'
-            
-            top_number_cell = el.getCellByPosition(col, row)
-            top_number_cell_addr = _c2s(top_number_cell.getCellAddress().Column, top_number_cell.getCellAddress().Row)
-            if team:
-                top_name_cell = el.getCellByPosition(col + 1, row)
-                top_score_cell = el.getCellByPosition(col + 2, row)
-            else:
-                top_name_cell = el.getCellByPosition(col + 1, row)
-                top_club_cell = el.getCellByPosition(col + 2, row)
-                top_score_cell = el.getCellByPosition(col + 3, row)
-                top_club_cell_addr = _c2s(top_club_cell.getCellAddress().Column, top_club_cell.getCellAddress().Row)
-            top_name_cell_addr = _c2s(top_name_cell.getCellAddress().Column, top_name_cell.getCellAddress().Row)
-            top_score_cell_addr = _c2s(top_score_cell.getCellAddress().Column, top_score_cell.getCellAddress().Row)
-            
-            bottom_number_cell = el.getCellByPosition(col, row + 1)
-            bottom_number_cell_addr = _c2s(bottom_number_cell.getCellAddress().Column, bottom_number_cell.getCellAddress().Row)
-            if team:
-                bottom_name_cell = el.getCellByPosition(col + 1, row + 1)
-                bottom_score_cell = el.getCellByPosition(col + 2, row + 1)
-            else:
-                bottom_name_cell = el.getCellByPosition(col + 1, row + 1)
-                bottom_club_cell = el.getCellByPosition(col + 2, row + 1)
-                bottom_score_cell = el.getCellByPosition(col + 3, row + 1)
-                bottom_club_cell_addr = _c2s(bottom_club_cell.getCellAddress().Column, bottom_club_cell.getCellAddress().Row)
-            bottom_name_cell_addr = _c2s(bottom_name_cell.getCellAddress().Column, bottom_name_cell.getCellAddress().Row)
-            bottom_score_cell_addr = _c2s(bottom_score_cell.getCellAddress().Column, bottom_score_cell.getCellAddress().Row)
-
-            el.getCellRangeByPosition(col, row, col, row + 1).CellStyle = 'elimination_number'
-            el.getCellRangeByPosition(col + 1, row, col + 1, row + 1).CellStyle = 'elimination_name'
-            if team:
-                el.getCellRangeByPosition(col + 2, row, col + 2, row + 1).CellStyle = 'elimination_number'
-            else:
-                el.getCellRangeByPosition(col + 2, row, col + 2, row + 1).CellStyle = 'elimination_name'
-                el.getCellRangeByPosition(col + 3, row, col + 3, row + 1).CellStyle = 'elimination_number'
-
-            if fill_random > 0:
-                random_a, random_b = _random_pair(fill_random)
-
+    fill_random = plan.settings.fill_elimination_random
+    scores = dict()
+    if entered is not None and entered.elimination == (plan.cut_n, team):
+        scores = entered.elimination_scores
+
+    layout = payloads.bracketLayout(plan.cut_n, team)
+    fights = layout.plan.fights
+    layers = [_CellBuffer() for _ in range(layout.plan.num_layers)]
+    for cells, contents in zip(layers, layout.cells):
+        cells.update(contents)
+    final_ranking = _CellBuffer()
+    final_ranking.update(layout.ranking)
+
+    # references to the scores of the listed fights in the Results sheet, by the index of the fight
+    results = dict()
+    for i, fight in enumerate(fights):
+        if fill_random > 0:
+            random_scores = payloads.randomPair(fill_random)
+        for k, coords in enumerate(layout.score_cells[i]):
+            if coords is None:
+                continue
+            if coords in scores:
+                layers[fight.layer][coords] = scores[coords]
+            elif fill_random > 0:
+                layers[fight.layer][coords] = random_scores[k]
+        if fight.phase is not None:
+            ring, start = plan.timetable.elimination[i]
+            results[i] = fight_log.add(fight.phase, *payloads.eliminationFight(fight, team), ring=ring, start=start)
+    for ln, c, r, template, i in layout.outcomes:
+        layers[ln][c, r] = template.format(*results[i])
+    for c, r, template, i in layout.ranking_outcomes:
+        final_ranking[c, r] = template.format(*results[i])
+
+    with profiling.phase(profiling.ELIMINATION):
+        _applyCellStyles(doc, el, layout.styles)
+        for cells in layers:
+            cells.write(el)
+
+        # set column widths
+        width = 3 if team else 4
+        for ln in range(plan.elimination.num_layers):
+            col = width * ln
             if ln == 0:
-                if team:
-                    source_sheet = constants.GROUPS_TEAM_RESULTS
-                else:
-                    source_sheet = constants.GROUPS_RESULTS
-                if layer[i][0] is None:
-                    top_score_cell.setValue(-1)
-                else:
-                    top_number_cell.setFormula("=$'{}'.A{}".format(source_sheet, layer[i][0] + 2))
-                    top_name_cell.setFormula("=$'{}'.B{}".format(source_sheet, layer[i][0] + 2))
-                    if not team:
-                        top_club_cell.setFormula("=$'{}'.C{}".format(source_sheet, layer[i][0] + 2))
-                    if layer[i][1] is None:
-                        top_score_cell.setValue(0)
-                    elif fill_random > 0:
-                        top_score_cell.setValue(random_a)
-                if layer[i][1] is None:
-                    bottom_score_cell.setValue(-1)
-                else:
-                    bottom_number_cell.setFormula("=$'{}'.A{}".format(source_sheet, layer[i][1] + 2))
-                    bottom_name_cell.setFormula("=$'{}'.B{}".format(source_sheet, layer[i][1] + 2))
-                    if not team:
-                        bottom_club_cell.setFormula("=$'{}'.C{}".format(source_sheet, layer[i][1] + 2))
-                    if layer[i][0] is None:
-                        bottom_score_cell.setValue(0)
-                    elif fill_random > 0:
-                        bottom_score_cell.setValue(random_b)
-            else:
-                vert_bracket_len = 2 * (2**(ln - 1) - 1)
-                if vert_bracket_len > 0:
-                    c = top_number_cell.getCellAddress().Column
-                    r = top_number_cell.getCellAddress().Row
-                    el.getCellRangeByPosition(c, r - vert_bracket_len, c, r - 1).CellStyle = 'elimination_bracket_line'
-                    c = bottom_number_cell.getCellAddress().Column
-                    r = bottom_number_cell.getCellAddress().Row
-                    el.getCellRangeByPosition(c, r + 1, c, r + vert_bracket_len).CellStyle = 'elimination_bracket_line'
-                
-                if fill_random > 0:
-                    top_score_cell.setValue(random_a)
-                    bottom_score_cell.setValue(random_b)
-
-                top_number = layer[i][0][0]
-                top_name = layer[i][0][1]
-                bottom_number = layer[i][1][0]
-                bottom_name = layer[i][1][1]
-                top_number_cell.setFormula(top_number)
-                top_name_cell.setFormula(top_name)
-                bottom_number_cell.setFormula(bottom_number)
-                bottom_name_cell.setFormula(bottom_name)
+                el.Columns[col].OptimalWidth = True
+                el.Columns[col + 1].OptimalWidth = True
                 if not team:
-                    top_club = layer[i][0][2]
-                    bottom_club = layer[i][1][2]
-                    top_club_cell.setFormula(top_club)
-                    bottom_club_cell.setFormula(bottom_club)
-            
-            if layer[i][0] is not None and layer[i][1] is not None and not finish:
-                # write into list of fights
-                k = 1
-                while True:
-                    if list_of_fights.getCellByPosition(0, k).getString() == '':
-                        break
-                    k += 1
-                phase_n = 2**(num_layers - ln)
-                if team:
-                    phase_name = 'Team elimination {}'.format(phase_n)
-                    if phase_n == 4:
-                        phase_name = 'Team semi-finals'
-                    elif phase_n == 8:
-                        phase_name = 'Team quarter-finals'
-                    else:
-                        phase_name = 'Team elimination 1/{}'.format(phase_n // 2)
-                else:
-                    phase_name = 'Elimination {}'.format(phase_n)
-                    if phase_n == 4:
-                        phase_name = 'Semi-finals'
-                    elif phase_n == 8:
-                        phase_name = 'Quarter-finals'
-                    else:
-                        phase_name = 'Elimination 1/{}'.format(phase_n // 2)
-                list_of_fights.getCellByPosition(0, k).setString(phase_name)
-                list_of_fights.getCellByPosition(1, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_name_cell_addr))
-                list_of_fights.getCellByPosition(2, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_name_cell_addr))
-                list_of_fights.getCellByPosition(3, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_score_cell_addr))
-                list_of_fights.getCellByPosition(4, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_score_cell_addr))
-                list_of_fights.getCellByPosition(5, k).setFormula("=IF($'{0}'.{1} < $'{0}'.{2}; \"Loss\"; \"Win\")".format(constants.ELIMINATION, top_score_cell_addr, bottom_score_cell_addr))
-            
-            if team:
-                refs = (winner.format(top_score_cell_addr, bottom_score_cell_addr, top_number_cell_addr, bottom_number_cell_addr),
-                        winner.format(top_score_cell_addr, bottom_score_cell_addr, top_name_cell_addr, bottom_name_cell_addr))
-            else:
-                refs = (winner.format(top_score_cell_addr, bottom_score_cell_addr, top_number_cell_addr, bottom_number_cell_addr),
-                        winner.format(top_score_cell_addr, bottom_score_cell_addr, top_name_cell_addr, bottom_name_cell_addr),
-                        winner.format(top_score_cell_addr, bottom_score_cell_addr, top_club_cell_addr, bottom_club_cell_addr))
-            if layer[i][0] is not None and layer[i][1] is not None and len(layer) > 2:
-                final_ranking_sheet.getCellByPosition(1, cut_n - processed_fights).setFormula(loser.format(
-                    "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, top_name_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_name_cell_addr),
-                ))
-                if team:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setValue(2**(num_layers - ln))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                else:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_club_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_club_cell_addr),
-                    ))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setValue(2**(num_layers - ln))
-                    final_ranking_sheet.getCellByPosition(4, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                processed_fights += 1
-            elif finish:
-                final_ranking_sheet.getCellByPosition(1, cut_n - processed_fights).setFormula(loser.format(
-                    "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, top_name_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_name_cell_addr),
-                ))
-                if team:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setValue(2.2)
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                else:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_club_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_club_cell_addr),
-                    ))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setValue(2.2)
-                    final_ranking_sheet.getCellByPosition(4, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                processed_fights += 1
-                final_ranking_sheet.getCellByPosition(1, cut_n - processed_fights).setFormula(winner.format(
-                    "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, top_name_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_name_cell_addr),
-                ))
-                if team:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setValue(2.1)
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                else:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_club_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_club_cell_addr),
-                    ))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setValue(2.1)
-                    final_ranking_sheet.getCellByPosition(4, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                processed_fights += 1
-
-                # write into list of fights
-                k = 1
-                while True:
-                    if list_of_fights.getCellByPosition(0, k).getString() == '':
-                        break
-                    k += 1
-                if team:
-                    list_of_fights.getCellByPosition(0, k).setString(constants.TEAM_FINAL)
-                else:
-                    list_of_fights.getCellByPosition(0, k).setString(constants.FINAL)
-                list_of_fights.getCellByPosition(1, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_name_cell_addr))
-                list_of_fights.getCellByPosition(2, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_name_cell_addr))
-                list_of_fights.getCellByPosition(3, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_score_cell_addr))
-                list_of_fights.getCellByPosition(4, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_score_cell_addr))
-                list_of_fights.getCellByPosition(5, k).setFormula("=IF($'{0}'.{1} < $'{0}'.{2}; \"Loss\"; \"Win\")".format(constants.ELIMINATION, top_score_cell_addr, bottom_score_cell_addr))
-            
-            if finish:
-                row += 2 + vert_bracket_len + 2 + 2
-                top_number_cell = el.getCellByPosition(col, row)
-                top_name_cell = el.getCellByPosition(col + 1, row)
-                if team:
-                    top_score_cell = el.getCellByPosition(col + 2, row)
-                else:
-                    top_club_cell = el.getCellByPosition(col + 2, row)
-                    top_score_cell = el.getCellByPosition(col + 3, row)
-                bottom_number_cell = el.getCellByPosition(col, row + 1)
-                bottom_name_cell = el.getCellByPosition(col + 1, row + 1)
-                if team:
-                    bottom_score_cell = el.getCellByPosition(col + 2, row + 1)
-                else:
-                    bottom_club_cell = el.getCellByPosition(col + 2, row + 1)
-                    bottom_score_cell = el.getCellByPosition(col + 3, row + 1)
-                top_number_cell_addr = _c2s(top_number_cell.getCellAddress().Column, top_number_cell.getCellAddress().Row)
-                top_name_cell_addr = _c2s(top_name_cell.getCellAddress().Column, top_name_cell.getCellAddress().Row)
-                if team:
-                    top_score_cell_addr = _c2s(top_score_cell.getCellAddress().Column, top_score_cell.getCellAddress().Row)
-                else:
-                    top_club_cell_addr = _c2s(top_club_cell.getCellAddress().Column, top_club_cell.getCellAddress().Row)
-                    top_score_cell_addr = _c2s(top_score_cell.getCellAddress().Column, top_score_cell.getCellAddress().Row)
-                bottom_number_cell_addr = _c2s(bottom_number_cell.getCellAddress().Column, bottom_number_cell.getCellAddress().Row)
-                bottom_name_cell_addr = _c2s(bottom_name_cell.getCellAddress().Column, bottom_name_cell.getCellAddress().Row)
-                if team:
-                    bottom_score_cell_addr = _c2s(bottom_score_cell.getCellAddress().Column, bottom_score_cell.getCellAddress().Row)
-                else:
-                    bottom_club_cell_addr = _c2s(bottom_club_cell.getCellAddress().Column, bottom_club_cell.getCellAddress().Row)
-                    bottom_score_cell_addr = _c2s(bottom_score_cell.getCellAddress().Column, bottom_score_cell.getCellAddress().Row)
-                el.getCellRangeByPosition(col, row, col, row + 1).CellStyle = 'elimination_number'
-                el.getCellRangeByPosition(col + 1, row, col + 1, row + 1).CellStyle = 'elimination_name'
-                if team:
-                    el.getCellRangeByPosition(col + 2, row, col + 2, row + 1).CellStyle = 'elimination_number'
-                else:
-                    el.getCellRangeByPosition(col + 2, row, col + 2, row + 1).CellStyle = 'elimination_name'
-                    el.getCellRangeByPosition(col + 3, row, col + 3, row + 1).CellStyle = 'elimination_number'
-                
-                if fill_random > 0:
-                    top_score_cell.setValue(random_a)
-                    bottom_score_cell.setValue(random_b)
-                
-                top_number = small_final[0][0]
-                top_name = small_final[0][1]
+                    el.Columns[col + 2].OptimalWidth = True
+                number_width = el.Columns[col].Width
+                name_width = el.Columns[col + 1].Width
                 if not team:
-                    top_club = small_final[0][2]
-                bottom_number = small_final[1][0]
-                bottom_name = small_final[1][1]
-                if not team:
-                    bottom_club = small_final[1][2]
-                top_number_cell.setFormula(top_number)
-                top_name_cell.setFormula(top_name)
-                if not team:
-                    top_club_cell.setFormula(top_club)
-                bottom_number_cell.setFormula(bottom_number)
-                bottom_name_cell.setFormula(bottom_name)
+                    club_width = el.Columns[col + 2].Width
+            else:
+                el.Columns[col].Width = number_width
+                el.Columns[col + 1].Width = name_width
                 if not team:
-                    bottom_club_cell.setFormula(bottom_club)
-
-                final_ranking_sheet.getCellByPosition(1, cut_n - processed_fights).setFormula(loser.format(
-                    "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, top_name_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_name_cell_addr),
-                ))
-                if team:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setValue(2.4)
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                else:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_club_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_club_cell_addr),
-                    ))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setValue(2.4)
-                    final_ranking_sheet.getCellByPosition(4, cut_n - processed_fights).setFormula(loser.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                processed_fights += 1
-
-                final_ranking_sheet.getCellByPosition(1, cut_n - processed_fights).setFormula(winner.format(
-                    "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, top_name_cell_addr),
-                    "$'{}'.{}".format(constants.ELIMINATION, bottom_name_cell_addr),
-                ))
-                if team:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setValue(2.3)
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                else:
-                    final_ranking_sheet.getCellByPosition(2, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_club_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_club_cell_addr),
-                    ))
-                    final_ranking_sheet.getCellByPosition(3, cut_n - processed_fights).setValue(2.3)
-                    final_ranking_sheet.getCellByPosition(4, cut_n - processed_fights).setFormula(winner.format(
-                        "$'{}'.{}".format(constants.ELIMINATION, top_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_score_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, top_number_cell_addr),
-                        "$'{}'.{}".format(constants.ELIMINATION, bottom_number_cell_addr),
-                    ))
-                processed_fights += 1
-
-                # write into list of fights
-                k = 1
-                while True:
-                    if list_of_fights.getCellByPosition(0, k).getString() == '':
-                        break
-                    k += 1
-                if team:
-                    list_of_fights.getCellByPosition(0, k).setString(constants.TEAM_SMALL_FINAL)
-                else:
-                    list_of_fights.getCellByPosition(0, k).setString(constants.SMALL_FINAL)
-                list_of_fights.getCellByPosition(1, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_name_cell_addr))
-                list_of_fights.getCellByPosition(2, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_name_cell_addr))
-                list_of_fights.getCellByPosition(3, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, top_score_cell_addr))
-                list_of_fights.getCellByPosition(4, k).setFormula("=IF(ISBLANK($'{0}'.{1}); \"\"; $'{0}'.{1})".format(constants.ELIMINATION, bottom_score_cell_addr))
-                list_of_fights.getCellByPosition(5, k).setFormula("=IF($'{0}'.{1} < $'{0}'.{2}; \"Loss\"; \"Win\")".format(constants.ELIMINATION, top_score_cell_addr, bottom_score_cell_addr))
-            
-            if i % 2 == 0:
-                next_layer.append((refs, None))
+                    el.Columns[col + 2].Width = club_width
+            if team:
+                el.Columns[col + 2].Width = 100_0
             else:
-                next_layer[-1] = (next_layer[-1][0], refs)
-            if len(layer) == 2:
-                if team:
-                    refs = (loser.format(top_score_cell_addr, bottom_score_cell_addr, top_number_cell_addr, bottom_number_cell_addr),
-                            loser.format(top_score_cell_addr, bottom_score_cell_addr, top_name_cell_addr, bottom_name_cell_addr))
-                else:
-                    refs = (loser.format(top_score_cell_addr, bottom_score_cell_addr, top_number_cell_addr, bottom_number_cell_addr),
-                            loser.format(top_score_cell_addr, bottom_score_cell_addr, top_name_cell_addr, bottom_name_cell_addr),
-                            loser.format(top_score_cell_addr, bottom_score_cell_addr, top_club_cell_addr, bottom_club_cell_addr))
-                if i % 2 == 0:
-                    small_final = (refs, None)
-                else:
-                    small_final = (small_final[0], refs)
-
-        if ln == 0:
-            el.Columns[col].OptimalWidth = True
-            el.Columns[col + 1].OptimalWidth = True
-            if not team:
-                el.Columns[col + 2].OptimalWidth = True
-            number_width = el.Columns[col].Width
-            name_width = el.Columns[col + 1].Width
-            if not team:
-                club_width = el.Columns[col + 2].Width
-        else:
-            el.Columns[col].Width = number_width
-            el.Columns[col + 1].Width = name_width
-            if not team:
-                el.Columns[col + 2].Width = club_width
-        if team:
-            el.Columns[col + 2].Width = 100_0
-        else:
-            el.Columns[col + 2].IsVisible = False
-            el.Columns[col + 3].Width = 278_0
-        if finish:
-            break
-        layer = next_layer
-        ln += 1
-
-
-def _getParticipantReference(participant):
-    return "$'{}'.{}".format(constants.PARTICIPANT_LIST, _c2s(0, participant.row))
+                el.Columns[col + 2].IsVisible = False
+                el.Columns[col + 3].Width = 278_0
+    with profiling.phase(profiling.FINAL_RANKING):
+        final_ranking.write(final_ranking_sheet)
+    fight_log.flush()
+
+
+# name of the template sheet of the groups of the given size, see createGroups
+_GROUP_TEMPLATE = 'Group template {}'
+
+_NOTHING_ENTERED = planning.EnteredResults([], dict(), dict(), dict(), None, dict())
+
+_PARTICIPANT_REFERENCE = re.compile(r"^=\$'{}'\.A(\d+)$".format(re.escape(constants.PARTICIPANT_LIST)))
+_SEED_REFERENCE = re.compile(r"^=\$'({}|{})'\.A\d+$".format(re.escape(constants.GROUPS_RESULTS), re.escape(constants.GROUPS_TEAM_RESULTS)))
+_GROUP_SHEET = re.compile(r'^Group (\d+)$')
+
+
+def loadEnteredResults(doc):
+    """Loads the groups and everything entered into the scheduled tournament - the scores of the group fights, the
+    ring and referees of the groups, RND in Groups - results and the scores of the elimination bracket.
+    """
+    group_sheets = sorted((int(m.group(1)), m.group(0)) for m in map(_GROUP_SHEET.match, doc.Sheets.getElementNames()) if m)
+    groups = []
+    group_scores = dict()
+    group_headers = dict()
+    for i, (_, name) in enumerate(group_sheets):
+        cells = _usedArea(doc.Sheets[name])
+        x, y = planning.TABLE_COORDS
+        rows = []
+        while y + 1 + len(rows) < len(cells):
+            m = _PARTICIPANT_REFERENCE.match(cells[y + 1 + len(rows)][x + 1])
+            if m is None:
+                break
+            rows.append(int(m.group(1)) - 1)
+        groups.append(rows)
+        if len(cells) > 4 and len(cells[2]) > 2:
+            # the generated ring and start are not kept, they are generated again from the new timetable
+            ring = '' if payloads.isRingHeader(cells[2][2]) else cells[2][2]
+            group_headers[i] = (ring, cells[3][2], cells[4][2])
+        group_plan = planning.makeGroupPlan(i, rows, len(rows), 1, 1)
+        for (a, b), (col, row) in zip(group_plan.fights, group_plan.fight_coords):
+            # the used area ends before the scores which were not entered yet
+            scores = tuple(cells[r][col + 2] if r < len(cells) and col + 2 < len(cells[r]) else '' for r in (row, row + 1))
+            if scores != ('', ''):
+                group_scores[rows[a], rows[b]] = scores
+
+    rnd = dict()
+    if constants.GROUPS_RESULTS in doc.Sheets:
+        for row in _usedArea(doc.Sheets[constants.GROUPS_RESULTS])[1:]:
+            m = _PARTICIPANT_REFERENCE.match(row[1]) if len(row) > 7 else None
+            if m is not None and row[7] != '':
+                rnd[int(m.group(1)) - 1] = row[7]
+
+    elimination = None
+    elimination_scores = dict()
+    if constants.ELIMINATION in doc.Sheets:
+        seeds = []
+        for r, row in enumerate(_usedArea(doc.Sheets[constants.ELIMINATION])):
+            for c, content in enumerate(row):
+                m = _SEED_REFERENCE.match(content)
+                if m is not None:
+                    seeds.append(m.group(1))
+                elif content != '' and not content.startswith('='):
+                    elimination_scores[c, r] = content
+        elimination = (len(seeds), constants.GROUPS_TEAM_RESULTS in seeds)
+
+    return planning.EnteredResults(groups, group_scores, group_headers, rnd, elimination, elimination_scores)
+
+
+def snapshotPath(doc):
+    """Path of the snapshot of the document, <document>-snapshot.ndjson next to it, or None if the document was not
+    saved yet.
+    """
+    if not doc.URL:
+        return None
+    return os.path.splitext(uno.fileUrlToSystemPath(doc.URL))[0] + '-snapshot.ndjson'
+
+
+def saveSnapshot(doc):
+    """Brings the snapshot of the document up to date (see :func:`snapshots.save`), if the document was saved already.
+    Returns None if the snapshot is up to date, otherwise why it is not - a failed snapshot must not break the macro
+    which saves it.
+    """
+    path = snapshotPath(doc)
+    if path is None:
+        return 'The snapshot is written next to the document. Save the document first.'
+    try:
+        snapshots.save(path, loadParticipantRows(doc), loadSettingValues(doc), loadEnteredResults(doc))
+    except (OSError, ValueError) as e:
+        return str(e)
+    return None
 
 
-def _getParticipantClubReference(participant):
-    return "$'{}'.{}".format(constants.PARTICIPANT_LIST, _c2s(1, participant.row))
+def _groupScores(entered, a, b):
+    """Scores entered for the fight of participants a and b (in this order), or None."""
+    if (a.row, b.row) in entered.group_scores:
+        return entered.group_scores[a.row, b.row]
+    if (b.row, a.row) in entered.group_scores:
+        return tuple(reversed(entered.group_scores[b.row, a.row]))
+    return None
 
 
-def _makeCellStyle(doc, name, props, parent=None):
-    new_style = doc.createInstance('com.sun.star.style.CellStyle')
-    cell_styles = doc.getStyleFamilies()['CellStyles']
-    if cell_styles.hasByName(name):
-        cell_styles.removeByName(name)
-    cell_styles.insertByName(name, new_style)
-    new_style.setPropertyValues(tuple(props.keys()), tuple(props.values()))
-    if parent is not None:
-        new_style.setParentStyle(parent)
+def _usedArea(sheet):
+    """Formulas of the used area of the sheet (from A1), read by a single call."""
+    cursor = sheet.createCursor()
+    cursor.gotoEndOfUsedArea(False)
+    address = cursor.RangeAddress
+    return sheet.getCellRangeByPosition(0, 0, address.EndColumn, address.EndRow).getFormulaArray()
+
+
+def _orderSheets(doc, names):
+    """Moves the sheets with the given names to the given order, at the beginning of the document."""
+    for i, name in enumerate(names):
+        if doc.Sheets.getElementNames()[i] != name:
+            doc.Sheets.moveByName(name, i)
+
+
+class FightLog(object):
+    """Writer of the rows of the List of fights sheet.
+
+    Keeps track of the next free row of the sheet, so that fights are appended without searching for it, and collects
+    the rows in Python until :meth:`flush` writes all of them with a single range call.
+    """
+
+    def __init__(self, sheet, results_sheet, time_format, row=1):
+        self.sheet = sheet
+        self.results_sheet = results_sheet
+        self.time_format = time_format
+        self.row = row
+        self.rows = []
+        self.results = []
+
+    def add(self, phase, fighter1, fighter2, score1, score2, ring=None, start=None):
+        """Appends a fight, returns the references to its scores in the Results sheet.
+
+        ``fighter1`` and ``fighter2`` are the contents of the fighter cells, ``score1`` and ``score2`` are references
+        to the cells the scores of the fighters are filled into. The Results sheet is the only place referencing these
+        cells, everything else derived from the scores should use the returned references.
+        ``ring`` (0-based) and ``start`` (minutes from the start of the tournament) are those of the timetable.
+        """
+        row = self.row + len(self.rows)
+        result, listed = payloads.fightRows(row, phase, fighter1, fighter2, score1, score2, ring, start)
+        self.results.append(result)
+        self.rows.append(listed)
+        return payloads.resultReference(4, row), payloads.resultReference(5, row)
+
+    def flush(self):
+        """Writes the fights added since the last flush into the sheets."""
+        if not self.rows:
+            return
+        with profiling.phase(profiling.LIST_OF_FIGHTS):
+            rng = self.results_sheet.getCellRangeByPosition(0, self.row, 5, self.row + len(self.rows) - 1)
+            rng.setFormulaArray(tuple(self.results))
+            rng = self.sheet.getCellRangeByPosition(0, self.row, 7, self.row + len(self.rows) - 1)
+            rng.setFormulaArray(tuple(self.rows))
+            self.sheet.getCellRangeByPosition(7, self.row, 7, self.row + len(self.rows) - 1).NumberFormat = self.time_format
+        self.row += len(self.rows)
+        self.rows = []
+        self.results = []
+
+
+_getParticipantReference = payloads.participantReference
+
+_getParticipantClubReference = payloads.participantClubReference
+
+
+class _StyleRegistry(object):
+    """Creator of the cell styles and number formats of a document, each of which is created only once.
+
+    Only the document is looked at, nothing is remembered between the macros. A cell style is created (again) only if
+    it is missing in the document, its properties differ from the definition (e.g. it was edited by hand), or its parent
+    style was created again (which resets the parent of the existing style).
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.cell_styles = doc.getStyleFamilies()['CellStyles']
+        self.existing = set(self.cell_styles.getElementNames())
+        self.created = set()
+        self.number_formats = dict()
+
+    def cellStyle(self, name, props, parent=None):
+        """Makes sure the cell style with the given properties and parent style exists."""
+        if name in self.existing and parent not in self.created and self._isUpToDate(name, props, parent):
+            return
+        new_style = self.doc.createInstance('com.sun.star.style.CellStyle')
+        if name in self.existing:
+            self.cell_styles.removeByName(name)
+        self.cell_styles.insertByName(name, new_style)
+        new_style.setPropertyValues(tuple(props.keys()), tuple(props.values()))
+        if parent is not None:
+            new_style.setParentStyle(parent)
+        self.existing.add(name)
+        self.created.add(name)
+
+    def _isUpToDate(self, name, props, parent):
+        """Whether the existing cell style has the given properties and parent style, read by a single call."""
+        style = self.cell_styles.getByName(name)
+        if parent is not None and style.getParentStyle() != parent:
+            return False
+        return tuple(style.getPropertyValues(tuple(props.keys()))) == tuple(props.values())
+
+    def numberFormat(self, thousands, red, decimals, leading):
+        """Returns the key of the number format of the document locale with the given parameters (see
+        ``XNumberFormats.generateFormat``).
+        """
+        return self._numberFormat(('number format', thousands, red, decimals, leading),
+                                  lambda nfs, locale: nfs.generateFormat(0, locale, thousands, red, decimals, leading))
+
+    def formatCode(self, code):
+        """Returns the key of the number format of the document locale with the given format code."""
+        return self._numberFormat(('format code', code), lambda nfs, locale: code)
+
+    def _numberFormat(self, definition, makeFormatString):
+        if definition not in self.number_formats:
+            locale = self.doc.CharLocale
+            nfs = self.doc.NumberFormats
+            fmt_str = makeFormatString(nfs, locale)
+            key = nfs.queryKey(fmt_str, locale, False)
+            if key == -1:
+                key = nfs.addNew(fmt_str, locale)
+            self.number_formats[definition] = key
+        return self.number_formats[definition]
+
+
+def _createCellStyles(styles, definitions):
+    """Creates the cell styles of the definitions (see payloads.GROUP_STYLES) by the registry."""
+    for name, props, parent in definitions:
+        props = dict((k, _makeBorderLine2(0, v) if k in _BORDER_LINES else v) for k, v in props.items())
+        styles.cellStyle(name, props, parent)
+
+
+_BORDER_LINES = {'TopBorder2', 'RightBorder2', 'BottomBorder2', 'LeftBorder2'}
 
 
 def _makeBorderLine2(LineStyle, LineWidth):
@@ -959,100 +823,133 @@ def _makeBorderLine2(LineStyle, LineWidth):
     return brd
 
 
-def defineDatabaseRange(doc, name, sheet, c0, r0, c1, r1):
+def _makeTableBorder2(outer, horizontal=None, vertical=None):
+    """Creates a border of a whole range: ``outer`` around it, ``horizontal`` and ``vertical`` between its cells.
+    
+    Lines given as ``None`` are left as they are.
+    """
+    tb = uno.createUnoStruct('com.sun.star.table.TableBorder2')
+    if outer is not None:
+        tb.TopLine = tb.LeftLine = tb.BottomLine = tb.RightLine = outer
+        tb.IsTopLineValid = tb.IsLeftLineValid = tb.IsBottomLineValid = tb.IsRightLineValid = True
+    if horizontal is not None:
+        tb.HorizontalLine = horizontal
+        tb.IsHorizontalLineValid = True
+    if vertical is not None:
+        tb.VerticalLine = vertical
+        tb.IsVerticalLineValid = True
+    return tb
+
+
+def _makeCellRangeAddress(sheet_index, c0, r0, c1, r1):
     rng = uno.createUnoStruct('com.sun.star.table.CellRangeAddress')
-    rng.Sheet = doc.Sheets.getElementNames().index(sheet.Name)
+    rng.Sheet = sheet_index
     rng.StartColumn = c0
     rng.StartRow = r0
     rng.EndColumn = c1
     rng.EndRow = r1
-    doc.DatabaseRanges.addNewByName(name, rng)
+    return rng
 
 
-def _c2s(col, row):
-    column = ""
-    rem = col % 26
-    div = col // 26
-    column = chr(ord('A') + rem) + column
-    while div > 0:
-        rem = div % 26
-        div = div // 26
-        column = chr(ord('A') + rem) + column
-    return column + str(row + 1)
+def _cellRanges(doc, sheet, ranges, sheet_index=None):
+    """Returns a single object for a number of (possibly disjoint) ``(c0, r0, c1, r1)`` ranges of the sheet.
+    
+    Setting a property (e.g. ``CellStyle`` or ``TableBorder2``) on it applies it to each of the ranges at once.
+    """
+    if sheet_index is None:
+        sheet_index = doc.Sheets.getElementNames().index(sheet.Name)
+    cell_ranges = doc.createInstance('com.sun.star.sheet.SheetCellRanges')
+    cell_ranges.addRangeAddresses(tuple(_makeCellRangeAddress(sheet_index, *r) for r in ranges), False)
+    return cell_ranges
+
+
+def _applyCellStyles(doc, sheet, ranges_by_style):
+    """Applies each of the cell styles to the ``(c0, r0, c1, r1)`` ranges of the sheet given for it."""
+    sheet_index = doc.Sheets.getElementNames().index(sheet.Name)
+    for style, ranges in ranges_by_style.items():
+        if ranges:
+            _cellRanges(doc, sheet, ranges, sheet_index).CellStyle = style
+
+
+class _CellBuffer(object):
+    """Contents of cells of a sheet, collected in Python and then written by a single range call.
+
+    Cells are addressed by ``(column, row)``, the same as in ``getCellByPosition``. The written range is the bounding
+    box of all the cells that were set, so cells inside the box that were not set are cleared.
+    Values starting with ``=`` are formulas. If ``formulas`` is false, the contents are written as plain data, i.e.
+    no string is interpreted as a formula or a number.
+    """
+
+    def __init__(self, formulas=True):
+        self.cells = dict()
+        self.formulas = formulas
+
+    def __setitem__(self, coords, content):
+        self.cells[coords] = content
+
+    def update(self, cells):
+        """Sets the cells of the ``{(column, row): content}`` dict."""
+        self.cells.update(cells)
+
+    def write(self, sheet):
+        if not self.cells:
+            return
+        c0 = min(c for c, _ in self.cells)
+        c1 = max(c for c, _ in self.cells)
+        r0 = min(r for _, r in self.cells)
+        r1 = max(r for _, r in self.cells)
+        if self.formulas:
+            item = lambda x: x if isinstance(x, str) else str(x)
+        else:
+            item = lambda x: x if isinstance(x, str) else float(x)
+        data = tuple(tuple(item(self.cells.get((c, r), '')) for c in range(c0, c1 + 1)) for r in range(r0, r1 + 1))
+        rng = sheet.getCellRangeByPosition(c0, r0, c1, r1)
+        if self.formulas:
+            rng.setFormulaArray(data)
+        else:
+            rng.setDataArray(data)
 
 
-def _add(coords, col, row):
-    return (coords[0] + col, coords[1] + row)
+def defineDatabaseRange(doc, name, sheet, c0, r0, c1, r1):
+    rng = _makeCellRangeAddress(doc.Sheets.getElementNames().index(sheet.Name), c0, r0, c1, r1)
+    doc.DatabaseRanges.addNewByName(name, rng)
 
 
-def _random_pair(ub):
-    a = random.randint(0, ub)
-    b = random.randint(0, ub)
-    while a == b:
-        b = random.randint(0, ub)
-    return a, b
+_c2s = payloads.cellName
 
+_add = payloads.offset
 
-def sortGroupRanking(doc):
-    participants = loadParticipants(doc)
-    rng = doc.Sheets[constants.GROUPS_RESULTS].getCellRangeByPosition(1, 1, 7, len(participants))
-    
-    vm = uno.createUnoStruct('com.sun.star.table.TableSortField')
-    vm.Field = 2
-    vm.IsAscending = False
-    
-    dr = uno.createUnoStruct('com.sun.star.table.TableSortField')
-    dr.Field = 3
-    dr.IsAscending = False
 
-    d = uno.createUnoStruct('com.sun.star.table.TableSortField')
-    d.Field = 4
-    d.IsAscending = False
+# columns of Groups - results (within the range from Name to RND) the participants are ranked by, and whether the
+# order is ascending
+_GROUP_RANKING_KEYS = [(2, False), (3, False), (4, False), (5, True), (6, False)]
 
-    r = uno.createUnoStruct('com.sun.star.table.TableSortField')
-    r.Field = 5
-    r.IsAscending = True
 
-    rnd = uno.createUnoStruct('com.sun.star.table.TableSortField')
-    rnd.Field = 6
-    rnd.IsAscending = False
+def sortGroupRanking(doc):
+    """Ranks the participants in Groups - results and highlights the ties.
 
-    desc = rng.createSortDescriptor()
-    def set_val(name, value):
-        for prop in desc:
-            if prop.Name == name:
-                prop.Value = value
-                return
-    set_val('IsSortColumns', False)
-    set_val('BindFormatsToContent', False)
-    set_val('MaxSortFieldsCount', False)
-    # do it like this because LibreOffice, for some reason, does not add more than 3 sorting criteria, it overwrites the last one with whatever is set as last
-    set_val('SortFields', uno.Any('[]com.sun.star.table.TableSortField', [rnd]))
-    rng.sort(desc)
-    set_val('SortFields', uno.Any('[]com.sun.star.table.TableSortField', [r]))
-    rng.sort(desc)
-    set_val('SortFields', uno.Any('[]com.sun.star.table.TableSortField', [d]))
-    rng.sort(desc)
-    set_val('SortFields', uno.Any('[]com.sun.star.table.TableSortField', [dr]))
-    rng.sort(desc)
-    set_val('SortFields', uno.Any('[]com.sun.star.table.TableSortField', [vm]))
-    rng.sort(desc)
+    The range is read once, sorted in Python by W/M, D-R, D, R and RND, and written back by a single call. The
+    formulas move with the rows except D-R, which always refers to its own row.
+    """
+    participants = loadParticipants(doc)
+    rng = doc.Sheets[constants.GROUPS_RESULTS].getCellRangeByPosition(1, 1, 7, len(participants))
+    # automatic calculation may be off (see bulkMode), make sure the compared values are up to date
+    doc.calculate()
+    data = rng.getDataArray()
+    formulas = rng.getFormulaArray()
+
+    keys = [tuple(_sortKey(row[field], ascending) for field, ascending in _GROUP_RANKING_KEYS) for row in data]
+    order = sorted(range(len(data)), key=lambda i: keys[i])
+    sorted_formulas = []
+    for i, j in enumerate(order, 1):
+        row = list(formulas[j])
+        row[3] = '={} - {}'.format(_c2s(5, i), _c2s(6, i))
+        sorted_formulas.append(tuple(row))
+    rng.setFormulaArray(tuple(sorted_formulas))
 
     equals = []
-    for i in range(1, len(participants)):
-        prev_vm = rng.getCellByPosition(2, i - 1).getString()
-        prev_dr = rng.getCellByPosition(3, i - 1).getString()
-        prev_d = rng.getCellByPosition(4, i - 1).getString()
-        prev_r = rng.getCellByPosition(5, i - 1).getString()
-        prev_rnd = rng.getCellByPosition(6, i - 1).getString()
-
-        vm = rng.getCellByPosition(2, i).getString()
-        dr = rng.getCellByPosition(3, i).getString()
-        d = rng.getCellByPosition(4, i).getString()
-        r = rng.getCellByPosition(5, i).getString()
-        rnd = rng.getCellByPosition(6, i).getString()
-
-        if prev_vm == vm and prev_dr == dr and prev_d == d and prev_r == r and prev_rnd == rnd:
+    for i in range(1, len(order)):
+        if keys[order[i - 1]] == keys[order[i]]:
             if equals and equals[-1][-1] == i - 1:
                 equals[-1][-1] = i
             else:
@@ -1061,52 +958,59 @@ def sortGroupRanking(doc):
     for a, b in equals:
         rng.getCellRangeByPosition(0, a, 5, b).CharColor = 0x00FF0000
     
-    team_ranking_n = int(doc.Sheets[constants.SETTINGS].getCellByPosition(1, 5).getValue())
+    team_ranking_n = loadSettings(doc).team_ranking_n
     if team_ranking_n <= 0:
         return
     
-    team_ranking = dict()
-    rng = doc.Sheets[constants.GROUPS_RESULTS].getCellRangeByPosition(0, 1, 7, len(participants))
-    for i in range(len(participants)):
-        rank = rng.getCellByPosition(0, i).getValue()
-        team = rng.getCellByPosition(2, i).getString()
-        vm = rng.getCellByPosition(3, i).getValue()
-        dr = rng.getCellByPosition(4, i).getValue()
-        d = rng.getCellByPosition(5, i).getValue()
-        r = rng.getCellByPosition(6, i).getValue()
-        if team not in team_ranking:
-            team_ranking[team] = []
-        team_ranking[team].append({'rank': rank,
-                                   'vm': vm,
-                                   'dr': dr,
-                                   'd': d,
-                                   'r': r})
-    
-    def transformer(item):
-        entries = item[1]
-        entries.sort(key=lambda e: e['rank'])
-        entries = entries[:team_ranking_n]
-        return (item[0],
-                sum([e['rank'] for e in entries]),
-                sum([-e['vm'] for e in entries]),
-                sum([-e['dr'] for e in entries]),
-                sum([-e['d'] for e in entries]),
-                sum([e['r'] for e in entries]))
-    transformed_teams_ranking = [transformer(e) for e in team_ranking.items()]
-    transformed_teams_ranking.sort(key=lambda e: e[1:])
-    rng = doc.Sheets[constants.GROUPS_TEAM_RESULTS].getCellRangeByPosition(1, 1, 7, len(transformed_teams_ranking))
-    for i, (team, rank, vm, dr, d, r) in enumerate(transformed_teams_ranking):
-        rng.getCellByPosition(0, i).setString(team)
-        rng.getCellByPosition(1, i).setValue(rank)
-        rng.getCellByPosition(2, i).setValue(-vm)
-        rng.getCellByPosition(3, i).setValue(-dr)
-        rng.getCellByPosition(4, i).setValue(-d)
-        rng.getCellByPosition(5, i).setValue(r)
+    teams, ranking = _rankTeams([_dataString(data[i][1]) for i in order],
+                                [[data[i][field] for i in order] for field in range(2, 6)],
+                                team_ranking_n)
+    rows = tuple((team,) + tuple(float(x) for x in row) for team, row in zip(teams, ranking))
+    doc.Sheets[constants.GROUPS_TEAM_RESULTS].getCellRangeByPosition(1, 1, 6, len(rows)).setDataArray(rows)
+
+
+def _rankTeams(teams, results, n):
+    """Ranks the teams by the sums of the group results of their best n members.
+
+    ``teams`` are the teams of the participants in the order of their ranks after the group phase and ``results`` are
+    the columns W/M, D-R, D and R in the same order. Returns the team names and the rows of sum of ranks, W/M, D-R, D
+    and R, both in the order of the team ranking (ties are kept in the order of the best member).
+    """
+    names, first, codes = np.unique(np.array(teams, dtype=object), return_index=True, return_inverse=True)
+    codes = codes.ravel()
+    ranks = np.arange(1, len(codes) + 1, dtype=float)
+    # the participants are ordered by rank, so the best n of a team are its first n occurrences
+    by_team = np.argsort(codes, kind='stable')
+    starts = np.searchsorted(codes[by_team], np.arange(len(names)))
+    occurrence = np.empty(len(codes), dtype=int)
+    occurrence[by_team] = np.arange(len(codes)) - starts[codes[by_team]]
+    best = occurrence < n
+
+    columns = [ranks] + [np.array([x if isinstance(x, float) else 0.0 for x in column]) for column in results]
+    rank_sum, vm, dr, d, r = [np.bincount(codes[best], weights=column[best], minlength=len(names)) for column in columns]
+    # teams in the order of their best member, so that the stable sort keeps ties in that order
+    appearance = np.argsort(first, kind='stable')
+    order = appearance[np.lexsort((r[appearance], -d[appearance], -dr[appearance], -vm[appearance], rank_sum[appearance]))]
+    return [names[i] for i in order], np.column_stack([rank_sum, vm, dr, d, r])[order].tolist()
+
+
+def _sortKey(value, ascending):
+    """Key which orders values of cells like LibreOffice does - numbers before text when ascending, text before numbers
+    when descending, empty cells last in both cases.
+    """
+    if value == '':
+        return (2,)
+    if isinstance(value, float):
+        return (0, value) if ascending else (1, -value)
+    if ascending:
+        return (1, value.lower())
+    # the trailing 1 puts a string after all the strings it is a prefix of
+    return (0, tuple(-ord(c) for c in value.lower()) + (1,))
 
 
 def sortFinalRanking(doc):
     final_ranking_sheet = doc.Sheets[constants.FINAL_RANKING]
-    team = doc.Sheets[constants.SETTINGS].getCellByPosition(1, 5).getValue() > 0
+    team = loadSettings(doc).team_ranking_n > 0
 
     participants = loadParticipants(doc)
     if team:
@@ -0,0 +1,767 @@
+# coding: utf-8
+"""Writing of a scheduled tournament directly into an .ods file, without LibreOffice.
+
+The file has the same sheets, formulas and cell styles as the document after the macros ``init`` and ``schedule``, so
+it can be opened in LibreOffice Calc and the tournament continued by the other macros as usual. Besides the standard
+library, only numpy and scipy are needed (by the planning of the groups in algorithms.py). The sheets are streamed row
+by row into temporary files, which are put together at the end, and the contents of one group at a time are held in
+memory.
+
+    python pythonpath/ods.py participants.csv tournament.ods --max-group-size 6 --to-elimination 0.5
+"""
+from __future__ import unicode_literals
+
+import argparse
+import functools
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import constants
+import payloads
+import planning
+import registrations
+
+# number format of the V/M columns
+VM_FORMAT = '0.000'
+
+# default width of a column, in 1/100 mm
+COLUMN_WIDTH = 2258
+
+_NAMESPACES = ' '.join('xmlns:{}="{}"'.format(prefix, uri) for prefix, uri in [
+    ('office', 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'),
+    ('style', 'urn:oasis:names:tc:opendocument:xmlns:style:1.0'),
+    ('text', 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'),
+    ('table', 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'),
+    ('number', 'urn:oasis:names:tc:opendocument:xmlns:datastyle:1.0'),
+    ('fo', 'urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0'),
+    ('of', 'urn:oasis:names:tc:opendocument:xmlns:of:1.2'),
+    ('config', 'urn:oasis:names:tc:opendocument:xmlns:config:1.0'),
+    ('ooo', 'http://openoffice.org/2004/office'),
+])
+
+_MIMETYPE = 'application/vnd.oasis.opendocument.spreadsheet'
+
+_MANIFEST = '''<?xml version="1.0" encoding="UTF-8"?>
+<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0" manifest:version="1.2">
+ <manifest:file-entry manifest:full-path="/" manifest:version="1.2" manifest:media-type="{}"/>
+ <manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>
+ <manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>
+ <manifest:file-entry manifest:full-path="settings.xml" manifest:media-type="text/xml"/>
+</manifest:manifest>
+'''.format(_MIMETYPE)
+
+# a cell reference (or a range) in the A1 notation, with an optional quoted sheet name; strings are matched as well, so
+# that references inside them are skipped
+_REFERENCE = re.compile(r'''"[^"]*"|(?<![\w.$])((?:\$?'(?:[^']|'')*'\.)?)(\$?[A-Z]{1,3}\$?\d+)(?::(\$?[A-Z]{1,3}\$?\d+))?(?![\w(])''')
+
+_NUMBER = re.compile(r'^-?\d+(\.\d+)?([eE][-+]?\d+)?$')
+
+_BORDER_SIDES = {'TopBorder2': 'top', 'RightBorder2': 'right', 'BottomBorder2': 'bottom', 'LeftBorder2': 'left'}
+
+_MARGIN_SIDES = {'ParaTopMargin': 'top', 'ParaRightMargin': 'right', 'ParaBottomMargin': 'bottom',
+                 'ParaLeftMargin': 'left'}
+
+
+def odfFormula(formula):
+    """Converts a formula as written by ``setFormula`` (e.g. ``=SUM(C6:G6)``) into the OpenFormula syntax of .ods."""
+    def reference(match):
+        if match.group(2) is None:
+            return match.group(0)
+        sheet, start, end = match.groups()
+        if end is None:
+            return '[{}.{}]'.format(sheet[:-1], start)
+        return '[{}.{}:.{}]'.format(sheet[:-1], start, end)
+    return 'of:' + _REFERENCE.sub(reference, formula)
+
+
+class OdsWriter(object):
+    """Writer of an .ods file.
+
+    The contents are written in parts (see :meth:`part`), each of which holds one or more consecutive sheets and is
+    written into a temporary file, so that several sheets can be filled at the same time. The parts are put together in
+    the order they were created when the writer is closed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.parts = []
+        # automatic styles (cell, column and number formats) by their definition
+        self.cell_formats = dict()
+        self.column_formats = dict()
+        self.number_formats = dict()
+        self.database_ranges = []
+        # number of the frozen rows, by the name of the sheet
+        self.frozen = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            for part in self.parts:
+                part.file.close()
+
+    def part(self):
+        part = _Part(self)
+        self.parts.append(part)
+        return part
+
+    def cellFormat(self, style, direct=()):
+        """Name of the automatic style of the cells with the named style and the direct formatting, which is given as
+        ``(property, value)`` pairs of the properties of :data:`payloads.GROUP_STYLES` (plus ``NumberFormat`` with a
+        format code).
+        """
+        key = (style, tuple(sorted(direct)))
+        if key not in self.cell_formats:
+            for prop, value in direct:
+                if prop == 'NumberFormat':
+                    self.numberFormat(value)
+            self.cell_formats[key] = 'ce{}'.format(len(self.cell_formats) + 1)
+        return self.cell_formats[key]
+
+    def columnFormat(self, width, optimal=False):
+        key = (width, optimal)
+        if key not in self.column_formats:
+            self.column_formats[key] = 'co{}'.format(len(self.column_formats) + 1)
+        return self.column_formats[key]
+
+    def numberFormat(self, code):
+        if code not in self.number_formats:
+            self.number_formats[code] = 'N{}'.format(len(self.number_formats) + 1)
+        return self.number_formats[code]
+
+    def databaseRange(self, name, sheet, c0, r0, c1, r1):
+        self.database_ranges.append((name, sheet, c0, r0, c1, r1))
+
+    def freeze(self, sheet, rows):
+        self.frozen[sheet] = rows
+
+    def close(self):
+        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED) as ods:
+            # the mime type must come first and be stored uncompressed
+            ods.writestr(zipfile.ZipInfo('mimetype'), _MIMETYPE, zipfile.ZIP_STORED)
+            ods.writestr('META-INF/manifest.xml', _MANIFEST)
+            ods.writestr('styles.xml', self._styles())
+            ods.writestr('settings.xml', self._settings())
+            with ods.open('content.xml', 'w') as content:
+                content.write(self._contentHead().encode('utf-8'))
+                for part in self.parts:
+                    part.file.seek(0)
+                    shutil.copyfileobj(part.file, content)
+                content.write(self._contentTail().encode('utf-8'))
+
+    def _styles(self):
+        styles = ['<?xml version="1.0" encoding="UTF-8"?>\n<office:document-styles {} office:version="1.2">'
+                  '<office:styles>'.format(_NAMESPACES)]
+        styles.append('<style:default-style style:family="table-cell"/>')
+        styles.append(_styleXml('Default', None, payloads.DEFAULT_STYLE))
+        for name, props, parent in payloads.GROUP_STYLES + payloads.ELIMINATION_STYLES:
+            styles.append(_styleXml(name, parent, props))
+        styles.append('</office:styles></office:document-styles>')
+        return ''.join(styles)
+
+    def _settings(self):
+        tables = []
+        for sheet, rows in self.frozen.items():
+            tables.append('<config:config-item-map-entry config:name={}>'.format(quoteattr(sheet)))
+            for name, kind, value in [('VerticalSplitMode', 'short', 2), ('VerticalSplitPosition', 'int', rows),
+                                      ('ActiveSplitRange', 'short', 2), ('PositionBottom', 'int', rows)]:
+                tables.append('<config:config-item config:name="{}" config:type="{}">{}</config:config-item>'.format(name, kind, value))
+            tables.append('</config:config-item-map-entry>')
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<office:document-settings {} office:version="1.2">'
+                '<office:settings><config:config-item-set config:name="ooo:view-settings">'
+                '<config:config-item-map-indexed config:name="Views"><config:config-item-map-entry>'
+                '<config:config-item config:name="ViewId" config:type="string">view1</config:config-item>'
+                '<config:config-item-map-named config:name="Tables">{}</config:config-item-map-named>'
+                '</config:config-item-map-entry></config:config-item-map-indexed></config:config-item-set>'
+                '</office:settings></office:document-settings>').format(_NAMESPACES, ''.join(tables))
+
+    def _contentHead(self):
+        head = ['<?xml version="1.0" encoding="UTF-8"?>\n<office:document-content {} office:version="1.2">'
+                '<office:automatic-styles>'.format(_NAMESPACES)]
+        head.append('<style:style style:name="ta1" style:family="table"><style:table-properties table:display="true"/></style:style>')
+        head.append('<style:style style:name="ta2" style:family="table"><style:table-properties table:display="false"/></style:style>')
+        for (width, optimal), name in self.column_formats.items():
+            head.append('<style:style style:name="{}" style:family="table-column"><style:table-column-properties '
+                        'style:column-width="{}" style:use-optimal-column-width="{}"/></style:style>'.format(name, _length(width), 'true' if optimal else 'false'))
+        for code, name in self.number_formats.items():
+            head.append(_numberFormatXml(name, code))
+        for (style, direct), name in self.cell_formats.items():
+            direct = dict(direct)
+            code = direct.pop('NumberFormat', None)
+            head.append(_styleXml(name, style, direct, None if code is None else self.numberFormat(code)))
+        head.append('</office:automatic-styles><office:body><office:spreadsheet>')
+        return ''.join(head)
+
+    def _contentTail(self):
+        tail = []
+        if self.database_ranges:
+            tail.append('<table:database-ranges>')
+            for name, sheet, c0, r0, c1, r1 in self.database_ranges:
+                sheet_name = "'{}'".format(sheet.replace("'", "''"))
+                address = '{0}.{1}:{0}.{2}'.format(sheet_name, payloads.cellName(c0, r0), payloads.cellName(c1, r1))
+                tail.append('<table:database-range table:name={} table:target-range-address={}/>'.format(quoteattr(name), quoteattr(address)))
+            tail.append('</table:database-ranges>')
+        tail.append('</office:spreadsheet></office:body></office:document-content>')
+        return ''.join(tail)
+
+
+class _Part(object):
+    """Consecutive sheets of an .ods file, written into a temporary file."""
+
+    def __init__(self, ods):
+        self.ods = ods
+        self.file = tempfile.TemporaryFile()
+
+    def sheet(self, name, columns=(), visible=True, merges=(), formulas=True):
+        """Starts a sheet, which has to be finished by :meth:`_Sheet.close` before the next sheet of the part starts.
+
+        ``columns`` are ``(width in 1/100 mm, visible, optimal)`` of the first columns of the sheet, ``merges`` the
+        ``(c0, r0, c1, r1)`` ranges of merged cells. If ``formulas`` is true, the contents are interpreted as by
+        ``setFormulaArray``, otherwise they are written as they are.
+        """
+        return _Sheet(self, name, columns, visible, merges, formulas)
+
+
+class _Sheet(object):
+    """Writer of the rows of a sheet."""
+
+    def __init__(self, part, name, columns, visible, merges, formulas):
+        self.part = part
+        self.ods = part.ods
+        self.formulas = formulas
+        self.row = 0
+        self.spans = dict(((c0, r0), (c1 - c0 + 1, r1 - r0 + 1)) for c0, r0, c1, r1 in merges)
+        self.covered = set((c, r) for c0, r0, c1, r1 in merges for c in range(c0, c1 + 1) for r in range(r0, r1 + 1)
+                           if (c, r) != (c0, r0))
+        xml = ['<table:table table:name={} table:style-name="{}">'.format(quoteattr(name), 'ta1' if visible else 'ta2')]
+        for width, column_visible, optimal in columns:
+            xml.append('<table:table-column table:style-name="{}"{} table:default-cell-style-name="Default"/>'.format(
+                self.ods.columnFormat(COLUMN_WIDTH if width is None else width, optimal),
+                '' if column_visible else ' table:visibility="collapse"'))
+        xml.append('<table:table-column table:style-name="{}" table:number-columns-repeated="{}" table:default-cell-style-name="Default"/>'.format(
+            self.ods.columnFormat(COLUMN_WIDTH), 1024 - len(columns)))
+        self._write(''.join(xml))
+
+    def write(self, r, cells):
+        """Writes the row r, the cells are ``{column: (content, cell format)}``, the content is None for an empty cell
+        and the cell format None for no formatting. The rows have to be written in ascending order.
+        """
+        if r < self.row:
+            raise ValueError('Row {} is written already'.format(r + 1))
+        if r > self.row:
+            self._write('<table:table-row table:number-rows-repeated="{}"><table:table-cell/></table:table-row>'.format(r - self.row))
+        xml = ['<table:table-row>']
+        column = 0
+        for c in sorted(cells):
+            content, cell_format = cells[c]
+            if c > column:
+                xml.append('<table:table-cell table:number-columns-repeated="{}"/>'.format(c - column) if c - column > 1 else '<table:table-cell/>')
+            xml.append(self._cell(c, r, content, cell_format))
+            column = c + 1
+        xml.append('</table:table-row>')
+        self._write(''.join(xml))
+        self.row = r + 1
+
+    def close(self):
+        self._write('</table:table>')
+
+    def _cell(self, c, r, content, cell_format):
+        attrs = '' if cell_format is None else ' table:style-name="{}"'.format(cell_format)
+        if (c, r) in self.covered:
+            return '<table:covered-table-cell{}/>'.format(attrs)
+        if (c, r) in self.spans:
+            columns, rows = self.spans[c, r]
+            attrs += ' table:number-columns-spanned="{}" table:number-rows-spanned="{}"'.format(columns, rows)
+        if content is None or content == '':
+            return '<table:table-cell{}/>'.format(attrs)
+        if isinstance(content, str) and self.formulas:
+            if content.startswith('='):
+                return '<table:table-cell{} table:formula={}/>'.format(attrs, quoteattr(odfFormula(content)))
+            if _NUMBER.match(content):
+                content = float(content)
+        if isinstance(content, (int, float)):
+            return '<table:table-cell{} office:value-type="float" office:value="{!r}"/>'.format(attrs, float(content))
+        return '<table:table-cell{} office:value-type="string"><text:p>{}</text:p></table:table-cell>'.format(attrs, escape(content))
+
+    def _write(self, xml):
+        self.part.file.write(xml.encode('utf-8'))
+
+
+def _styleXml(name, parent, props, number_format=None):
+    """XML of a cell style with the properties of :data:`payloads.GROUP_STYLES`."""
+    cell = dict()
+    paragraph = dict()
+    text = dict()
+    for prop, value in props.items():
+        if prop in _BORDER_SIDES:
+            cell['fo:border-' + _BORDER_SIDES[prop]] = '{} solid #000000'.format(_length(value))
+        elif prop in _MARGIN_SIDES:
+            cell['fo:padding-' + _MARGIN_SIDES[prop]] = _length(value)
+        elif prop == 'VertJustify':
+            cell['style:vertical-align'] = ['automatic', 'top', 'middle', 'bottom'][value]
+        elif prop == 'HoriJustify':
+            cell['style:text-align-source'] = 'fix' if value else 'value-type'
+            if value:
+                paragraph['fo:text-align'] = [None, 'start', 'center', 'end'][value]
+        elif prop == 'CellBackColor':
+            cell['fo:background-color'] = '#{:06x}'.format(value)
+        elif prop == 'CharHeight':
+            text['fo:font-size'] = '{}pt'.format(value)
+    attrs = ' style:name={} style:family="table-cell"'.format(quoteattr(name))
+    if parent is not None:
+        attrs += ' style:parent-style-name={}'.format(quoteattr(parent))
+    if number_format is not None:
+        attrs += ' style:data-style-name="{}"'.format(number_format)
+    xml = ['<style:style{}>'.format(attrs)]
+    for element, properties in [('table-cell-properties', cell), ('paragraph-properties', paragraph), ('text-properties', text)]:
+        if properties:
+            xml.append('<style:{}{}/>'.format(element, ''.join(' {}="{}"'.format(k, v) for k, v in sorted(properties.items()))))
+    xml.append('</style:style>')
+    return ''.join(xml)
+
+
+def _numberFormatXml(name, code):
+    if code == VM_FORMAT:
+        return ('<number:number-style style:name="{}"><number:number number:decimal-places="3" '
+                'number:min-decimal-places="3" number:min-integer-digits="1"/></number:number-style>').format(name)
+    if code == payloads.TIME_FORMAT:
+        return ('<number:time-style style:name="{}" number:truncate-on-overflow="false"><number:hours number:style="long"/>'
+                '<number:text>:</number:text><number:minutes number:style="long"/></number:time-style>').format(name)
+    raise ValueError('Unsupported number format {}'.format(code))
+
+
+def _length(hundredths_of_mm):
+    return '{:g}mm'.format(hundredths_of_mm / 100)
+
+
+def _width(texts, padding=2 * 35):
+    """Estimated optimal width (in 1/100 mm) of a column with the texts, in the Default font."""
+    return max([len(t) for t in texts] + [1]) * 233 + 2 * padding + 100
+
+
+class _Formats(object):
+    """Formatting of the cells of an area of a sheet, built the same way as by the UNO calls of helpers - by applying
+    the cell styles and the direct formatting to ranges one after another.
+    """
+
+    def __init__(self):
+        # [style, {property: value}] by (column, row)
+        self.cells = dict()
+
+    def _cells(self, c0, r0, c1, r1):
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                yield self.cells.setdefault((c, r), ['Default', dict()])
+
+    def style(self, ranges, style):
+        for rng in ranges:
+            for cell in self._cells(*rng):
+                cell[0] = style
+
+    def direct(self, rng, **props):
+        for cell in self._cells(*rng):
+            cell[1].update(props)
+
+    def tableBorder(self, rng, width):
+        """Border around the range, see ``TableBorder2``."""
+        c0, r0, c1, r1 = rng
+        self.direct((c0, r0, c1, r0), TopBorder2=width)
+        self.direct((c0, r1, c1, r1), BottomBorder2=width)
+        self.direct((c0, r0, c0, r1), LeftBorder2=width)
+        self.direct((c1, r0, c1, r1), RightBorder2=width)
+
+    def resolve(self, ods):
+        """The cell formats of the cells, by (column, row)."""
+        return dict((coords, ods.cellFormat(style, direct.items())) for coords, (style, direct) in self.cells.items())
+
+
+def readParticipantList(path):
+    """Reads the rows of the Participant list from the CSV (or TSV) file with a header row.
+
+    The columns are found by the header and the rows are normalized the same way as by the macro
+    ``importParticipants`` (see registrations). Unlike there, a first row which is not a recognized header is skipped
+    (with a warning) and the columns are read in the order of the Participant list, and entrants with the same name
+    and club are all kept.
+    """
+    normalizer = registrations.Normalizer()
+    return [normalizer.normalize(row)
+            for row in registrations.readRegistrations(path, warn=_warn, skip_unknown_header=True)]
+
+
+def _warn(message):
+    print('warning: ' + message, file=sys.stderr)
+
+
+def writeTournament(path, rows, settings):
+    """Schedules the tournament of the present participants of the rows of the Participant list (see
+    :func:`readParticipantList`) with the settings and writes it into the .ods file.
+    """
+    participants = planning.makeParticipants(rows)
+    if not participants:
+        raise ValueError('No participants are present.')
+    plan = planning.makePlan(participants, settings)
+    team = plan.team
+    cut_n = plan.cut_n
+    names = [p.name for p in participants]
+    clubs = [p.club for p in participants]
+    layout = payloads.bracketLayout(cut_n, team)
+
+    with OdsWriter(path) as ods:
+        # the parts in the order of the sheets, see helpers
+        part = ods.part()
+        _writeParticipantList(part, rows)
+        _writeSettings(part, settings)
+        group_list = _GroupList(ods.part(), plan, names, clubs)
+        group_sheets = ods.part()
+        group_results = _GroupResults(ods.part(), plan, names, clubs)
+        if team:
+            _writeTeamResults(ods.part(), plan)
+        elimination = ods.part()
+        final_ranking = ods.part().sheet(constants.FINAL_RANKING)
+        fight_log = _FightLog(ods.part().sheet(constants.LIST_OF_FIGHTS),
+                              ods.part().sheet(constants.RESULTS, visible=False),
+                              ods.cellFormat('Default', [('NumberFormat', payloads.TIME_FORMAT)]))
+
+        # the elimination part of Final ranking comes first, the listed elimination fights follow the group fights in
+        # the Results sheet
+        row = 1 + sum(len(g.fights) for g in plan.groups)
+        references = dict()
+        for i, fight in enumerate(layout.plan.fights):
+            if fight.phase is not None:
+                references[i] = (payloads.resultReference(4, row), payloads.resultReference(5, row))
+                row += 1
+        ranking = dict(layout.ranking)
+        for c, r, template, i in layout.ranking_outcomes:
+            ranking[c, r] = template.format(*references[i])
+        headers = ['Final rank', 'Team', 'Elim. round', 'Quali'] if team else ['Final rank', 'Name', 'Club', 'Elim. round', 'Quali']
+        ranking.update(((c, 0), header) for c, header in enumerate(headers))
+        ranking.update(((0, r), r) for r in range(1, cut_n + 1))
+        if team:
+            for r in range(cut_n + 1, len(plan.teams) + 1):
+                ranking[0, r] = r
+                ranking[1, r] = "=$'{}'.{}".format(constants.GROUPS_TEAM_RESULTS, payloads.cellName(1, r))
+                ranking[3, r] = r
+        for r, cells in _rows(ranking):
+            final_ranking.write(r, cells)
+        del ranking
+
+        # the groups, one after another
+        group_formats = dict()
+        for i, group_plan in enumerate(plan.groups):
+            ring = plan.timetable.group_rings[i]
+            starts = plan.timetable.group_starts[i]
+            headers = [payloads.ringHeader(ring, starts[0]) if starts else None, None, None]
+            fill_random = settings.fill_groups_random
+            scores = [payloads.randomPair(fill_random) if fill_random > 0 else None for _ in group_plan.fights]
+            payload = payloads.makeGroupPayload(group_plan, team, cut_n, headers, scores, dict(), True)
+
+            contents = payload.sheet
+            for (fighter1, fighter2, score1, score2), (a_cell, b_cell), start in zip(payload.fights, payload.bindings, starts):
+                a_result, b_result = fight_log.add(group_plan.name, fighter1, fighter2, score1, score2, ring, start)
+                contents[a_cell] = '={}'.format(a_result)
+                contents[b_cell] = '={}'.format(b_result)
+            size = len(group_plan.participants)
+            if size not in group_formats:
+                group_formats[size] = _groupFormats(ods, group_plan, payload.fight_cards)
+            _writeGroupSheet(group_sheets, group_plan, contents, group_formats[size])
+            group_list.add(group_plan, payload.group_list)
+            group_results.add(payload.results)
+            ranking = dict(payload.final_ranking)
+            ranking.update(((0, r), r) for _, r in payload.final_ranking)
+            for r, cells in _rows(ranking):
+                final_ranking.write(r, cells)
+        group_list.close()
+        group_results.close()
+        final_ranking.close()
+        ods.databaseRange('finalRanking', constants.FINAL_RANKING, 0, 0, 3 if team else 4,
+                          len(plan.teams) if team else len(participants))
+
+        _writeElimination(elimination, plan, layout, fight_log, names, clubs)
+        fight_log.close()
+
+
+def _rows(contents, formats=None):
+    """The rows of the cells with the contents and the cell formats (both by (column, row)), in the ascending order,
+    as the ``(row, cells)`` arguments of :meth:`_Sheet.write`.
+    """
+    formats = formats or dict()
+    rows = dict()
+    for (c, r), content in contents.items():
+        rows.setdefault(r, dict())[c] = (content, formats.get((c, r)))
+    for (c, r), cell_format in formats.items():
+        cells = rows.setdefault(r, dict())
+        if c not in cells:
+            cells[c] = (None, cell_format)
+    return sorted(rows.items())
+
+
+def _plain(contents):
+    """Cells of a row with the contents, without formatting."""
+    return dict((c, (content, None)) for c, content in enumerate(contents))
+
+
+def _writeParticipantList(part, rows):
+    sheet = part.sheet(constants.PARTICIPANT_LIST, formulas=False)
+    sheet.write(0, _plain(['Name', 'Club/team', 'Country', 'Rating/rank', 'Present?']))
+    for r, row in enumerate(rows, 1):
+        sheet.write(r, _plain(row))
+    sheet.close()
+
+
+def _writeSettings(part, settings):
+    columns = [(_width([name for name, _, _ in planning.SETTING_ROWS]), True, True)]
+    sheet = part.sheet(constants.SETTINGS, columns)
+    for r, ((name, _, description), value) in enumerate(zip(planning.SETTING_ROWS, settings)):
+        cells = _plain([name, float(value)])
+        if description is not None:
+            cells[3] = (description, None)
+        sheet.write(r, cells)
+    sheet.close()
+
+
+class _GroupList(object):
+    """Writer of the Group list sheet, which gets the groups one by one and writes each row of groups at once."""
+
+    def __init__(self, part, plan, names, clubs):
+        self.ods = part.ods
+        self.max_group_size = plan.max_group_size
+        numbers = [str(j + 1) for j in range(plan.max_group_size)]
+        columns = [(_width(numbers), True, True), (_width(names), True, True), (_width(clubs), True, True)]
+        self.sheet = part.sheet(constants.GROUP_LIST, columns * plan.settings.groups_per_row)
+        self.row = None
+        self.cells = dict()
+        self.formats = _Formats()
+        self.max_col = 0
+        self.max_row = 0
+
+    def add(self, group_plan, cells):
+        col, row = group_plan.list_coords
+        if row != self.row:
+            self._flush()
+            self.row = row
+        self.cells[col, row] = group_plan.name
+        self.cells.update(cells)
+        rng = (col, row + 1, col + 2, row + self.max_group_size)
+        self.formats.tableBorder(rng, payloads.MEDIUM_BORDER)
+        self.max_col = max(self.max_col, rng[2])
+        self.max_row = max(self.max_row, rng[3])
+
+    def close(self):
+        self._flush()
+        self.sheet.close()
+        self.ods.databaseRange('groupList', constants.GROUP_LIST, 0, 0, self.max_col, self.max_row)
+
+    def _flush(self):
+        for r, cells in _rows(self.cells, self.formats.resolve(self.ods)):
+            self.sheet.write(r, cells)
+        self.cells = dict()
+        self.formats = _Formats()
+
+
+class _GroupResults(object):
+    """Writer of the Groups - results sheet, which gets the rows of the groups one by one."""
+
+    def __init__(self, part, plan, names, clubs):
+        self.ods = part.ods
+        self.n = len(plan.participants)
+        headers = ['Rank', 'Name', 'Team' if plan.team else 'Club', 'W/M (↓)', 'D-R (↓)', 'D (↓)', 'R (↑)', 'RND']
+        texts = [[str(self.n)], names, clubs, [VM_FORMAT]] + [['0000']] * 4
+        columns = [(_width([header] + column), True, True) for header, column in zip(headers, texts)]
+        self.sheet = part.sheet(constants.GROUPS_RESULTS, columns)
+        self.formats = _resultFormats(self.ods, plan.cut_n, [1, 2], not plan.team)
+        self.sheet.write(0, self._cells(0, dict(enumerate(headers))))
+        self.ods.freeze(constants.GROUPS_RESULTS, 1)
+
+    def add(self, contents):
+        for r, cells in _rows(contents):
+            self.sheet.write(r, self._cells(r, dict((c, content) for c, (content, _) in cells.items())))
+
+    def close(self):
+        self.sheet.close()
+        self.ods.databaseRange('groupResult', constants.GROUPS_RESULTS, 0, 0, 7, self.n)
+
+    def _cells(self, r, contents):
+        return dict((c, (contents.get(c), cell_format)) for c, cell_format in enumerate(self.formats(r)))
+
+
+def _resultFormats(ods, cut_n, standard_columns, eliminated):
+    """Function giving the cell formats of the columns 0 to 7 of a row of Groups - results (or Groups - team results),
+    see ``helpers.createGroups``. The rows below the cut are formatted as eliminated if ``eliminated`` is true.
+    """
+    @functools.lru_cache(maxsize=None)
+    def formats(header, below_cut, first_below_cut):
+        row_formats = []
+        for c in range(8):
+            style = 'group_results_eliminated' if below_cut else 'Default'
+            direct = []
+            if header:
+                direct.append(('HoriJustify', 0 if c in standard_columns else 3))
+            if c == 3:
+                direct.append(('NumberFormat', VM_FORMAT))
+            if first_below_cut:
+                direct.append(('TopBorder2', payloads.THICK_BORDER))
+            row_formats.append(ods.cellFormat(style, direct) if style != 'Default' or direct else None)
+        return row_formats
+    return lambda r: formats(r == 0, eliminated and r > cut_n, eliminated and r == cut_n + 1)
+
+
+def _writeTeamResults(part, plan):
+    ods = part.ods
+    headers = ['Rank', 'Team', '∑ Rank (↑)', '∑ W/M (↓)', '∑ D-R (↓)', '∑ D (↓)', '∑ R (↑)', 'RND']
+    texts = [[str(len(plan.teams))], list(plan.teams), ['0000'], [VM_FORMAT]] + [['0000']] * 4
+    columns = [(_width([header] + column), True, True) for header, column in zip(headers, texts)]
+    # team names are written as they are, not parsed as formulas
+    sheet = part.sheet(constants.GROUPS_TEAM_RESULTS, columns, formulas=False)
+    formats = _resultFormats(ods, plan.cut_n, [1], True)
+    for r, contents in enumerate([headers] + [[r, club] for r, club in enumerate(plan.teams, 1)]):
+        sheet.write(r, dict((c, (contents[c] if c < len(contents) else None, cell_format))
+                            for c, cell_format in enumerate(formats(r))))
+    sheet.close()
+    ods.freeze(constants.GROUPS_TEAM_RESULTS, 1)
+    ods.databaseRange('groupTeamResult', constants.GROUPS_TEAM_RESULTS, 0, 0, 7, len(plan.teams))
+
+
+def _groupFormats(ods, group_plan, fight_cards):
+    """Cell formats of the sheets of the groups of the size of the group, the same as the template sheet of
+    ``helpers.createGroups``.
+    """
+    group = group_plan.participants
+    table_coords = group_plan.table_coords
+    add = payloads.offset
+    formats = _Formats()
+    formats.style([(0, 0) + group_plan.extent], 'scoring_table_default')
+    formats.style([(0, 0, 0, 0)], 'scoring_sheet_header')
+    formats.tableBorder((0, 0, len(group) + 5, 1), payloads.THICK_BORDER)
+    formats.direct((0, 2, len(group) + 5, 2), BottomBorder2=payloads.THIN_BORDER)
+    formats.direct((0, 3, len(group) + 5, 3), BottomBorder2=payloads.THIN_BORDER)
+    formats.style([add(table_coords, 0, 0) + add(table_coords, 0, 1 + len(group) - 1)], 'scoring_table_number')
+    formats.style([add(table_coords, 1, 0) + add(table_coords, 1, 1 + len(group) - 1)], 'scoring_table_name')
+    formats.style([add(table_coords, 2, 0) + add(table_coords, 2 + len(group) - 1 + 4, 1 + len(group) - 1)], 'scoring_table_inner')
+    formats.style([add(table_coords, 2 + j, 1 + j) * 2 for j in range(len(group))], 'scoring_table_inner_self')
+    formats.tableBorder(add(table_coords, 2, 1) + add(table_coords, 2 + len(group) - 1, 1 + len(group) - 1), payloads.THICK_BORDER)
+    for card, ranges in fight_cards.items():
+        formats.style(ranges, payloads.FIGHT_CARD_STYLES[card])
+    return formats.resolve(ods)
+
+
+def _groupMerges(group):
+    return [(0, 0, len(group) + 5, 1), (0, 2, 1, 2), (2, 2, len(group) + 5, 2), (0, 3, 1, 3), (2, 3, len(group) + 5, 3),
+            (0, 4, 1, 4), (2, 4, len(group) + 5, 4)]
+
+
+def _writeGroupSheet(part, group_plan, contents, formats):
+    group = group_plan.participants
+    table_coords = group_plan.table_coords
+    schedule_coords = group_plan.schedule_coords
+    names = [p.name for p in group]
+    numbers = [str(j + 1) for j in range(len(group))]
+
+    # the widths of the columns, see helpers.createGroups
+    widths = dict()
+    widths[table_coords[0]] = (_width(numbers, 150), True, True)
+    widths[table_coords[0] + 1] = (_width(names + ['Name'], 150), True, True)
+    for j in range(len(group)):
+        widths[table_coords[0] + 2 + j] = (_width(['00'], 150), True, True)
+    for k in range(3):
+        widths[table_coords[0] + 2 + len(group) + k] = (COLUMN_WIDTH, False, True)
+    widths[table_coords[0] + 2 + len(group) + 3] = (_width(['Signature'], 150), True, True)
+    widths[table_coords[0] + len(group) + 6] = (100_0, True, False)
+    for j in range(planning.SCHEDULE_COLS):
+        widths[schedule_coords[0] + 3 * j + 0] = (_width(numbers, 150), True, True)
+        widths[schedule_coords[0] + 3 * j + 1] = (_width(names, 150), True, True)
+        widths[schedule_coords[0] + 3 * j + 2] = (200_0, True, False)
+    columns = [widths.get(c, (None, True, False)) for c in range(max(widths) + 1)]
+
+    sheet = part.sheet(group_plan.name, columns, merges=_groupMerges(group))
+    for r, cells in _rows(contents, formats):
+        sheet.write(r, cells)
+    sheet.close()
+
+
+def _writeElimination(part, plan, layout, fight_log, names, clubs):
+    team = plan.team
+    fill_random = plan.settings.fill_elimination_random
+    contents = dict()
+    for cells in layout.cells:
+        contents.update(cells)
+    references = dict()
+    for i, fight in enumerate(layout.plan.fights):
+        if fill_random > 0:
+            random_scores = payloads.randomPair(fill_random)
+            for k, coords in enumerate(layout.score_cells[i]):
+                if coords is not None:
+                    contents[coords] = random_scores[k]
+        if fight.phase is not None:
+            ring, start = plan.timetable.elimination[i]
+            references[i] = fight_log.add(fight.phase, *payloads.eliminationFight(fight, team), ring=ring, start=start)
+    for _, c, r, template, i in layout.outcomes:
+        contents[c, r] = template.format(*references[i])
+
+    formats = _Formats()
+    for style, ranges in layout.styles.items():
+        formats.style(ranges, style)
+
+    # the widths of the columns, see helpers.createElimination
+    number = (_width([str(plan.cut_n)]), True, True)
+    if team:
+        columns = [number, (_width(plan.teams), True, True), (100_0, True, False)]
+    else:
+        columns = [number, (_width(names), True, True), (_width(clubs), False, True), (278_0, True, False)]
+
+    sheet = part.sheet(constants.ELIMINATION, columns * layout.plan.num_layers)
+    for r, cells in _rows(contents, formats.resolve(part.ods)):
+        sheet.write(r, cells)
+    sheet.close()
+
+
+class _FightLog(object):
+    """Writer of the List of fights and Results sheets, the counterpart of ``helpers.FightLog``."""
+
+    def __init__(self, list_of_fights, results, time_format):
+        self.list_of_fights = list_of_fights
+        self.results = results
+        self.time_format = time_format
+        self.row = 1
+        list_of_fights.write(0, _plain(['Phase', 'Fighter 1', 'Fighter 2', 'Fighter 1 score', 'Fighter 2 score',
+                                        'Result', 'Ring', 'Start']))
+        results.write(0, _plain(['Fight', 'Phase', 'Fighter 1', 'Fighter 2', 'Fighter 1 score', 'Fighter 2 score']))
+
+    def add(self, phase, fighter1, fighter2, score1, score2, ring=None, start=None):
+        """Appends a fight, returns the references to its scores in the Results sheet, see ``helpers.FightLog.add``."""
+        result, listed = payloads.fightRows(self.row, phase, fighter1, fighter2, score1, score2, ring, start)
+        self.results.write(self.row, _plain(result))
+        cells = _plain(listed)
+        cells[7] = (cells[7][0] or None, self.time_format)
+        self.list_of_fights.write(self.row, cells)
+        self.row += 1
+        return payloads.resultReference(4, self.row - 1), payloads.resultReference(5, self.row - 1)
+
+    def close(self):
+        self.list_of_fights.close()
+        self.results.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Schedules a tournament and writes it into an .ods file, without '
+                                                 'LibreOffice (numpy and scipy are needed).')
+    parser.add_argument('participants', help='CSV (or TSV) file with the participant list - name, club/team, country, '
+                                             'rating/rank and present ("y" for those who checked in), with a header row')
+    parser.add_argument('output', help='the .ods file to write')
+    for field, (name, default, description) in zip(planning.Settings._fields, planning.SETTING_ROWS):
+        parser.add_argument('--' + name.lower().replace(' ', '-'), dest=field, type=float, default=default,
+                            help='{} (default: {})'.format(description or name, default))
+    args = parser.parse_args(argv)
+    settings = planning.makeSettings([getattr(args, field) for field in planning.Settings._fields])
+    writeTournament(args.output, readParticipantList(args.participants), settings)
+
+
+if __name__ == '__main__':
+    main()
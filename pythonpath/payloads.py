@@ -0,0 +1,472 @@
+# coding: utf-8
+"""Contents of the cells written for the groups, independent of LibreOffice.
+
+The contents of each group (its sheet, its part of Group list, Groups - results and Final ranking, and its fights for
+the List of fights) depend only on the plan of the group, so they are built separately for each group and written into
+the document afterwards.
+"""
+from __future__ import unicode_literals
+
+import functools
+import random
+import re
+from collections import namedtuple
+
+import constants
+import planning
+
+# number format of the start times, which are written as fractions of a day
+TIME_FORMAT = '[HH]:MM'
+MINUTES_PER_DAY = 24 * 60
+
+# widths of the (solid) border lines of the cells, in 1/100 mm
+THIN_BORDER = 35 // 2
+MEDIUM_BORDER = 35
+THICK_BORDER = 2 * 35
+
+
+# properties of the Default cell style set by init
+DEFAULT_STYLE = dict(
+    CharHeight=12,
+    ParaTopMargin=2 * 35,
+    ParaLeftMargin=2 * 35,
+    ParaBottomMargin=2 * 35,
+    ParaRightMargin=2 * 35,
+)
+
+
+def _fightCardStyles():
+    """Cell styles of a fight card in the list of fights of a group, by (column, row) in the card - thick border around
+    the card, thin lines inside.
+    """
+    styles = []
+    for r, (top, bottom) in enumerate([(THICK_BORDER, THIN_BORDER), (THIN_BORDER, THICK_BORDER)]):
+        for c, (left, right) in enumerate([(THICK_BORDER, THIN_BORDER), (THIN_BORDER, THIN_BORDER), (THIN_BORDER, THICK_BORDER)]):
+            name = 'fight_card_{}_{}'.format(['top', 'bottom'][r], ['left', 'middle', 'right'][c])
+            styles.append(((c, r), (name, dict(
+                TopBorder2=top,
+                RightBorder2=right,
+                BottomBorder2=bottom,
+                LeftBorder2=left
+            ), 'scoring_table_default')))
+    return styles
+
+
+# names of the cell styles of the fight cards, by (column, row) in the card
+FIGHT_CARD_STYLES = dict((card, style[0]) for card, style in _fightCardStyles())
+
+# cell styles of the group sheets and of the group results as (name, properties, parent), the border lines are given by
+# their widths; the parent of a style comes before it
+GROUP_STYLES = [
+    ('scoring_table_default', dict(
+        ParaTopMargin=150,
+        ParaLeftMargin=150,
+        ParaBottomMargin=150,
+        ParaRightMargin=150,
+    ), 'Default'),
+    ('scoring_table_number', dict(
+        VertJustify=2,
+        HoriJustify=2,
+        TopBorder2=MEDIUM_BORDER,
+        RightBorder2=MEDIUM_BORDER,
+        BottomBorder2=MEDIUM_BORDER,
+        LeftBorder2=MEDIUM_BORDER
+    ), 'scoring_table_default'),
+    ('scoring_table_name', dict(
+        VertJustify=2,
+        HoriJustify=1,
+        TopBorder2=MEDIUM_BORDER,
+        RightBorder2=MEDIUM_BORDER,
+        BottomBorder2=MEDIUM_BORDER,
+        LeftBorder2=MEDIUM_BORDER
+    ), 'scoring_table_default'),
+    ('scoring_table_inner', dict(
+        VertJustify=2,
+        HoriJustify=2,
+        TopBorder2=MEDIUM_BORDER,
+        RightBorder2=MEDIUM_BORDER,
+        BottomBorder2=MEDIUM_BORDER,
+        LeftBorder2=MEDIUM_BORDER
+    ), 'scoring_table_default'),
+    ('scoring_table_inner_self', dict(
+        VertJustify=2,
+        HoriJustify=2,
+        IsCellBackgroundTransparent=False,
+        CellBackColor=0x00CCCCCC,
+        TopBorder2=MEDIUM_BORDER,
+        RightBorder2=MEDIUM_BORDER,
+        BottomBorder2=MEDIUM_BORDER,
+        LeftBorder2=MEDIUM_BORDER
+    ), 'scoring_table_default'),
+    ('scoring_sheet_header', dict(
+        VertJustify=2,
+        HoriJustify=2,
+        CharHeight=15,
+        ParaTopMargin=235,
+        ParaLeftMargin=235,
+        ParaBottomMargin=235,
+        ParaRightMargin=235,
+    ), 'scoring_table_default'),
+    ('group_results_eliminated', dict(
+        IsCellBackgroundTransparent=False,
+        CellBackColor=0x00CCCCCC,
+    ), 'Default'),
+] + [style for _, style in _fightCardStyles()]
+
+# cell styles of the elimination bracket, see GROUP_STYLES
+ELIMINATION_STYLES = [
+    ('elimination_bracket_line', dict(
+        LeftBorder2=MEDIUM_BORDER
+    ), 'Default'),
+    ('elimination_cell', dict(
+        VertJustify=2,
+        TopBorder2=MEDIUM_BORDER,
+        LeftBorder2=MEDIUM_BORDER,
+        BottomBorder2=MEDIUM_BORDER,
+        RightBorder2=MEDIUM_BORDER,
+    ), 'Default'),
+    ('elimination_number', dict(
+        HoriJustify=0
+    ), 'elimination_cell'),
+    ('elimination_name', dict(
+        HoriJustify=1
+    ), 'elimination_cell'),
+]
+
+GroupPayload = namedtuple('GroupPayload', [
+    # {(column, row): content} of the group sheet, empty if the sheet is kept
+    'sheet',
+    # {(column, row) in a fight card: [(c0, r0, c1, r1)]} of the cells of the fight cards in the group sheet
+    'fight_cards',
+    # {(column, row): content} of Group list, Groups - results and Final ranking
+    'group_list',
+    'results',
+    'final_ranking',
+    # (fighter 1, fighter 2, fighter 1 score, fighter 2 score) of each fight, for the List of fights
+    'fights',
+    # cells of the scoring table with the score of the first and of the second fighter of each fight
+    'bindings',
+])
+
+
+def makeGroupPayload(group_plan, team, cut_n, headers, scores, rnd, rebuild):
+    """Builds the contents of the group.
+
+    ``headers`` are the texts of the Ring, Referee and Assistant referee(s) fields of the group sheet (None for an
+    empty field), ``scores`` the scores (a pair, or None) to fill in for each fight and ``rnd`` the RND values by the
+    row of the participant. The contents of the group sheet are built only if ``rebuild`` is true.
+    """
+    group = group_plan.participants
+    group_name = group_plan.name
+    table_coords = group_plan.table_coords
+    group_col, group_row = group_plan.list_coords
+
+    sheet = dict()
+    group_list = dict()
+    results = dict()
+    final_ranking = dict()
+    if rebuild:
+        # sheet header
+        sheet[0, 0] = group_name
+        sheet[0, 2] = 'Ring'
+        sheet[0, 3] = 'Referee'
+        sheet[0, 4] = 'Assistant referee(s)'
+        for k, text in enumerate(headers):
+            if text:
+                sheet[2, 2 + k] = text
+
+        # table header
+        sheet[offset(table_coords, 1, 0)] = 'Name'
+        sheet[offset(table_coords, 2 + len(group) + 0, 0)] = 'V/M'
+        sheet[offset(table_coords, 2 + len(group) + 1, 0)] = 'D'
+        sheet[offset(table_coords, 2 + len(group) + 2, 0)] = 'R'
+        sheet[offset(table_coords, 2 + len(group) + 3, 0)] = 'Signature'
+
+    for j, p in enumerate(group):
+        participant_ref = participantReference(p)
+        club_ref = participantClubReference(p)
+
+        # write into summary group list
+        group_list[group_col, group_row + 1 + j] = j + 1
+        group_list[group_col + 1, group_row + 1 + j] = '={}'.format(participant_ref)
+        group_list[group_col + 2, group_row + 1 + j] = '={}'.format(club_ref)
+
+        if rebuild:
+            # write into scoring table
+            # number column
+            sheet[offset(table_coords, 2 + j, 0)] = j + 1
+            # number row
+            sheet[offset(table_coords, 0, 1 + j)] = j + 1
+            # name
+            sheet[offset(table_coords, 1, 1 + j)] = '={}'.format(participant_ref)
+            # scores of the participant (the row) and of the opponents (the column), the self-match cell is empty
+            row_range = cellName(*offset(table_coords, 2, 1 + j)) + ':' + cellName(*offset(table_coords, 2 + len(group) - 1, 1 + j))
+            col_range = cellName(*offset(table_coords, 2 + j, 1)) + ':' + cellName(*offset(table_coords, 2 + j, 1 + len(group) - 1))
+            # victories / matches
+            sheet[offset(table_coords, 2 + len(group) + 0, 1 + j)] = '=SUMPRODUCT({} > TRANSPOSE({})) / {}'.format(row_range, col_range, len(group) - 1)
+            # dealt
+            sheet[offset(table_coords, 2 + len(group) + 1, 1 + j)] = '=SUM({})'.format(row_range)
+            # received
+            sheet[offset(table_coords, 2 + len(group) + 2, 1 + j)] = '=SUM({})'.format(col_range)
+
+        # write into results table
+        res_row = group_plan.results_row + j
+        results[0, res_row] = res_row
+        results[1, res_row] = "={}".format(participant_ref)
+        results[2, res_row] = "={}".format(club_ref)
+        results[3, res_row] = "=$'{}'.{}".format(group_name, cellName(*offset(table_coords, 2 + len(group) + 0, 1 + j)))
+        results[4, res_row] = '={} - {}'.format(cellName(5, res_row), cellName(6, res_row))
+        results[5, res_row] = "=$'{}'.{}".format(group_name, cellName(*offset(table_coords, 2 + len(group) + 1, 1 + j)))
+        results[6, res_row] = "=$'{}'.{}".format(group_name, cellName(*offset(table_coords, 2 + len(group) + 2, 1 + j)))
+        if p.row in rnd:
+            results[7, res_row] = rnd[p.row]
+        if res_row > cut_n and not team:
+            final_ranking[1, res_row] = "=$'{}'.{}".format(constants.GROUPS_RESULTS, cellName(1, res_row))
+            final_ranking[2, res_row] = "=$'{}'.{}".format(constants.GROUPS_RESULTS, cellName(2, res_row))
+            final_ranking[4, res_row] = res_row
+
+    fight_cards = dict(((c, r), []) for c in range(3) for r in range(2))
+    fights = []
+    bindings = []
+    for (a, b), (col, row), fight_scores in zip(group_plan.fights, group_plan.fight_coords, scores):
+        a_ref = '={}'.format(participantReference(group[a]))
+        b_ref = '={}'.format(participantReference(group[b]))
+        if rebuild:
+            # first participant header
+            sheet[col, row] = a + 1
+            sheet[col + 1, row] = a_ref
+            # second participant header
+            sheet[col, row + 1] = b + 1
+            sheet[col + 1, row + 1] = b_ref
+            for (c, r), ranges in fight_cards.items():
+                ranges.append((col + c, row + r) * 2)
+            if fight_scores is not None:
+                sheet[col + 2, row], sheet[col + 2, row + 1] = fight_scores
+
+        fights.append((a_ref, b_ref,
+                       "$'{}'.{}".format(group_name, cellName(col + 2, row)),
+                       "$'{}'.{}".format(group_name, cellName(col + 2, row + 1))))
+        bindings.append((offset(table_coords, 2 + b, 1 + a), offset(table_coords, 2 + a, 1 + b)))
+
+    return GroupPayload(sheet, fight_cards, group_list, results, final_ranking, fights, bindings)
+
+
+# contents of the Elimination sheet and of the elimination part of Final ranking, see bracketLayout
+BracketLayout = namedtuple('BracketLayout', [
+    # the elimination plan the layout is made for
+    'plan',
+    # {style name: [(c0, r0, c1, r1)]} of the Elimination sheet
+    'styles',
+    # {(column, row): content} of the cells of the Elimination sheet which do not depend on the Results sheet, for
+    # each layer
+    'cells',
+    # (layer, column, row, template, index of a fight) of the cells with the winner or loser of a listed fight, the
+    # template is formatted by the references to the scores of the fight in the Results sheet
+    'outcomes',
+    # {(column, row): content} of the cells of Final ranking which do not depend on the Results sheet
+    'ranking',
+    # (column, row, template, index of a fight) of the cells of Final ranking with the winner or loser of a listed fight
+    'ranking_outcomes',
+    # (column, row) of the top and bottom score cells of each fight, None for the scores which are not filled in (byes)
+    'score_cells',
+])
+
+
+def bracketColumns(fight, team):
+    """Columns of the number, name, club (None for teams) and score of the fighters of the fight."""
+    if team:
+        return fight.col, fight.col + 1, None, fight.col + 2
+    return fight.col, fight.col + 1, fight.col + 2, fight.col + 3
+
+
+@functools.lru_cache(maxsize=32)
+def bracketLayout(cut_n, team):
+    """Lays out the elimination bracket for the cut_n best participants (or teams).
+
+    Everything which depends only on the size of the bracket is computed here, once for each size, so that only the
+    references into the Results sheet (which depend on the number of the group fights before) are filled in for each
+    document.
+    """
+    elimination = planning.makeEliminationPlan(cut_n, team)
+    fights = elimination.fights
+    source_sheet = constants.GROUPS_TEAM_RESULTS if team else constants.GROUPS_RESULTS
+    prefix = "$'{}'.".format(constants.ELIMINATION)
+    winner = '=IF({0} > {1}; {2}; IF({0} < {1}; {3}; ""))'
+    loser = '=IF({0} < {1}; {2}; IF({0} > {1}; {3}; ""))'
+
+    styles = dict((name, []) for name in ['elimination_number', 'elimination_name', 'elimination_bracket_line'])
+    cells = [dict() for _ in range(elimination.num_layers)]
+    outcomes = []
+    ranking = dict()
+    ranking_outcomes = []
+    score_cells = []
+
+    def outcome(index, formula, prefix=''):
+        """Formulas (or templates, if the fight is listed) for the number, name and club (None for teams) of the winner
+        or loser of the fight.
+        """
+        fight = fights[index]
+        number_col, name_col, club_col, score_col = bracketColumns(fight, team)
+        ref = lambda c, r: prefix + cellName(c, r)
+        if fight.phase is None:
+            scores = (ref(score_col, fight.row), ref(score_col, fight.row + 1))
+        else:
+            scores = ('{0}', '{1}')
+        return tuple(None if c is None else formula.format(scores[0], scores[1], ref(c, fight.row), ref(c, fight.row + 1))
+                     for c in (number_col, name_col, club_col))
+
+    def add(target, templates, index, c, r, content):
+        if fights[index].phase is None:
+            target[c, r] = content
+        else:
+            templates.append((c, r, content, index))
+
+    for i, fight in enumerate(fights):
+        col = fight.col
+        row = fight.row
+        number_col, name_col, club_col, score_col = bracketColumns(fight, team)
+        layer = cells[fight.layer]
+
+        styles['elimination_number'].append((col, row, col, row + 1))
+        styles['elimination_name'].append((col + 1, row, col + 1, row + 1))
+        if team:
+            styles['elimination_number'].append((col + 2, row, col + 2, row + 1))
+        else:
+            styles['elimination_name'].append((col + 2, row, col + 2, row + 1))
+            styles['elimination_number'].append((col + 3, row, col + 3, row + 1))
+        if fight.bracket_lines > 0:
+            styles['elimination_bracket_line'].append((col, row - fight.bracket_lines, col, row - 1))
+            styles['elimination_bracket_line'].append((col, row + 2, col, row + 1 + fight.bracket_lines))
+
+        fight_scores = []
+        for k, (source, opponent) in enumerate(((fight.top, fight.bottom), (fight.bottom, fight.top))):
+            if source.kind == 'bye':
+                layer[score_col, row + k] = -1
+                fight_scores.append(None)
+                continue
+            if source.kind == 'seed':
+                formulas = ("=$'{}'.A{}".format(source_sheet, source.index + 2),
+                            "=$'{}'.B{}".format(source_sheet, source.index + 2),
+                            None if team else "=$'{}'.C{}".format(source_sheet, source.index + 2))
+            else:
+                formulas = outcome(source.index, winner if source.kind == 'winner' else loser)
+            for c, formula in zip((number_col, name_col, club_col), formulas):
+                if c is None:
+                    continue
+                if source.kind == 'seed' or fights[source.index].phase is None:
+                    layer[c, row + k] = formula
+                else:
+                    outcomes.append((fight.layer, c, row + k, formula, source.index))
+            if opponent.kind == 'bye':
+                layer[score_col, row + k] = 0
+                fight_scores.append(None)
+            else:
+                fight_scores.append((score_col, row + k))
+        score_cells.append(tuple(fight_scores))
+
+        for ranked, formula in ((fight.loser_ranking, loser), (fight.winner_ranking, winner)):
+            if ranked is None:
+                continue
+            ranking_row, elimination_round = ranked
+            number, name, club = outcome(i, formula, prefix)
+            add(ranking, ranking_outcomes, i, 1, ranking_row, name)
+            if team:
+                ranking[2, ranking_row] = elimination_round
+                add(ranking, ranking_outcomes, i, 3, ranking_row, number)
+            else:
+                add(ranking, ranking_outcomes, i, 2, ranking_row, club)
+                ranking[3, ranking_row] = elimination_round
+                add(ranking, ranking_outcomes, i, 4, ranking_row, number)
+
+    return BracketLayout(elimination, styles, cells, outcomes, ranking, ranking_outcomes, score_cells)
+
+
+def eliminationFight(fight, team):
+    """Contents of the fighter cells and the references to the score cells of the fight, for the List of fights."""
+    _, name_col, _, score_col = bracketColumns(fight, team)
+    name = lambda r: '={}'.format(ifNotBlank("$'{}'.{}".format(constants.ELIMINATION, cellName(name_col, r))))
+    score = lambda r: "$'{}'.{}".format(constants.ELIMINATION, cellName(score_col, r))
+    return name(fight.row), name(fight.row + 1), score(fight.row), score(fight.row + 1)
+
+
+def fightRows(row, phase, fighter1, fighter2, score1, score2, ring=None, start=None):
+    """Rows of the fight in the Results sheet and in List of fights (as written by ``setFormulaArray``), where the
+    fight is in the given row of both. See :meth:`helpers.FightLog.add` for the arguments.
+    """
+    result = (str(row),
+              phase,
+              fighter1,
+              fighter2,
+              '={}'.format(ifNotBlank(score1)),
+              '={}'.format(ifNotBlank(score2)))
+    listed = (phase,
+              '={}'.format(resultReference(2, row)),
+              '={}'.format(resultReference(3, row)),
+              '={}'.format(resultReference(4, row)),
+              '={}'.format(resultReference(5, row)),
+              '=IF({} < {}; "Loss"; "Win")'.format(cellName(3, row), cellName(4, row)),
+              '' if ring is None else str(ring + 1),
+              '' if start is None else str(start / MINUTES_PER_DAY))
+    return result, listed
+
+
+def resultReference(col, row):
+    """Reference to the cell of the Results sheet."""
+    return "$'{}'.{}".format(constants.RESULTS, cellName(col, row))
+
+
+def ringHeader(ring, start):
+    """Text of the Ring field of a group sheet, the (0-based) ring and the start of the first fight in minutes."""
+    return '{} (from {})'.format(ring + 1, formatMinutes(start))
+
+
+def isRingHeader(text):
+    """Whether the text of the Ring field of a group sheet is the one generated by :func:`ringHeader`."""
+    return _RING_HEADER.match(text) is not None
+
+
+_RING_HEADER = re.compile(r'^\d+ \(from \d+:\d\d\)$')
+
+
+def formatMinutes(minutes):
+    """Formats a duration in minutes as hours:minutes."""
+    minutes = int(round(minutes))
+    return '{}:{:02d}'.format(minutes // 60, minutes % 60)
+
+
+def ifNotBlank(ref):
+    return 'IF(ISBLANK({0}); ""; {0})'.format(ref)
+
+
+def randomPair(ub):
+    """Random scores of a fight, two different integers in [0, ub]."""
+    a = random.randint(0, ub)
+    b = random.randint(0, ub)
+    while a == b:
+        b = random.randint(0, ub)
+    return a, b
+
+
+def cellName(col, row):
+    """Address of the cell in the A1 notation."""
+    column = ""
+    rem = col % 26
+    div = col // 26
+    column = chr(ord('A') + rem) + column
+    while div > 0:
+        rem = div % 26
+        div = div // 26
+        column = chr(ord('A') + rem) + column
+    return column + str(row + 1)
+
+
+def offset(coords, col, row):
+    return (coords[0] + col, coords[1] + row)
+
+
+def participantReference(participant):
+    return "$'{}'.{}".format(constants.PARTICIPANT_LIST, cellName(0, participant.row))
+
+
+def participantClubReference(participant):
+    return "$'{}'.{}".format(constants.PARTICIPANT_LIST, cellName(1, participant.row))
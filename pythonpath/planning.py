@@ -0,0 +1,413 @@
+# coding: utf-8
+"""Planning of a whole tournament, independent of LibreOffice.
+
+The plan contains everything that is decided before anything is written into the document - the groups, the order
+of fights in them, the layout of the sheets, the seeding of the elimination bracket, the cut line and the slots of
+the final ranking. It can be computed (and profiled) by a plain python interpreter.
+"""
+from __future__ import unicode_literals
+
+import functools
+from collections import namedtuple
+
+import algorithms
+import constants
+
+
+Participant = namedtuple('Participant', ['row', 'name', 'club', 'country', 'rating'])
+
+Settings = namedtuple('Settings', ['max_group_size', 'groups_per_row', 'to_elimination', 'rating_is_rank',
+                                   'large_groups_first', 'team_ranking_n', 'fill_groups_random',
+                                   'fill_elimination_random', 'profiling', 'rings', 'bout_duration', 'min_rest'])
+
+# rows of the Settings sheet - the name, the default value and the description of each setting, in the order of Settings
+SETTING_ROWS = [
+    ('Max group size', 7, None),
+    ('Groups per row', 4, 'Number of groups per row in group display sheet, has no functional impact.'),
+    ('To elimination', 0.8, 'Fraction of participants that will pass to the elimination.'),
+    ('Rating is rank', 1, 'Indicates whether the number in the rating/rank column is rating (bigger is better), or rank (smaller is better). 1 => rank.'),
+    ('Large groups first', 1, 'If the groups have different sizes, where should the people in the last layer be put? 1 = to the first groups, 0 = to the last groups.'),
+    ('Team ranking N', 0, 'Teams are ranked by summing rank of best N members of each team. If set to <=0, team processing does not happen. If set to >0, teams proceed to elimination instead of participants, with the cut being applied to the teams.'),
+    ('Fill groups random', 0, 'If >0, results of group bouts will be filled by random integers in the range [0, 5]'),
+    ('Fill elimination random', 0, 'If >0, results of elimination bouts will be filled by random integers in the range [0, 5]'),
+    ('Profiling', 0, 'If 1, the calls the macros make to LibreOffice are counted and timed, and the report is written into the hidden sheet Performance. If 2, the report is written into <document>-performance.json next to the document. 0 => off.'),
+    ('Rings', 1, 'Number of rings the groups and the elimination bouts are assigned to.'),
+    ('Bout duration', 3, 'Average duration of a bout (including the change of fighters) in minutes, used to estimate when the bouts start.'),
+    ('Minimum rest', 0, 'Minimum time in minutes between the end of a bout and the next bout of the same fighter.'),
+]
+
+TournamentPlan = namedtuple('TournamentPlan', [
+    'settings',
+    'participants',
+    # whether teams (instead of individual participants) are ranked and proceed to the elimination
+    'team',
+    # names of the teams, in the order of their first appearance in the participant list
+    'teams',
+    # number of participants (or teams) which proceed to the elimination
+    'cut_n',
+    'groups',
+    'max_group_size',
+    'elimination',
+    'timetable',
+])
+
+GroupPlan = namedtuple('GroupPlan', [
+    'name',
+    'participants',
+    # pairs of indices (into participants) of the fighters, in the order of the fights
+    'fights',
+    # top-left cell of the scoring table in the group sheet
+    'table_coords',
+    # top-left cell of the list of fights in the group sheet
+    'schedule_coords',
+    # top-left cell of each fight of the list of fights in the group sheet; the scores are two cells to the right
+    'fight_coords',
+    # top-left cell of the group in the Group list sheet
+    'list_coords',
+    # bottom-right cell of the part of the group sheet the group uses (the header, the scoring table and the list of
+    # fights)
+    'extent',
+    # row of the first participant of the group in the Groups - results sheet
+    'results_row',
+])
+
+EliminationPlan = namedtuple('EliminationPlan', ['num_layers', 'fights'])
+
+EliminationFight = namedtuple('EliminationFight', [
+    # layer of the bracket, 0 is the first one
+    'layer',
+    # top-left cell of the fight in the Elimination sheet (the number of the top fighter)
+    'col',
+    'row',
+    # where the top and bottom fighters come from, see Source
+    'top',
+    'bottom',
+    # length of the bracket lines leading to the fight from the fights of the previous layer
+    'bracket_lines',
+    # name of the phase in the List of fights, None if the fight is not listed there (a fight with a bye)
+    'phase',
+    # (row in Final ranking, elimination round) of the loser and winner of the fight, or None
+    'loser_ranking',
+    'winner_ranking',
+])
+
+# times are in minutes from the start of the tournament, rings are 0-based
+Timetable = namedtuple('Timetable', [
+    # ring of each group
+    'group_rings',
+    # start time of each fight of each group, in the order of the fights
+    'group_starts',
+    # (ring, start time) of each elimination fight, the ring is None for a fight which is not fought (with a bye)
+    'elimination',
+])
+
+# estimated size of the tournament for one combination of the settings, see capacityOptions
+CapacityOption = namedtuple('CapacityOption', [
+    'max_group_size',
+    # sizes of the groups, or None if the groups cannot be arranged
+    'group_sizes',
+    'to_elimination',
+    'cut_n',
+    'group_bouts',
+    'elimination_bouts',
+    # estimated duration (in minutes) of the whole tournament, by the number of rings
+    'durations',
+])
+
+# results entered into a scheduled tournament, see helpers.loadEnteredResults
+EnteredResults = namedtuple('EnteredResults', [
+    # rows (in Participant list) of the members of each group, in their order in the group sheets
+    'groups',
+    # {(row of fighter 1, row of fighter 2): (score 1, score 2)} of the group fights with any score entered
+    'group_scores',
+    # {index of group: (ring, referee, assistant referees)}
+    'group_headers',
+    # {row of participant: RND} in Groups - results
+    'rnd',
+    # (number of seeds, whether teams are seeded) of the elimination bracket, or None if there is none
+    'elimination',
+    # {(column, row): score} of the elimination bracket
+    'elimination_scores',
+])
+
+# kind is one of 'seed' (index is the rank after the group phase, 0-based), 'bye' (no index), 'winner' or 'loser'
+# (index is the index of the elimination fight the fighter comes from)
+Source = namedtuple('Source', ['kind', 'index'])
+BYE = Source('bye', None)
+
+SCHEDULE_COLS = 2
+# candidate settings of the capacity plan, in addition to the current ones
+CAPACITY_MAX_GROUP_SIZES = [5, 6, 7, 8, 9, 10]
+CAPACITY_FRACTIONS = [0.25, 0.5, 0.75, 1.0]
+CAPACITY_RINGS = 4
+TABLE_COORDS = (0, 5)
+# participants with the same value of any of these are spread into different groups, if possible
+SPREAD_CRITERIA = [(lambda p: p.club), (lambda p: p.country)]
+
+
+def makeSettings(values):
+    """Makes the settings from the numbers in the rows of the Settings sheet (see SETTING_ROWS)."""
+    return Settings(max_group_size=int(values[0]),
+                    groups_per_row=int(values[1]),
+                    to_elimination=values[2],
+                    rating_is_rank=values[3] == 1,
+                    large_groups_first=values[4] == 1,
+                    team_ranking_n=int(values[5]),
+                    fill_groups_random=int(values[6]),
+                    fill_elimination_random=int(values[7]),
+                    profiling=int(values[8]),
+                    rings=int(values[9]),
+                    bout_duration=values[10],
+                    min_rest=values[11])
+
+
+def makeParticipants(rows):
+    """Makes the present participants from the rows of the Participant list (without the header, as read by
+    ``getDataArray``), numbered from 1. Rows without a name are skipped.
+    """
+    participants = []
+    for row, (name, club, country, rating, present) in enumerate(rows, 1):
+        name = dataString(name)
+        if name and dataString(present) == 'y':
+            rating = rating if isinstance(rating, float) else 0.0
+            participants.append(Participant(row, name, dataString(club), dataString(country), rating))
+    return participants
+
+
+def dataString(item):
+    """Converts an item of ``getDataArray`` into the string ``getString`` would return for the cell."""
+    if isinstance(item, float):
+        return str(int(item)) if item.is_integer() else str(item)
+    return item
+
+
+def makePlan(participants, settings):
+    """Plans the whole tournament for the given (present) participants and settings."""
+    group_sizes = algorithms.findGroupSizes(len(participants), settings.max_group_size, settings.large_groups_first)
+    groups = algorithms.assignGroups(group_sizes, sorted(participants, key=seedingKey(settings.rating_is_rank)), SPREAD_CRITERIA)
+    return _makePlan(participants, settings, groups)
+
+
+def replan(participants, settings, old_groups):
+    """Plans the tournament for changed participants, keeping the existing groups as they are as much as possible.
+
+    ``old_groups`` are the rows (in the Participant list) of the members of the existing groups, in their order in the
+    groups. Participants who are no longer present are removed from their groups. New participants, the best seeded
+    first, are appended to the smallest of the groups which are not full, preferring the groups with fewer members of
+    the same club and country. Returns the plan and the indices of the groups whose members changed.
+    """
+    by_row = {p.row: p for p in participants}
+    groups = [[by_row[row] for row in rows if row in by_row] for rows in old_groups]
+    placed = set(row for rows in old_groups for row in rows)
+    for p in sorted([p for p in participants if p.row not in placed], key=seedingKey(settings.rating_is_rank)):
+        candidates = [g for g in groups if len(g) < settings.max_group_size]
+        if not candidates:
+            raise ValueError('There is no room for {} in any group.'.format(p.name))
+        group = min(candidates, key=lambda g: (len(g),) + tuple(sum(1 for q in g if c(q) == c(p)) for c in SPREAD_CRITERIA))
+        group.append(p)
+    for i, group in enumerate(groups):
+        if len(group) < 2:
+            raise ValueError('Group {} would have less than 2 participants.'.format(i + 1))
+    changed = [i for i, (group, rows) in enumerate(zip(groups, old_groups)) if [p.row for p in group] != list(rows)]
+    return _makePlan(participants, settings, groups), changed
+
+
+def _makePlan(participants, settings, groups):
+    team = settings.team_ranking_n > 0
+    teams = _teams(participants)
+    cut_n = cutCount(settings.to_elimination, len(teams) if team else len(participants))
+
+    max_group_size = max(len(group) for group in groups)
+
+    group_plans = []
+    results_row = 1
+    for i, group in enumerate(groups):
+        group_plans.append(makeGroupPlan(i, group, max_group_size, settings.groups_per_row, results_row))
+        results_row += len(group)
+
+    elimination = makeEliminationPlan(cut_n, team)
+    return TournamentPlan(settings=settings,
+                          participants=participants,
+                          team=team,
+                          teams=teams,
+                          cut_n=cut_n,
+                          groups=group_plans,
+                          max_group_size=max_group_size,
+                          elimination=elimination,
+                          timetable=makeTimetable(group_plans, elimination, settings))
+
+
+def _teams(participants):
+    teams = []
+    for p in participants:
+        if p.club not in teams:
+            teams.append(p.club)
+    return teams
+
+
+def cutCount(to_elimination, n):
+    """Returns the number of the n participants (or teams) which proceed to the elimination."""
+    if to_elimination <= 1:
+        return round(to_elimination * n)
+    return round(to_elimination)
+
+
+def capacityOptions(participants, settings, max_group_sizes, fractions, rings):
+    """Estimates the size and the duration of the tournament for each combination of the given max group sizes and
+    fractions of participants proceeding to the elimination (see the To elimination setting), with the other settings
+    as they are. The durations are for each of the given numbers of rings.
+
+    The groups are assigned to the rings in the same way as in the timetable (see makeTimetable), but the elimination
+    is estimated in closed form, layer by layer, which overestimates it slightly if the minimum rest is not zero.
+    """
+    team = settings.team_ranking_n > 0
+    n = len(_teams(participants)) if team else len(participants)
+    duration = settings.bout_duration
+    options = []
+    for max_group_size in max_group_sizes:
+        try:
+            group_sizes = sorted(algorithms.findGroupSizes(len(participants), max_group_size, settings.large_groups_first), reverse=True)
+        except ValueError:
+            group_sizes = None
+        groups_times = []
+        if group_sizes is not None:
+            lengths = [algorithms.groupDuration(size, duration, settings.min_rest) for size in group_sizes]
+            for num_rings in rings:
+                starts = algorithms.assignLongestFirst(lengths, num_rings)
+                groups_times.append(max(start + length for (_, start), length in zip(starts, lengths)))
+        for fraction in fractions:
+            cut_n = cutCount(fraction, n)
+            layers = algorithms.countEliminationBouts(cut_n)
+            durations = [groups_time + sum(-(-bouts // num_rings) * duration + settings.min_rest for bouts in layers)
+                         for groups_time, num_rings in zip(groups_times, rings)]
+            options.append(CapacityOption(max_group_size=max_group_size,
+                                          group_sizes=group_sizes,
+                                          to_elimination=fraction,
+                                          cut_n=cut_n,
+                                          group_bouts=None if group_sizes is None else sum(s * (s - 1) // 2 for s in group_sizes),
+                                          elimination_bouts=sum(layers),
+                                          durations=durations))
+    return options
+
+
+def seedingKey(rating_is_rank):
+    """Returns the key the participants are sorted by (the best first) before they are assigned into groups."""
+    if rating_is_rank:
+        return lambda x: x.rating
+    else:
+        return lambda x: -x.rating
+
+
+def makeGroupPlan(i, group, max_group_size, groups_per_row, results_row):
+    """Plans the fights and the layout of the i-th (0-based) group."""
+    fights = algorithms.groupScheduleIndices(len(group))
+    schedule_coords = (len(group) + 7, 0)
+    fight_coords = []
+    for j in range(len(fights)):
+        row = 2 * (j // SCHEDULE_COLS)
+        col = 3 * (j % SCHEDULE_COLS)
+        fight_coords.append((schedule_coords[0] + col, schedule_coords[1] + row))
+    extent = (schedule_coords[0] + 3 * SCHEDULE_COLS - 1,
+              max([TABLE_COORDS[1] + len(group)] + [r + 1 for _, r in fight_coords]))
+    return GroupPlan(name='Group {}'.format(i + 1),
+                     participants=list(group),
+                     fights=fights,
+                     table_coords=TABLE_COORDS,
+                     schedule_coords=schedule_coords,
+                     fight_coords=fight_coords,
+                     list_coords=((i % groups_per_row) * 3, (i // groups_per_row) * (2 + max_group_size)),
+                     extent=extent,
+                     results_row=results_row)
+
+
+@functools.lru_cache(maxsize=32)
+def makeEliminationPlan(cut_n, team):
+    """Plans the elimination bracket for the cut_n best participants (or teams) of the group phase.
+
+    The fights are ordered by layers and, within a layer, from top to bottom. The small final comes last.
+    The final ranking is filled from the bottom (row cut_n) up, by the losers in the order of the fights.
+    The plans are cached by the size of the bracket, so the returned plan must not be modified.
+    """
+    layer, num_layers = algorithms.makeElimination(list(range(cut_n)))
+    sources = [(BYE if a is None else Source('seed', a), BYE if b is None else Source('seed', b)) for a, b in layer]
+    width = 3 if team else 4
+    ranking_row = cut_n
+    fights = []
+    for ln in range(num_layers):
+        first = len(fights)
+        for i, (top, bottom) in enumerate(sources):
+            row = (4 * 2**ln) * i
+            if ln > 0:
+                row += 2**(ln + 1) - 2
+            bracket_lines = 2 * (2**(ln - 1) - 1) if ln > 0 else 0
+            phase = None
+            loser_ranking = None
+            winner_ranking = None
+            if len(sources) == 1:
+                phase = constants.TEAM_FINAL if team else constants.FINAL
+                loser_ranking = (ranking_row, 2.2)
+                winner_ranking = (ranking_row - 1, 2.1)
+                ranking_row -= 2
+            elif top is not BYE and bottom is not BYE:
+                phase = _phaseName(2**(num_layers - ln), team)
+                if len(sources) > 2:
+                    loser_ranking = (ranking_row, 2**(num_layers - ln))
+                    ranking_row -= 1
+            fights.append(EliminationFight(ln, width * ln, row, top, bottom, bracket_lines, phase, loser_ranking, winner_ranking))
+        if len(sources) == 2:
+            semi_finals = (first, first + 1)
+        if len(sources) == 1:
+            final = fights[-1]
+            fights.append(EliminationFight(layer=ln,
+                                           col=final.col,
+                                           row=final.row + 2 + final.bracket_lines + 2 + 2,
+                                           top=Source('loser', semi_finals[0]),
+                                           bottom=Source('loser', semi_finals[1]),
+                                           bracket_lines=0,
+                                           phase=constants.TEAM_SMALL_FINAL if team else constants.SMALL_FINAL,
+                                           loser_ranking=(ranking_row, 2.4),
+                                           winner_ranking=(ranking_row - 1, 2.3)))
+        sources = [(Source('winner', first + i), Source('winner', first + i + 1)) for i in range(0, len(sources), 2)]
+    return EliminationPlan(num_layers=num_layers, fights=tuple(fights))
+
+
+def makeTimetable(groups, elimination, settings):
+    """Assigns the groups and the elimination fights to the rings and estimates when each fight starts.
+
+    The elimination starts when all groups are over and their fighters rested. The small final is fought before the
+    final.
+    """
+    duration = settings.bout_duration
+    scheduled = algorithms.scheduleGroups([g.fights for g in groups], settings.rings, duration, settings.min_rest)
+    groups_end = max([starts[-1] + duration for _, starts in scheduled if starts] + [0.0])
+
+    fights = elimination.fights
+    order = list(range(len(fights)))
+    if len(fights) > 1 and fights[-1].top.kind == 'loser':
+        order[-2], order[-1] = order[-1], order[-2]
+    position = {f: k for k, f in enumerate(order)}
+    bouts = [([position[s.index] for s in (fights[f].top, fights[f].bottom) if s.kind in ('winner', 'loser')],
+              fights[f].phase is not None)
+             for f in order]
+    slots = algorithms.scheduleBouts(bouts, settings.rings, duration, settings.min_rest, groups_end + settings.min_rest)
+
+    return Timetable(group_rings=[ring for ring, _ in scheduled],
+                     group_starts=[starts for _, starts in scheduled],
+                     elimination=[slots[position[f]] for f in range(len(fights))])
+
+
+def _phaseName(phase_n, team):
+    if team:
+        if phase_n == 4:
+            return 'Team semi-finals'
+        elif phase_n == 8:
+            return 'Team quarter-finals'
+        else:
+            return 'Team elimination 1/{}'.format(phase_n // 2)
+    else:
+        if phase_n == 4:
+            return 'Semi-finals'
+        elif phase_n == 8:
+            return 'Quarter-finals'
+        else:
+            return 'Elimination 1/{}'.format(phase_n // 2)
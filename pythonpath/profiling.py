@@ -0,0 +1,223 @@
+# coding: utf-8
+"""Opt-in profiling of the calls the macros make to LibreOffice.
+
+When profiling is enabled (the Profiling row of the Settings sheet), the document is wrapped in a proxy which wraps
+every UNO object obtained through it, so that all calls of methods and all property accesses are counted and timed.
+The calls are attributed to the phase the macros are in at the time (see :func:`phase`). After the macro finishes,
+the report is written into the hidden sheet Performance, or into a JSON file next to the document.
+"""
+from __future__ import unicode_literals
+
+import uno
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# values of the Profiling setting
+OFF = 0
+SHEET = 1
+JSON_FILE = 2
+
+PERFORMANCE = 'Performance'
+
+STYLE_SETUP = 'Style setup'
+GROUP_SHEETS = 'Group sheets'
+GROUP_LIST = 'Group list'
+GROUPS_RESULTS = 'Groups - results'
+ELIMINATION = 'Elimination bracket'
+FINAL_RANKING = 'Final ranking'
+LIST_OF_FIGHTS = 'List of fights'
+OTHER = 'Other'
+
+_PLAIN = (str, bytes, int, float, bool, type(None))
+
+# the profiler of the running macro, None if profiling is off
+_profiler = None
+
+
+@contextmanager
+def profile(doc, mode, macro):
+    """Profiles the calls made through the yielded document (the document itself if mode is OFF).
+
+    The report is written when the block finishes without an exception.
+    """
+    global _profiler
+    if mode not in (SHEET, JSON_FILE):
+        yield doc
+        return
+    profiler = Profiler()
+    start = time.perf_counter()
+    _profiler = profiler
+    try:
+        yield profiler.wrap(doc)
+    finally:
+        _profiler = None
+    report = profiler.report(macro, time.perf_counter() - start)
+    if mode == SHEET:
+        writeSheet(doc, report)
+    else:
+        writeJson(doc, report)
+
+
+@contextmanager
+def phase(name):
+    """Attributes the calls made inside the block to the given phase. Phases can be nested."""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    profiler.phases.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.wall[name] = profiler.wall.get(name, 0.0) + time.perf_counter() - start
+        profiler.phases.pop()
+
+
+class Profiler(object):
+    """Counts and times calls, keyed by (phase, method or property)."""
+
+    def __init__(self):
+        self.phases = []
+        self.calls = dict()
+        self.seconds = dict()
+        self.wall = dict()
+
+    def record(self, name, elapsed):
+        key = (self.phases[-1] if self.phases else OTHER, name)
+        self.calls[key] = self.calls.get(key, 0) + 1
+        self.seconds[key] = self.seconds.get(key, 0.0) + elapsed
+
+    def wrap(self, value):
+        """Wraps UNO objects (also inside tuples) so that their usage is recorded."""
+        if isinstance(value, tuple):
+            if value and (isinstance(value[0], tuple) or _isUnoObject(value[0])):
+                return tuple(self.wrap(v) for v in value)
+            return value
+        if _isUnoObject(value):
+            return _Proxy(value, self)
+        return value
+
+    def report(self, macro, seconds):
+        phases = dict()
+        for (phase_name, name), calls in self.calls.items():
+            phases.setdefault(phase_name, []).append(dict(name=name, calls=calls, seconds=self.seconds[phase_name, name]))
+        report = []
+        for phase_name, methods in sorted(phases.items(), key=lambda x: -sum(m['seconds'] for m in x[1])):
+            methods.sort(key=lambda m: -m['seconds'])
+            report.append(dict(phase=phase_name,
+                               seconds=self.wall.get(phase_name),
+                               calls=sum(m['calls'] for m in methods),
+                               uno_seconds=sum(m['seconds'] for m in methods),
+                               methods=methods))
+        return dict(macro=macro, seconds=seconds, phases=report)
+
+
+def _isUnoObject(value):
+    # UNO structs are plain values, only interfaces (which all have queryInterface) are wrapped
+    return not isinstance(value, _PLAIN) and hasattr(value, 'queryInterface')
+
+
+def _unwrap(value):
+    if isinstance(value, _Proxy):
+        return object.__getattribute__(value, '_obj')
+    if isinstance(value, (tuple, list)) and value and isinstance(value[0], (tuple, list, _Proxy)):
+        return type(value)(_unwrap(v) for v in value)
+    return value
+
+
+class _Proxy(object):
+    """Forwards everything to the wrapped UNO object and records it in the profiler."""
+
+    __slots__ = ('_obj', '_profiler')
+
+    def __init__(self, obj, profiler):
+        object.__setattr__(self, '_obj', obj)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        obj = object.__getattribute__(self, '_obj')
+        profiler = object.__getattribute__(self, '_profiler')
+        start = time.perf_counter()
+        attr = getattr(obj, name)
+        if not callable(attr):
+            profiler.record(name, time.perf_counter() - start)
+            return profiler.wrap(attr)
+
+        def method(*args):
+            start = time.perf_counter()
+            try:
+                return profiler.wrap(attr(*[_unwrap(a) for a in args]))
+            finally:
+                profiler.record(name + '()', time.perf_counter() - start)
+        return method
+
+    def __setattr__(self, name, value):
+        profiler = object.__getattribute__(self, '_profiler')
+        start = time.perf_counter()
+        try:
+            setattr(object.__getattribute__(self, '_obj'), name, _unwrap(value))
+        finally:
+            profiler.record(name + '=', time.perf_counter() - start)
+
+    def _forward(self, name, operation, *args):
+        profiler = object.__getattribute__(self, '_profiler')
+        start = time.perf_counter()
+        try:
+            return profiler.wrap(operation(object.__getattribute__(self, '_obj'), *args))
+        finally:
+            profiler.record(name, time.perf_counter() - start)
+
+    def __getitem__(self, key):
+        return self._forward('[]', lambda o, k: o[k], key)
+
+    def __len__(self):
+        return self._forward('len()', len)
+
+    def __iter__(self):
+        return iter(self._forward('iter()', lambda o: tuple(o)))
+
+    def __contains__(self, item):
+        return self._forward('in', lambda o, i: i in o, item)
+
+
+def writeSheet(doc, report):
+    """Writes the report into the hidden sheet Performance, replacing the previous report of the same macro."""
+    rows = [('Macro', 'Phase', 'Call', 'Calls', 'Seconds')]
+    if PERFORMANCE in doc.Sheets:
+        sheet = doc.Sheets[PERFORMANCE]
+        cursor = sheet.createCursor()
+        cursor.gotoEndOfUsedArea(False)
+        data = sheet.getCellRangeByPosition(0, 1, 4, max(cursor.RangeAddress.EndRow, 1)).getDataArray()
+        rows += [r for r in data if r[0] and r[0] != report['macro']]
+        doc.Sheets.removeByName(PERFORMANCE)
+    macro = report['macro']
+    rows.append((macro, '', 'total', sum(p['calls'] for p in report['phases']), report['seconds']))
+    for p in report['phases']:
+        rows.append((macro, p['phase'], 'total', p['calls'], p['uno_seconds'] if p['seconds'] is None else p['seconds']))
+        for m in p['methods']:
+            rows.append((macro, p['phase'], m['name'], m['calls'], m['seconds']))
+    doc.Sheets.insertNewByName(PERFORMANCE, len(doc.Sheets))
+    sheet = doc.Sheets[PERFORMANCE]
+    sheet.getCellRangeByPosition(0, 0, 4, len(rows) - 1).setDataArray(tuple(rows))
+    sheet.getCellRangeByPosition(0, 0, 4, 0).Columns.OptimalWidth = True
+    sheet.IsVisible = False
+
+
+def writeJson(doc, report):
+    """Writes the report into <document>-performance.json next to the document, replacing the previous report of the
+    same macro. A document that was not saved yet gets the report into the Performance sheet instead.
+    """
+    if not doc.URL:
+        writeSheet(doc, report)
+        return
+    path = os.path.splitext(uno.fileUrlToSystemPath(doc.URL))[0] + '-performance.json'
+    reports = dict()
+    if os.path.exists(path):
+        with open(path) as f:
+            reports = json.load(f)
+    reports[report['macro']] = report
+    with open(path, 'w') as f:
+        json.dump(reports, f, indent=1)
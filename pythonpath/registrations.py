@@ -0,0 +1,137 @@
+# coding: utf-8
+"""Reading of registration exports (CSV or TSV files) into rows of the Participant list.
+
+The file is read as a stream, one row at a time. The columns are found by the names in the header row (the exports of
+different events order and name them differently), a file without a recognized header is read in the order of the
+Participant list columns. Names, clubs and countries are normalized and the same club (or country) spelled
+differently is unified, so that they are not split in the club and country spreading of the groups.
+"""
+from __future__ import unicode_literals
+
+import csv
+import itertools
+import re
+import sys
+
+# header names (casefolded) of the columns of the Participant list - name, club/team, country, rating/rank, present
+HEADERS = [
+    {'name', 'full name', 'participant', 'fighter', 'competitor'},
+    {'club', 'club/team', 'team', 'school'},
+    {'country', 'nationality', 'nation'},
+    {'rating', 'rank', 'rating/rank', 'ranking'},
+    {'present', 'present?', 'checked in', 'check-in'},
+]
+
+# values (casefolded) of the present column which mean that the participant checked in
+PRESENT = {'y', 'yes', 'x', '1', 'true'}
+
+_DELIMITERS = '\t;,'
+
+_NUMBER = re.compile(r'^-?\d+([.,]\d+)?$')
+
+
+def readRegistrations(path, warn=None, skip_unknown_header=False):
+    """Yields the rows (name, club/team, country, rating/rank, present) of the registrations in the file, as they are
+    (they are normalized and de-duplicated by :func:`newRows`). Rows without a name are skipped. Raises ValueError if
+    the file is not a CSV (or TSV) file in UTF-8.
+
+    A first row which is not recognized as a header is read as data, or skipped if ``skip_unknown_header``. ``warn``
+    (if given) is called with a message when that happens.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        first = f.readline()
+        if not first:
+            return
+        # the delimiter used the most in the first line
+        delimiter = max(_DELIMITERS, key=first.count)
+        reader = csv.reader(itertools.chain([first], f), delimiter=delimiter)
+        try:
+            header = next(reader)
+            columns = _columns(header)
+            rows = reader if columns is not None or skip_unknown_header else itertools.chain([header], reader)
+            if columns is None:
+                columns = list(range(len(HEADERS)))
+                if warn is not None:
+                    warn('{}: the first row {} is not a recognized header, it is {}'.format(
+                        path, header, 'skipped' if skip_unknown_header else 'read as data'))
+            for record in rows:
+                row = tuple(record[c].strip() if c is not None and c < len(record) else '' for c in columns)
+                if row[0]:
+                    yield row
+        except csv.Error as e:
+            raise ValueError('{}, line {}: {}'.format(path, reader.line_num, e))
+
+
+def _columns(header):
+    """Indices of the columns of the header in the order of the Participant list (None for a missing one), or None if
+    the row is not a header.
+    """
+    names = [' '.join(h.split()).casefold() for h in header]
+    columns = [next((i for i, name in enumerate(names) if name in headers), None) for headers in HEADERS]
+    return columns if columns[0] is not None else None
+
+
+class Normalizer(object):
+    """Normalizer and de-duplicator of the rows of the Participant list.
+
+    The whitespace in the names, clubs and countries is collapsed. Clubs and countries are unified by their casefolded
+    form to the spelling seen first (and the strings are interned, so that each is held only once), ratings are read as
+    numbers. An entrant with the same name and club as one seen before is a duplicate, for which the key of every
+    entrant is kept - the memory grows with the number of the (unique) entrants.
+    """
+
+    def __init__(self, rows=()):
+        self.clubs = dict()
+        self.countries = dict()
+        self.entrants = set()
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        """Normalizes the row and remembers the entrant, returns the normalized row or None for a duplicate."""
+        row = self.normalize(row)
+        if row is None:
+            return None
+        key = (row[0].casefold(), row[1].casefold())
+        if key in self.entrants:
+            return None
+        self.entrants.add(key)
+        return row
+
+    def normalize(self, row):
+        """Returns the normalized row, or None if it has no name. The entrant is not remembered."""
+        name, club, country, rating, present = (list(row) + [''] * 5)[:5]
+        name = _collapse(name)
+        if not name:
+            return None
+        club = _unify(self.clubs, _collapse(club))
+        country = _unify(self.countries, _collapse(country))
+        if isinstance(rating, str) and _NUMBER.match(rating.strip()):
+            rating = float(rating.strip().replace(',', '.'))
+        present = 'y' if _collapse(present).casefold() in PRESENT else ''
+        return name, club, country, rating, present
+
+
+def newRows(existing_rows, registrations, warn=None):
+    """The normalized rows of the registrations which are neither in the existing rows of the Participant list nor
+    duplicates of the previous ones, in their order. The clubs and countries are unified with the existing ones.
+
+    ``warn`` (if given) is called with a message for each skipped duplicate.
+    """
+    normalizer = Normalizer(existing_rows)
+    for row in registrations:
+        new_row = normalizer.add(row)
+        if new_row is not None:
+            yield new_row
+        elif warn is not None:
+            warn('{} ({}) is skipped as a duplicate'.format(_collapse(row[0]), _collapse(row[1])))
+
+
+def _collapse(text):
+    if not isinstance(text, str):
+        return '' if text is None else (str(int(text)) if float(text).is_integer() else str(text))
+    return ' '.join(text.split())
+
+
+def _unify(spellings, text):
+    return spellings.setdefault(text.casefold(), sys.intern(text))
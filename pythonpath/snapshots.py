@@ -0,0 +1,177 @@
+# coding: utf-8
+"""Snapshots of a scheduled tournament, from which the document can be restored (see the macro ``restore``).
+
+A snapshot is a file of JSON records, one per line. A plan record holds the rows of Participant list, the values of
+Settings, the groups (the fights of the groups and the elimination bracket follow from them) and the size of the
+elimination bracket. Each results record that follows holds the results (see ``helpers.loadEnteredResults``) which
+changed since the previous records, a cleared result is recorded as null. A new plan record is written when the plan
+changes, and the results after it start from nothing again.
+
+Records are only ever appended and every record is flushed to the disk before the macro finishes, so a crash can
+damage only the last record. A record which cannot be read is ignored, and an incomplete last record is cut off before
+the next records are appended.
+"""
+from __future__ import unicode_literals
+
+import json
+import os
+from collections import namedtuple
+
+import planning
+
+Snapshot = namedtuple('Snapshot', [
+    # rows of Participant list (without the header), as read by getDataArray
+    'participant_rows',
+    # values of the Settings sheet, in the order of planning.SETTING_ROWS
+    'settings',
+    # planning.EnteredResults
+    'entered',
+])
+
+# the results in planning.EnteredResults which are recorded, with the number of the fields of their keys
+_RESULTS = [('group_scores', 2), ('group_headers', 1), ('rnd', 1), ('elimination_scores', 2)]
+
+# the last written Snapshot of each path, with the size and the modification time of the file after the write
+_written = dict()
+
+
+def save(path, participant_rows, settings, entered):
+    """Brings the snapshot at the path up to date - appends the results which changed since it was last saved, and
+    the plan first if it changed (or there is no snapshot yet). Returns the number of the appended records.
+
+    The file is read only if it was not written by this function last (e.g. in another session), otherwise the last
+    written snapshot is compared with.
+    """
+    plan = _plan(participant_rows, settings, entered)
+    previous = _lastWritten(path)
+    if previous is None and os.path.exists(path):
+        previous = load(path)
+    records = []
+    if previous is None or _plan(previous.participant_rows, previous.settings, previous.entered) != plan:
+        records.append(dict(plan=plan))
+        previous = Snapshot(None, None, _results(dict()))
+    changes = dict()
+    for name, _ in _RESULTS:
+        old = getattr(previous.entered, name)
+        new = getattr(entered, name)
+        changed = [_key(key) + [_value(value)] for key, value in new.items() if old.get(key) != value]
+        changed += [_key(key) + [None] for key in old if key not in new]
+        if changed:
+            changes[name] = sorted(changed, key=lambda item: item[:-1])
+    if changes:
+        records.append(dict(results=changes))
+    if records:
+        _cutIncompleteRecord(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+    _written[path] = (_stat(path), Snapshot(participant_rows, settings, _copy(entered)))
+    return len(records)
+
+
+def _lastWritten(path):
+    """The Snapshot last written to the path by :func:`save`, or None if the file changed since then."""
+    if path not in _written:
+        return None
+    stat, snapshot = _written[path]
+    try:
+        if _stat(path) == stat:
+            return snapshot
+    except OSError:
+        pass
+    del _written[path]
+    return None
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _copy(entered):
+    """Copy of the recorded results of planning.EnteredResults, which do not change with the original."""
+    return entered._replace(**dict((name, dict(getattr(entered, name))) for name, _ in _RESULTS))
+
+
+def load(path):
+    """Reads the snapshot at the path, returns the :class:`Snapshot` of the last plan with all the results after it.
+
+    Raises ValueError if the file is not a snapshot.
+    """
+    snapshot = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.endswith('\n'):
+                # the last record was not written completely
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a damaged record
+                continue
+            if 'plan' in record:
+                plan = record['plan']
+                elimination = plan['elimination']
+                snapshot = Snapshot([tuple(row) for row in plan['participant_rows']],
+                                    plan['settings'],
+                                    _results(dict(groups=plan['groups'],
+                                                  elimination=None if elimination is None else tuple(elimination))))
+            elif snapshot is None:
+                raise ValueError('{} does not start with a plan.'.format(path))
+            else:
+                for name, key_length in _RESULTS:
+                    results = getattr(snapshot.entered, name)
+                    for item in record['results'].get(name, ()):
+                        key = tuple(item[:key_length]) if key_length > 1 else item[0]
+                        value = item[key_length]
+                        if value is None:
+                            results.pop(key, None)
+                        else:
+                            results[key] = tuple(value) if isinstance(value, list) else value
+    if snapshot is None:
+        raise ValueError('{} is not a snapshot.'.format(path))
+    return snapshot
+
+
+def _cutIncompleteRecord(path, chunk_size=4096):
+    """Truncates the file at the path after its last newline, if it exists."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+def _plan(participant_rows, settings, entered):
+    """The plan record, as it reads back from the file."""
+    return json.loads(json.dumps(dict(participant_rows=participant_rows,
+                                      settings=settings,
+                                      groups=entered.groups,
+                                      elimination=entered.elimination)))
+
+
+def _results(fields):
+    """planning.EnteredResults with the given fields and no results."""
+    entered = dict(groups=[], elimination=None)
+    entered.update((name, dict()) for name, _ in _RESULTS)
+    entered.update(fields)
+    return planning.EnteredResults(**entered)
+
+
+def _key(key):
+    return list(key) if isinstance(key, tuple) else [key]
+
+
+def _value(value):
+    return list(value) if isinstance(value, tuple) else value
@@ -0,0 +1,10 @@
+# coding: utf-8
+"""Tests of the macros and the modules they use, runnable by a plain python interpreter (with numpy and scipy),
+without LibreOffice. The macros run on the in-memory document of benchmarks/fakeuno.py. Run them from the root of the
+repository::
+
+    python -m unittest
+"""
+from benchmarks import fakeuno
+
+fakeuno.install()
@@ -0,0 +1,77 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import fakeuno
+
+import constants
+import helpers
+import main as macros
+
+
+def newDocument():
+    """A new document after ``init``, which is the document of the macros."""
+    doc = fakeuno.FakeDocument()
+    macros.CTX = fakeuno.FakeScriptContext(doc)
+    macros.init()
+    return doc
+
+
+class ImportParticipantsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.doc = newDocument()
+        self.plist = self.doc.Sheets[constants.PARTICIPANT_LIST]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def writeFile(self, text):
+        path = os.path.join(self.dir, 'registrations.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def testGapInList(self):
+        self.plist.getCellRangeByPosition(0, 1, 4, 4).setDataArray((
+            ('Anna', 'Ars Gladii', 'CZ', 1.0, 'y'),
+            ('', '', '', '', ''),
+            ('', '', '', '', ''),
+            ('Bob', 'Krakow HEMA', 'PL', 2.0, 'y'),
+        ))
+        path = self.writeFile('Name,Club,Country,Present\nBob,krakow hema,PL,y\nCyril,Ars Gladii,CZ,yes\n')
+        self.assertEqual(helpers.importParticipants(self.doc, path), 1)
+        rows = helpers.loadParticipantRows(self.doc)
+        self.assertEqual(rows[3], ('Bob', 'Krakow HEMA', 'PL', 2.0, 'y'))
+        self.assertEqual(rows[4], ('Cyril', 'Ars Gladii', 'CZ', '', 'y'))
+        self.assertEqual([(p.row, p.name) for p in helpers.loadParticipants(self.doc)],
+                         [(1, 'Anna'), (4, 'Bob'), (5, 'Cyril')])
+
+    def testChunks(self):
+        lines = ['Name,Club'] + ['Fighter {},Club {}'.format(i, i % 7) for i in range(helpers.IMPORT_CHUNK_ROWS + 5)]
+        path = self.writeFile('\n'.join(lines) + '\n')
+        self.assertEqual(helpers.importParticipants(self.doc, path), helpers.IMPORT_CHUNK_ROWS + 5)
+        rows = helpers.loadParticipantRows(self.doc)
+        self.assertEqual(len(rows), helpers.IMPORT_CHUNK_ROWS + 5)
+        self.assertEqual(rows[-1][:2], ('Fighter {}'.format(helpers.IMPORT_CHUNK_ROWS + 4),
+                                        'Club {}'.format((helpers.IMPORT_CHUNK_ROWS + 4) % 7)))
+
+    def testWarningsOfMacro(self):
+        path = self.writeFile('Jméno,Klub\nAnna,Ars Gladii\nanna, ars gladii\n')
+        with mock.patch.object(helpers, 'pickFile', return_value=path):
+            macros.importParticipants()
+        (kind, title, message), = macros.CTX.toolkit.messages
+        self.assertEqual((kind, title), ('warningbox', '2 participants imported'))
+        self.assertEqual(len(message.split('\n')), 2)
+        self.assertIn('not a recognized header', message)
+        self.assertIn('anna (ars gladii) is skipped as a duplicate', message)
+
+
+if __name__ == '__main__':
+    unittest.main()
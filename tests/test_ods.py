@@ -0,0 +1,113 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+from xml.etree import ElementTree
+
+import constants
+import ods
+
+TABLE = 'urn:oasis:names:tc:opendocument:xmlns:table:1.0'
+OFFICE = 'urn:oasis:names:tc:opendocument:xmlns:office:1.0'
+TEXT = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+
+def cellContent(cell):
+    """The formula, the value or the text of a cell, or None for an empty cell."""
+    formula = cell.get('{%s}formula' % TABLE)
+    if formula is not None:
+        return formula
+    if cell.get('{%s}value-type' % OFFICE) == 'float':
+        return float(cell.get('{%s}value' % OFFICE))
+    texts = [p.text or '' for p in cell.iter('{%s}p' % TEXT)]
+    return '\n'.join(texts) if texts else None
+
+
+def readSheets(root):
+    """The cells of the sheets of content.xml, as ``{sheet name: {(column, row): content}}``."""
+    sheets = dict()
+    for table in root.iter('{%s}table' % TABLE):
+        cells = sheets[table.get('{%s}name' % TABLE)] = dict()
+        r = 0
+        for row in table.iter('{%s}table-row' % TABLE):
+            c = 0
+            for cell in row:
+                content = cellContent(cell)
+                if content is not None:
+                    cells[c, r] = content
+                c += int(cell.get('{%s}number-columns-repeated' % TABLE, 1))
+            r += int(row.get('{%s}number-rows-repeated' % TABLE, 1))
+    return sheets
+
+
+class WriteTournamentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.csv = os.path.join(self.dir, 'participants.csv')
+        self.output = os.path.join(self.dir, 'tournament.ods')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_main(self, text, *options):
+        with open(self.csv, 'w', encoding='utf-8') as f:
+            f.write(text)
+        stderr = io.StringIO()
+        with mock.patch('sys.stderr', stderr):
+            ods.main([self.csv, self.output] + list(options))
+        with zipfile.ZipFile(self.output) as archive:
+            self.assertEqual(archive.namelist()[0], 'mimetype')
+            self.assertEqual(archive.read('mimetype'), b'application/vnd.oasis.opendocument.spreadsheet')
+            ElementTree.fromstring(archive.read('styles.xml'))
+            ElementTree.fromstring(archive.read('META-INF/manifest.xml'))
+            content = ElementTree.fromstring(archive.read('content.xml'))
+        return content, stderr.getvalue()
+
+    def testTournament(self):
+        rows = ['Participant {},Club {},CZ,{},y'.format(i, i % 3, i) for i in range(1, 11)]
+        content, warnings = self.run_main('Name,Club,Country,Rank,Present\n' + '\n'.join(rows) + '\nLate,Club 1,CZ,11,n\n',
+                                          '--max-group-size', '5')
+        self.assertEqual(warnings, '')
+        sheets = readSheets(content)
+        self.assertEqual(list(sheets), [constants.PARTICIPANT_LIST, constants.SETTINGS, constants.GROUP_LIST,
+                                        'Group 1', 'Group 2', constants.GROUPS_RESULTS, constants.ELIMINATION,
+                                        constants.FINAL_RANKING, constants.LIST_OF_FIGHTS, constants.RESULTS])
+
+        plist = sheets[constants.PARTICIPANT_LIST]
+        self.assertEqual([plist[c, 0] for c in range(5)], ['Name', 'Club/team', 'Country', 'Rating/rank', 'Present?'])
+        self.assertEqual([plist[c, 1] for c in range(5)], ['Participant 1', 'Club 1', 'CZ', 1.0, 'y'])
+        self.assertEqual(plist[0, 11], 'Late')
+        self.assertEqual(sheets[constants.SETTINGS][1, 0], 5.0)
+
+        # 10 present participants in 2 groups of 5, everyone fights everyone in their group
+        phases = [v for (c, r), v in sorted(sheets[constants.LIST_OF_FIGHTS].items(), key=lambda x: x[0][::-1])
+                  if c == 0 and r > 0]
+        self.assertEqual(phases[:20], ['Group 1'] * 10 + ['Group 2'] * 10)
+        self.assertNotIn('Group 3', phases)
+        names = set(v for v in sheets[constants.GROUPS_RESULTS].values() if isinstance(v, str) and 'Participant list' in v)
+        self.assertTrue(names)
+        self.assertFalse(any('A12' in v for v in names))
+
+        ranges = [r.get('{%s}name' % TABLE) for r in content.iter('{%s}database-range' % TABLE)]
+        self.assertIn('finalRanking', ranges)
+
+    def testUnknownHeader(self):
+        rows = ['Participant {},Club {},CZ,{},y'.format(i, i % 3, i) for i in range(1, 9)]
+        content, warnings = self.run_main('Jméno,Klub,Země,Pořadí,Přítomen\n' + '\n'.join(rows) + '\n')
+        self.assertTrue(warnings.startswith('warning: '))
+        # the unknown header is skipped, the columns are read in the order of the Participant list
+        plist = readSheets(content)[constants.PARTICIPANT_LIST]
+        self.assertEqual([plist[c, 1] for c in range(5)], ['Participant 1', 'Club 1', 'CZ', 1.0, 'y'])
+        self.assertEqual(plist[0, 8], 'Participant 8')
+        self.assertNotIn((0, 9), plist)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import unittest
+
+import algorithms
+import planning
+
+
+def settings(**values):
+    fields = planning.makeSettings([row[1] for row in planning.SETTING_ROWS])._asdict()
+    fields.update(values)
+    return planning.Settings(**fields)
+
+
+def participant(row, club='', country=''):
+    return planning.Participant(row, 'Participant {}'.format(row), club, country, float(row))
+
+
+class ReplanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.participants = [participant(row, 'Club {}'.format(row % 3), 'CZ') for row in range(1, 10)]
+        self.groups = [[1, 4, 7], [2, 5, 8], [3, 6, 9]]
+
+    def members(self, plan):
+        return [[p.row for p in g.participants] for g in plan.groups]
+
+    def testUnchanged(self):
+        plan, changed = planning.replan(self.participants, settings(), self.groups)
+        self.assertEqual(self.members(plan), self.groups)
+        self.assertEqual(changed, [])
+
+    def testWithdrawn(self):
+        present = [p for p in self.participants if p.row != 5]
+        plan, changed = planning.replan(present, settings(), self.groups)
+        self.assertEqual(self.members(plan), [[1, 4, 7], [2, 8], [3, 6, 9]])
+        self.assertEqual(changed, [1])
+        self.assertEqual(plan.participants, present)
+
+    def testLate(self):
+        late = [participant(10, 'Club 1', 'CZ'), participant(11, 'Club 1', 'CZ')]
+        present = [p for p in self.participants if p.row != 5] + late
+        plan, changed = planning.replan(present, settings(), self.groups)
+        # the better seeded (by rank) participant goes to the smallest group, the other one to the group without their club
+        self.assertEqual(self.members(plan), [[1, 4, 7], [2, 8, 10], [3, 6, 9, 11]])
+        self.assertEqual(changed, [1, 2])
+
+    def testLateByRating(self):
+        late = [participant(10, 'Club 1', 'CZ'), participant(11, 'Club 2', 'CZ')]
+        plan, changed = planning.replan(self.participants + late, settings(rating_is_rank=False), self.groups)
+        # participant 11 is better rated and goes first, to the group without Club 2
+        self.assertEqual(self.members(plan), [[1, 4, 7, 11], [2, 5, 8, 10], [3, 6, 9]])
+        self.assertEqual(changed, [0, 1])
+
+    def testNoRoom(self):
+        with self.assertRaisesRegex(ValueError, 'no room for Participant 10'):
+            planning.replan(self.participants + [participant(10)], settings(max_group_size=3), self.groups)
+
+    def testTooSmallGroup(self):
+        present = [p for p in self.participants if p.row not in (2, 5)]
+        with self.assertRaisesRegex(ValueError, 'Group 2 would have less than 2'):
+            planning.replan(present, settings(), self.groups)
+
+
+class TimetableTest(unittest.TestCase):
+
+    def testAssignLongestFirst(self):
+        self.assertEqual(algorithms.assignLongestFirst([1.0, 3.0, 2.0, 2.0], 2), [(0, 3.0), (0, 0.0), (1, 0.0), (1, 2.0)])
+        self.assertEqual(algorithms.assignLongestFirst([1.0, 2.0], 0), [(0, 2.0), (0, 0.0)])
+
+    def testScheduleGroups(self):
+        # the second bout waits for participant 1 to rest
+        groups = [[(1, 2), (1, 3), (2, 3)], [(4, 5)]]
+        self.assertEqual(algorithms.scheduleGroups(groups, 2, 2.0, 1.0), [(0, [0.0, 3.0, 6.0]), (1, [0.0])])
+        self.assertEqual(algorithms.scheduleGroups(groups, 1, 2.0, 1.0), [(0, [0.0, 3.0, 6.0]), (0, [8.0])])
+
+    def testGroupDuration(self):
+        self.assertEqual(algorithms.groupDuration(2, 2.0, 1.0), 2.0)
+        for size in range(3, 9):
+            bouts = size * (size - 1) // 2
+            self.assertGreaterEqual(algorithms.groupDuration(size, 2.0, 1.0), bouts * 2.0)
+            self.assertEqual(algorithms.groupDuration(size, 2.0, 0.0), bouts * 2.0)
+
+    def testScheduleBouts(self):
+        # a bracket of 3: a bout with a bye, a bout fought and the final between their winners
+        bouts = [([], False), ([], True), ([0, 1], True)]
+        self.assertEqual(algorithms.scheduleBouts(bouts, 2, 2.0, 1.0, start=10.0), [(None, 10.0), (0, 10.0), (1, 13.0)])
+
+    def testCountEliminationBouts(self):
+        self.assertEqual(algorithms.countEliminationBouts(1), [])
+        self.assertEqual(algorithms.countEliminationBouts(2), [1])
+        self.assertEqual(algorithms.countEliminationBouts(4), [2, 2])
+        self.assertEqual(algorithms.countEliminationBouts(6), [2, 2, 2])
+        for n in range(3, 40):
+            # everyone but the winner loses once, the small final is an extra bout
+            self.assertEqual(sum(algorithms.countEliminationBouts(n)), n)
+
+    def testMakeTimetable(self):
+        participants = [participant(row) for row in range(1, 13)]
+        plan = planning.makePlan(participants, settings(max_group_size=6, rings=2, bout_duration=3.0, min_rest=0.0))
+        timetable = plan.timetable
+        self.assertEqual(timetable.group_rings, [0, 1])
+        self.assertEqual([len(s) for s in timetable.group_starts], [15, 15])
+        self.assertEqual(timetable.group_starts[0], [3.0 * k for k in range(15)])
+        groups_end = 45.0
+        elimination = [slot for slot in timetable.elimination if slot[0] is not None]
+        self.assertEqual(len(elimination), sum(algorithms.countEliminationBouts(plan.cut_n)))
+        self.assertTrue(all(start >= groups_end for _, start in elimination))
+
+
+if __name__ == '__main__':
+    unittest.main()
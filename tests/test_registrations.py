@@ -0,0 +1,88 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import registrations
+
+
+class ReadRegistrationsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self, text, **kwargs):
+        path = os.path.join(self.dir, 'registrations.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return list(registrations.readRegistrations(path, **kwargs))
+
+    def testHeaderColumns(self):
+        rows = self.read('Timestamp;Full  Name;E-mail;Nation;Club/Team;Checked in\n'
+                         '2026-01-01;Anna;a@b;CZ;Ars Gladii;yes\n')
+        self.assertEqual(rows, [('Anna', 'Ars Gladii', 'CZ', '', 'yes')])
+
+    def testDelimiter(self):
+        self.assertEqual(self.read('Name\tTeam\tRank\nAnna\tArs Gladii\t3\n'), [('Anna', 'Ars Gladii', '', '3', '')])
+        self.assertEqual(self.read('Name,Club\n"Smith, John",Ars Gladii\n'), [('Smith, John', 'Ars Gladii', '', '', '')])
+
+    def testByteOrderMark(self):
+        self.assertEqual(self.read('﻿Name,Club\nAnna,Ars Gladii\n'), [('Anna', 'Ars Gladii', '', '', '')])
+
+    def testUnknownHeader(self):
+        warnings = []
+        rows = self.read('Jméno,Klub,Země\nAnna,Ars Gladii,CZ\n', warn=warnings.append)
+        self.assertEqual(rows, [('Jméno', 'Klub', 'Země', '', ''), ('Anna', 'Ars Gladii', 'CZ', '', '')])
+        self.assertEqual(len(warnings), 1)
+        self.assertIn('read as data', warnings[0])
+
+    def testSkipUnknownHeader(self):
+        warnings = []
+        rows = self.read('Jméno,Klub,Země\nAnna,Ars Gladii,CZ\n', warn=warnings.append, skip_unknown_header=True)
+        self.assertEqual(rows, [('Anna', 'Ars Gladii', 'CZ', '', '')])
+        self.assertIn('skipped', warnings[0])
+
+    def testRowsWithoutName(self):
+        self.assertEqual(self.read('Name,Club\n,Ars Gladii\n\nAnna,\n'), [('Anna', '', '', '', '')])
+
+    def testEmptyFile(self):
+        self.assertEqual(self.read(''), [])
+
+
+class NewRowsTest(unittest.TestCase):
+
+    def testNormalization(self):
+        rows = list(registrations.newRows([], [(' Anna   Nová ', ' ars  GLADII', 'cz', '2,5', 'Yes'),
+                                               ('Bob', 'Ars Gladii', 'CZ', '1500', 'no')]))
+        self.assertEqual(rows, [('Anna Nová', 'ars GLADII', 'cz', 2.5, 'y'), ('Bob', 'ars GLADII', 'cz', 1500.0, '')])
+
+    def testSpellingOfExistingRows(self):
+        existing = [('Anna', 'Ars Gladii', 'CZ', 1.0, 'y')]
+        rows = list(registrations.newRows(existing, [('Bob', 'ARS GLADII', 'cz', '', 'x')]))
+        self.assertEqual(rows, [('Bob', 'Ars Gladii', 'CZ', '', 'y')])
+
+    def testDuplicates(self):
+        warnings = []
+        existing = [('Anna', 'Ars Gladii', 'CZ', 1.0, 'y'), ('', '', '', '', ''), (5.0, 'Club 1', '', '', '')]
+        rows = list(registrations.newRows(existing, [('anna', 'ars gladii', '', '', ''),
+                                                     ('Anna', 'Krakow HEMA', '', '', ''),
+                                                     ('5', 'Club 1', '', '', ''),
+                                                     ('Anna ', ' Krakow  HEMA', '', '', '')], warnings.append))
+        self.assertEqual(rows, [('Anna', 'Krakow HEMA', '', '', '')])
+        self.assertEqual(warnings, ['anna (ars gladii) is skipped as a duplicate', '5 (Club 1) is skipped as a duplicate',
+                                    'Anna (Krakow HEMA) is skipped as a duplicate'])
+
+    def testStrings(self):
+        rows = list(registrations.newRows([], [('Anna', 'Ars Gladii', 'CZ', '', ''), ('Bob', 'ars gladii', 'CZ', '', '')]))
+        self.assertIs(rows[0][1], rows[1][1])
+        self.assertIs(rows[0][2], rows[1][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
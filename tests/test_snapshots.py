@@ -0,0 +1,166 @@
+# coding: utf-8
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import bench_macros, fakeuno, rosters
+
+import constants
+import helpers
+import main as macros
+import planning
+import snapshots
+
+ROWS = [('Anna', 'Ars Gladii', 'CZ', 1.0, 'y'), ('Bob', 'Krakow HEMA', 'PL', 2.0, 'y'), ('Cyril', '', 'CZ', 3.0, 'y')]
+SETTINGS = [7.0, 4.0, 0.8]
+
+
+def entered(**results):
+    fields = dict(groups=[[1, 2, 3]], group_scores=dict(), group_headers=dict(), rnd=dict(), elimination=(2, False),
+                  elimination_scores=dict())
+    fields.update(results)
+    return planning.EnteredResults(**fields)
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'tournament-snapshot.ndjson')
+        snapshots._written.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def lines(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.readlines()
+
+    def testRoundTrip(self):
+        results = entered(group_scores={(1, 2): ('5', '3')}, group_headers={0: ('Ring 2', 'Jana', '')},
+                          rnd={3: '0.5'}, elimination_scores={(4, 2): '1'})
+        self.assertEqual(snapshots.save(self.path, ROWS, SETTINGS, results), 2)
+        self.assertEqual(snapshots.load(self.path), snapshots.Snapshot(ROWS, SETTINGS, results))
+
+    def testChanges(self):
+        snapshots.save(self.path, ROWS, SETTINGS, entered(group_scores={(1, 2): ('5', '3'), (2, 3): ('1', '0')}))
+        self.assertEqual(snapshots.save(self.path, ROWS, SETTINGS, entered(group_scores={(1, 2): ('5', '3'), (2, 3): ('1', '0')})), 0)
+        results = entered(group_scores={(1, 2): ('4', '3')}, rnd={1: '0.25'})
+        self.assertEqual(snapshots.save(self.path, ROWS, SETTINGS, results), 1)
+        self.assertEqual(json.loads(self.lines()[-1]), dict(results=dict(group_scores=[[1, 2, ['4', '3']], [2, 3, None]],
+                                                                         rnd=[[1, '0.25']])))
+        self.assertEqual(snapshots.load(self.path).entered, results)
+
+    def testNewPlan(self):
+        snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.25'}))
+        rows = ROWS + [('Dana', '', 'SK', 4.0, 'y')]
+        results = entered(groups=[[1, 2], [3, 4]], group_scores={(3, 4): ('2', '1')})
+        self.assertEqual(snapshots.save(self.path, rows, SETTINGS, results), 2)
+        self.assertEqual(len(self.lines()), 4)
+        self.assertEqual(snapshots.load(self.path), snapshots.Snapshot(rows, SETTINGS, results))
+
+    def testTruncatedRecord(self):
+        snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.25'}))
+        # a crash in the middle of the next write
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"results":{"rnd":[[2,')
+        self.assertEqual(snapshots.load(self.path).entered.rnd, {1: '0.25'})
+        snapshots._written.clear()
+        results = entered(rnd={1: '0.25', 2: '1'})
+        self.assertEqual(snapshots.save(self.path, ROWS, SETTINGS, results), 1)
+        self.assertTrue(all(line.endswith('}\n') for line in self.lines()))
+        self.assertEqual(snapshots.load(self.path).entered, results)
+
+    def testDamagedRecord(self):
+        snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.25'}))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"results":{"rnd":[[2,{"results":{"rnd":[[3,"1"]]}}\n')
+        snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.5'}))
+        self.assertEqual(snapshots.load(self.path).entered.rnd, {1: '0.5'})
+
+    def testChangedByAnotherSession(self):
+        snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.25'}))
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"results":{"rnd":[[1,null]]}}\n')
+        self.assertEqual(snapshots.save(self.path, ROWS, SETTINGS, entered(rnd={1: '0.25'})), 1)
+        self.assertEqual(snapshots.load(self.path).entered.rnd, {1: '0.25'})
+
+    def testNotSnapshot(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('{"results":{}}\n')
+        self.assertRaises(ValueError, snapshots.load, self.path)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('garbage\n')
+        self.assertRaises(ValueError, snapshots.load, self.path)
+        self.assertRaises(ValueError, snapshots.save, self.path, ROWS, SETTINGS, entered())
+
+
+class MacrosTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        snapshots._written.clear()
+        self.doc = self.newDocument()
+        macros.init()
+        rows = tuple((p.name, p.club, p.country, p.rating, 'y') for p in rosters.makeRoster(12, seed=3))
+        self.doc.Sheets[constants.PARTICIPANT_LIST].getCellRangeByPosition(0, 1, 4, len(rows)).setDataArray(rows)
+        self.doc.Sheets[constants.SETTINGS].getCellByPosition(1, 6).setValue(5)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def newDocument(self):
+        doc = fakeuno.FakeDocument(fakeuno.systemPathToFileUrl(os.path.join(self.dir, 'tournament.ods')))
+        macros.CTX = fakeuno.FakeScriptContext(doc)
+        return doc
+
+    def snapshot(self, doc):
+        return json.loads(json.dumps(doc.snapshot()))
+
+    def testRestore(self):
+        macros.schedule()
+        expected = self.snapshot(self.doc)
+        self.newDocument()
+        macros.restore()
+        self.assertEqual(bench_macros.diffSnapshots(expected, self.snapshot(macros.CTX.getDocument())), [])
+
+    def testRestoreFails(self):
+        macros.schedule()
+        path = helpers.snapshotPath(self.doc)
+        with open(path, encoding='utf-8') as f:
+            plan = json.loads(f.readline())['plan']
+        # the first group is left with a single participant
+        plan['groups'] = [plan['groups'][0][:1], sum(plan['groups'][1:], plan['groups'][0][1:])]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(dict(plan=plan)) + '\n')
+        expected = self.snapshot(self.doc)
+        macros.restore()
+        self.assertEqual(bench_macros.diffSnapshots(expected, self.snapshot(self.doc)), [])
+        (kind, title, message), = macros.CTX.toolkit.messages
+        self.assertEqual((kind, title), ('errorbox', 'Cannot restore'))
+        self.assertIn('The document was not changed.', message)
+
+    def testFailedSnapshot(self):
+        with mock.patch.object(snapshots, 'save', side_effect=OSError('No space left on device')):
+            macros.schedule()
+            self.assertIn(constants.GROUPS_RESULTS, self.doc.Sheets)
+            macros.evalGroups()
+            macros.snapshot()
+        (kind, title, message), = macros.CTX.toolkit.messages
+        self.assertEqual((title, message), ('No snapshot', 'No space left on device'))
+
+    def testUnsavedDocument(self):
+        self.doc._url = ''
+        macros.schedule()
+        self.assertEqual(os.listdir(self.dir), [])
+        macros.snapshot()
+        self.assertEqual(macros.CTX.toolkit.messages[0][1], 'No snapshot')
+
+
+if __name__ == '__main__':
+    unittest.main()